@@ -1,22 +1,71 @@
+import json
 import logging
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Optional, Union
+from fastapi import FastAPI, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 
+from app.src import config
+from app.src.models.manga import MangaRecord
+from app.src.models.responses import ChapterEventPage, FacetPage, MangaPage, Message, SearchPage
+from app.src.scripts import metrics
+from app.src.scripts.connection_pool import PoolTimeoutError
+from app.src.scripts.database_manager import close_pool, init_pool
+from app.src.scripts.leader_election import LeaderElection
+from app.src.scripts.scheduler import RefreshScheduler
+from app.src.scripts.serialization import SerializedBody, etag_matches, gzip_etag, make_etag, serialize
 from app.src.scripts.service_handler import ServiceHandler
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 service_handler = ServiceHandler()
+scheduler = RefreshScheduler(service_handler)
+
+
+def start_background_work():
+    service_handler.start_leader_tasks()
+    if config.SCHEDULER_ENABLED:
+        scheduler.start()
+
+
+def follow_leader():
+    if config.WORKERS == 1:
+        logger.warning(
+            "Another process is using the database, set WEB_CONCURRENCY to the number of workers "
+            "so every worker sees the others' writes"
+        )
+    service_handler.watch_external_changes()
+
+
+# With several workers only one runs the scheduler and the webhook, a single worker always does
+leader = LeaderElection(start_background_work, on_follower=follow_leader)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One long-lived SQLite connection pool for the whole process
+    init_pool()
+    await service_handler.start()
+    leader.start()
+    yield
+    await scheduler.stop()
+    # Close the shared HTTP client and database executor on shutdown
+    await service_handler.close()
+    await leader.stop()
+    close_pool()
+
 
 app = FastAPI(
     title="My Mangas API",
     description="API for all my favourite mangas created to be callable through an API",
     version="1.0.0",
     docs_url="/docs",  # Enable /docs for Swagger UI
-    redoc_url=None     # Disable /redoc (optional)
+    redoc_url=None,    # Disable /redoc (optional)
+    lifespan=lifespan
 )
 origins = [
     "http://localhost",
@@ -33,31 +82,324 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all HTTP methods
     allow_headers=["*"],  # Allows all headers
 )
+# Added last so it wraps CORS too and times every request
+app.add_middleware(
+    metrics.MetricsMiddleware,
+    profile_header=config.PROFILE_HEADER if config.PROFILING_ENABLED else None,
+)
+
+@app.exception_handler(PoolTimeoutError)
+async def database_busy(request: Request, exc: PoolTimeoutError):
+    # Every connection stayed busy, the client may retry shortly
+    return JSONResponse(status_code=503, content={"message": str(exc)}, headers={"Retry-After": "1"})
 
 # Disable the default root route
 @app.get("/", include_in_schema=False)
 def root():
     return JSONResponse(status_code=404, content={"message": "API Only"})
 
-@app.get("/mangas")
-async def get_mangas():
-    return service_handler.get_all_entries()
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 when the client already holds this version, None otherwise."""
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag):
+        # The ETag of the representation the client holds, gzip encoded or not
+        held = gzip_etag(etag) if gzip_etag(etag) in if_none_match else etag
+        return Response(status_code=304, headers={"ETag": held, "Vary": "Accept-Encoding"})
+    return None
+
+
+def _json_response(request: Request, body: SerializedBody) -> Response:
+    """Send a pre-serialized body, gzip encoded when the client accepts it."""
+    use_gzip = body.gzipped is not None and "gzip" in request.headers.get("accept-encoding", "")
+    headers = {"Vary": "Accept-Encoding"}
+    if body.etag:
+        headers["ETag"] = gzip_etag(body.etag) if use_gzip else body.etag
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=body.gzipped, media_type="application/json", headers=headers)
+    return Response(content=body.body, media_type="application/json", headers=headers)
+
+
+def _library_etag(request: Request, version: int) -> str:
+    """ETag of a list or search response, changes with the library and the query."""
+    return make_etag(request.url.path, str(request.url.query), version)
+
+
+@app.get(
+    "/mangas",
+    response_model=Union[List[MangaRecord], MangaPage],
+    responses={304: {"description": "Not modified"}, 400: {"model": Message}},
+)
+async def get_mangas(
+    request: Request,
+    status: Optional[str] = None,
+    genre: Optional[str] = None,
+    author: Optional[str] = None,
+    released_after: Optional[datetime] = None,
+    released_before: Optional[datetime] = None,
+    sort: Optional[str] = Query(None, description="name, last_chapter_release_date, rating or id, prefix with - for descending"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma separated list of columns to return"),
+):
+    query = {
+        "status": status,
+        "genre": genre,
+        "author": author,
+        "released_after": released_after,
+        "released_before": released_before,
+        "sort": sort,
+        "limit": limit,
+        "cursor": cursor,
+        "fields": fields.split(",") if fields else None,
+    }
+    query = {key: value for key, value in query.items() if value is not None}
+    if not query:
+        # Plain GET /mangas keeps returning the whole library
+        body = await service_handler.get_all_entries_json()
+        return _not_modified(request, body.etag) or _json_response(request, body)
+    etag = _library_etag(request, await service_handler.library_version())
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    try:
+        page = await service_handler.query_entries(**query)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    return _json_response(request, serialize(page, etag))
+
+
+@app.get("/mangas/updates", response_model=ChapterEventPage, responses={400: {"model": Message}})
+async def get_manga_updates(
+    request: Request,
+    since: Optional[datetime] = Query(None, description="ISO date or Unix time, inclusive"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous call"),
+):
+    try:
+        page = await service_handler.chapter_updates(since, limit, cursor)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    return _json_response(request, serialize(page))
+
+
+@app.get("/mangas/stream")
+async def stream_chapters(last_event_id: Optional[int] = Header(None)):
+    async def stream():
+        async for event in service_handler.feed.subscribe(last_event_id):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"id: {event['id']}\nevent: chapter\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/mangas/export", response_class=StreamingResponse)
+async def export_mangas():
+    return StreamingResponse(
+        service_handler.export_entries(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="mangas.ndjson"'},
+    )
+
+
+@app.get("/mangas/search", response_model=SearchPage, responses={304: {"description": "Not modified"}})
+async def search_mangas(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    etag = _library_etag(request, await service_handler.library_version())
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    results = await service_handler.search_entries(q, limit, offset)
+    return _json_response(request, serialize(results, etag))
+
+
+@app.get(
+    "/mangas/{manga_name}",
+    response_model=MangaRecord,
+    responses={304: {"description": "Not modified"}, 404: {"model": Message}},
+)
+async def get_manga(request: Request, manga_name: str):
+    body = await service_handler.retrieve_manga_json(manga_name)
+    if body is None:
+        return JSONResponse(status_code=404, content={"message": "No manga found with that name."})
+    return _not_modified(request, body.etag) or _json_response(request, body)
+
+
+@app.get(
+    "/mangas/{manga_name}/cover",
+    response_class=FileResponse,
+    responses={200: {"content": {"image/*": {}}}, 304: {"description": "Not modified"}, 404: {"model": Message}},
+)
+async def get_manga_cover(request: Request, manga_name: str):
+    cover = await service_handler.retrieve_cover(manga_name)
+    if cover is None:
+        return JSONResponse(status_code=404, content={"message": "No cover found for that manga."})
+    etag = f'"{cover.digest}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={config.COVER_MAX_AGE}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    # Sent with sendfile where the server supports it, Range requests included
+    return FileResponse(cover.path, media_type=cover.content_type, headers=headers)
+
+
+class MangaBatch(BaseModel):
+    names: List[str] = Field(..., min_length=1, max_length=config.BATCH_MAX_SIZE)
+
+
+@app.post("/mangas/batch")
+async def add_mangas(batch: MangaBatch):
+    return await service_handler.create_entries(batch.names)
 
 
-@app.get("/mangas/{manga_name}")
-async def get_manga(manga_name: str):
-    return service_handler.retrieve_manga(manga_name)
+@app.post("/mangas/import", responses={400: {"model": Message}})
+async def import_mangas(request: Request):
+    try:
+        return await service_handler.import_entries(request.stream())
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
 
 
 @app.post("/mangas/{manga_name}")
 async def add_manga(manga_name: str):
-    return service_handler.create_entry(manga_name)
+    return await service_handler.create_entry(manga_name)
 
-@app.delete("/mangas/{manga_name}")
+@app.delete("/mangas/{manga_name}", responses={404: {"model": Message}})
 async def remove_manga(manga_name: str):
-    return service_handler.remove_manga(manga_name)
+    result = await service_handler.remove_manga(manga_name)
+    scheduler.unschedule(manga_name)
+    if result is None:
+        return JSONResponse(status_code=404, content={"message": "No manga found with that name."})
+    return result
 
-# To be defined
-@app.put("/mangas")
+@app.put("/mangas", status_code=202, responses={409: {"model": Message}})
 async def update_mangas():
-    return service_handler.update_all_entries()
+    job = await service_handler.start_update_job()
+    if job is None:
+        return JSONResponse(status_code=409, content={"message": "A refresh is already running in another worker."})
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }
+
+
+def _job_not_found(job_id: str) -> JSONResponse:
+    return JSONResponse(status_code=404, content={"message": f"No job found with id {job_id}."})
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = service_handler.jobs.get(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+    return job.snapshot()
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = service_handler.jobs.cancel(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+    return {"job_id": job.id, "status": job.status}
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = service_handler.jobs.get(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+
+    async def stream():
+        async for message in job.events():
+            if message is None:
+                yield ": keepalive\n\n"
+            else:
+                event, data = message
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+async def _facet_counts(request: Request, facet: str, limit: int, offset: int) -> Response:
+    etag = _library_etag(request, await service_handler.library_version())
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    counts = await service_handler.facet_counts(facet, limit, offset)
+    return _json_response(request, serialize(counts, etag))
+
+
+async def _facet_mangas(request: Request, sort: Optional[str], fields: Optional[str], **query) -> Response:
+    etag = _library_etag(request, await service_handler.library_version())
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+    if sort:
+        query["sort"] = sort
+    if fields:
+        query["fields"] = fields.split(",")
+    try:
+        page = await service_handler.query_entries(**query)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    return _json_response(request, serialize(page, etag))
+
+
+@app.get("/genres", response_model=FacetPage, responses={304: {"description": "Not modified"}})
+async def get_genres(request: Request, limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0)):
+    return await _facet_counts(request, "genres", limit, offset)
+
+
+@app.get(
+    "/genres/{genre}",
+    response_model=MangaPage,
+    responses={304: {"description": "Not modified"}, 400: {"model": Message}},
+)
+async def get_genre_mangas(
+    request: Request,
+    genre: str,
+    sort: Optional[str] = Query(None, description="name, last_chapter_release_date, rating or id, prefix with - for descending"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma separated list of columns to return"),
+):
+    return await _facet_mangas(request, sort, fields, genre=genre, limit=limit, cursor=cursor)
+
+
+@app.get("/authors", response_model=FacetPage, responses={304: {"description": "Not modified"}})
+async def get_authors(request: Request, limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0)):
+    return await _facet_counts(request, "authors", limit, offset)
+
+
+@app.get(
+    "/authors/{author}",
+    response_model=MangaPage,
+    responses={304: {"description": "Not modified"}, 400: {"model": Message}},
+)
+async def get_author_mangas(
+    request: Request,
+    author: str,
+    sort: Optional[str] = Query(None, description="name, last_chapter_release_date, rating or id, prefix with - for descending"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma separated list of columns to return"),
+):
+    return await _facet_mangas(request, sort, fields, author=author, limit=limit, cursor=cursor)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return service_handler.cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    service_handler.collect_metrics()
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
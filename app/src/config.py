@@ -0,0 +1,106 @@
+import os
+
+# Refresh engine settings, overridable through environment variables
+REFRESH_MAX_CONCURRENCY = int(os.getenv("REFRESH_MAX_CONCURRENCY", "16"))
+REFRESH_BATCH_SIZE = int(os.getenv("REFRESH_BATCH_SIZE", "50"))
+
+# Scraper HTTP client, shared by every request to the manga sites
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "4"))
+HTTP_RATE_PER_HOST = float(os.getenv("HTTP_RATE_PER_HOST", "5"))  # Requests per second
+HTTP_BURST_PER_HOST = int(os.getenv("HTTP_BURST_PER_HOST", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+HTTP_REQUEST_DEADLINE = float(os.getenv("HTTP_REQUEST_DEADLINE", "45"))  # Whole request, body included
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_CAP = float(os.getenv("HTTP_BACKOFF_CAP", "30"))
+HTTP_BREAKER_THRESHOLD = int(os.getenv("HTTP_BREAKER_THRESHOLD", "5"))  # Consecutive failures
+HTTP_BREAKER_RESET = float(os.getenv("HTTP_BREAKER_RESET", "60"))
+
+# Request path settings
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "4"))
+
+# SQLite connection pool settings
+# Library database, the page and cover caches are kept next to it. Empty uses databases/Mangas.db
+DB_PATH = os.getenv("DB_PATH", "")
+# The executor threads plus the writer thread
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(DB_EXECUTOR_WORKERS + 1)))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "30"))  # Seconds a write waits for the write lock
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "10"))  # Seconds a call waits for a free connection
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "20000"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHED_STATEMENTS = int(os.getenv("DB_CACHED_STATEMENTS", "256"))
+
+# Read-through response cache settings
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "1024"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+
+# On-disk cache of scraped pages
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# HTML parsing backend: "auto" picks lxml when installed, otherwise html.parser
+PARSER_BACKEND = os.getenv("PARSER_BACKEND", "auto")
+# Processes parsing pages during a refresh, 0 parses in threads instead
+REFRESH_PARSE_WORKERS = int(os.getenv("REFRESH_PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+# Background refresh scheduler, intervals in seconds
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_SPACING = float(os.getenv("SCHEDULER_SPACING", "5"))
+SCHEDULER_MIN_INTERVAL = float(os.getenv("SCHEDULER_MIN_INTERVAL", str(60 * 60)))
+SCHEDULER_MAX_INTERVAL = float(os.getenv("SCHEDULER_MAX_INTERVAL", str(3 * 24 * 60 * 60)))
+SCHEDULER_COMPLETED_INTERVAL = float(os.getenv("SCHEDULER_COMPLETED_INTERVAL", str(14 * 24 * 60 * 60)))
+SCHEDULER_DEFAULT_CADENCE = float(os.getenv("SCHEDULER_DEFAULT_CADENCE", str(7 * 24 * 60 * 60)))
+SCHEDULER_RELOAD_INTERVAL = float(os.getenv("SCHEDULER_RELOAD_INTERVAL", str(10 * 60)))
+
+# POST /mangas/batch settings
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", str(HTTP_PER_HOST_LIMIT)))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "1000"))
+
+# Background jobs
+JOBS_KEEP_FINISHED = int(os.getenv("JOBS_KEEP_FINISHED", "50"))
+JOBS_EVENTS_KEEPALIVE = float(os.getenv("JOBS_EVENTS_KEEPALIVE", "15"))
+
+# Manga sources, in order of preference, and hedged requests across them
+PROVIDERS = [name.strip() for name in os.getenv("PROVIDERS", "demonicscans,manganato").split(",") if name.strip()]
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") == "1"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))  # Of the primary's recent latencies
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "2"))  # Until enough latencies are known
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+
+# GET /mangas/stream and the webhook sink for new chapters
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "256"))  # Per subscriber, fuller ones get dropped
+STREAM_KEEPALIVE = float(os.getenv("STREAM_KEEPALIVE", "15"))
+STREAM_REPLAY_PAGE = int(os.getenv("STREAM_REPLAY_PAGE", "500"))
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # Empty disables the webhook sink
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))
+WEBHOOK_FLUSH_INTERVAL = float(os.getenv("WEBHOOK_FLUSH_INTERVAL", "2"))
+WEBHOOK_RETRY_INTERVAL = float(os.getenv("WEBHOOK_RETRY_INTERVAL", "30"))
+
+# JSON responses at least this large are also served gzip encoded
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+
+# NDJSON export and import of the library
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))  # Rows per streamed chunk
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))  # Rows per transaction
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(1024 * 1024)))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))  # Reported, the rest are only counted
+
+# On-disk cache of cover images served by /mangas/{name}/cover
+COVER_CACHE_MAX_BYTES = int(os.getenv("COVER_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+COVER_MAX_FILE_BYTES = int(os.getenv("COVER_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+COVER_FETCH_CONCURRENCY = int(os.getenv("COVER_FETCH_CONCURRENCY", "4"))
+COVER_MAX_AGE = int(os.getenv("COVER_MAX_AGE", str(7 * 24 * 60 * 60)))  # Cache-Control max-age, seconds
+# Hosts covers may be downloaded from besides the providers' own sites and image CDNs, subdomains included
+COVER_ALLOWED_HOSTS = [host.strip() for host in os.getenv("COVER_ALLOWED_HOSTS", "").split(",") if host.strip()]
+
+# Per-request stage timings, sent back as Server-Timing to requests carrying PROFILE_HEADER
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "1") == "1"
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+
+# Several uvicorn workers sharing one database, uvicorn reads the same variable for --workers
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+CHANGE_POLL_INTERVAL = float(os.getenv("CHANGE_POLL_INTERVAL", "0.5"))  # Seconds between checks for other workers' writes
+LEADER_RETRY_INTERVAL = float(os.getenv("LEADER_RETRY_INTERVAL", "5"))  # Seconds between tries to become the leader
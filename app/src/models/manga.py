@@ -1,17 +1,69 @@
-from pydantic import BaseModel
+import re
+from pydantic import BaseModel, field_validator
 from datetime import datetime
-from typing import List
+from typing import List, Optional
+
+# Placeholders the scrapers fill in for a field the page lacks, stored as NULL
+MISSING_VALUES = frozenset({
+    "No link found", "No image link found", "No author found", "No status found",
+    "Description not found", "No description found", "No chapter found", "No last chapter found",
+    "No chapter URL found", "No link to last chapter found", "No views found",
+})
+_VIEWS = re.compile(r"(\d+(?:\.\d+)?)\s*([kmb]?)", re.IGNORECASE)
+_VIEWS_SCALE = {"": 1, "k": 1_000, "m": 1_000_000, "b": 1_000_000_000}
+_CHAPTER_NUMBER = re.compile(r"(\d+(?:\.\d+)?)")
+
+
+def parse_views(value) -> Optional[int]:
+    """View count from the text of a page, such as "693,958" or "1.2M", None when there is none."""
+    if value is None or isinstance(value, int):
+        return value
+    match = _VIEWS.search(str(value).replace(",", ""))
+    if not match:
+        return None
+    return int(float(match.group(1)) * _VIEWS_SCALE[match.group(2).lower()])
+
+
+def split_authors(value: Optional[str]) -> List[str]:
+    """Names in an authors field, which lists co-authors separated by commas."""
+    return [name.strip() for name in re.split(r"[,;]", value or "") if name.strip()]
+
+
+def parse_chapter_number(value: Optional[str]) -> Optional[float]:
+    """Number of a chapter title such as "Chapter 10.5", None when it has none."""
+    match = _CHAPTER_NUMBER.search(value or "")
+    return float(match.group(1)) if match else None
+
 
 class Manga(BaseModel):
     url: str
     name: str
-    image_link : str
-    authors: str
-    status: str
+    image_link : Optional[str]
+    authors: Optional[str]
+    status: Optional[str]
     genres: List[str]
-    views: str
+    views: Optional[int]
     rating: float
-    description: str
-    last_chapter: str
-    last_chapter_url: str
-    last_chapter_release_date: datetime
\ No newline at end of file
+    description: Optional[str]
+    last_chapter: Optional[str]
+    last_chapter_url: Optional[str]
+    last_chapter_release_date: Optional[datetime] = None  # Not every page shows one
+    source: Optional[str] = None  # Provider the details were scraped from
+
+    @field_validator(
+        "image_link", "authors", "status", "description", "last_chapter", "last_chapter_url", mode="before"
+    )
+    @classmethod
+    def _missing_to_none(cls, value):
+        return None if isinstance(value, str) and value in MISSING_VALUES else value
+
+    @field_validator("views", mode="before")
+    @classmethod
+    def _parse_views(cls, value):
+        return parse_views(value)
+
+
+class MangaRecord(Manga):
+    """A stored manga, as returned by the API."""
+    id: int
+    last_chapter_number: Optional[float] = None
@@ -0,0 +1,42 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+class MangaPage(BaseModel):
+    items: List[Dict[str, Any]]  # MangaRecord fields, only the requested ones
+    next_cursor: Optional[str] = None
+
+class SearchHit(BaseModel):
+    name: str
+    authors: Optional[str]
+    genres: List[str]
+    last_chapter: Optional[str]
+    snippet: str
+    rank: float
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_offset: Optional[int] = None
+
+class FacetCount(BaseModel):
+    name: str
+    count: int  # Stored mangas with this genre or author
+
+class FacetPage(BaseModel):
+    items: List[FacetCount]
+    next_offset: Optional[int] = None
+
+class ChapterEvent(BaseModel):
+    id: int
+    name: str
+    chapter: str
+    chapter_url: str
+    released_at: Optional[str] = None
+    detected_at: int  # Unix time in seconds
+
+class ChapterEventPage(BaseModel):
+    items: List[ChapterEvent]
+    next_cursor: Optional[str] = None
+    has_more: bool
+
+class Message(BaseModel):
+    message: str
@@ -1,5 +1,9 @@
-__all__ = ['MangaManager', 'DatabaseManager', 'ServiceHandler']
+__all__ = ['MangaManager', 'DatabaseManager', 'ServiceHandler', 'RefreshEngine', 'ConnectionPool', 'HttpClient', 'ProviderRegistry']
 
 from app.src.scripts.mangaAPI_Demonicscans import MangaManager
+from app.src.scripts.connection_pool import ConnectionPool
+from app.src.scripts.http_client import HttpClient
 from app.src.scripts.database_manager import DatabaseManager
-from app.src.scripts.service_handler import ServiceHandler
\ No newline at end of file
+from app.src.scripts.service_handler import ServiceHandler
+from app.src.scripts.refresh_engine import RefreshEngine
+from app.src.scripts.providers import ProviderRegistry
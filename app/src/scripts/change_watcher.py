@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import Executor
+from typing import Callable, Optional
+from app.src import config
+from app.src.scripts.database_manager import get_pool
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeWatcher:
+    """Notices commits other processes make to the library database.
+
+    `PRAGMA data_version` on a connection changes whenever another connection
+    committed, reading it touches no table and costs next to nothing while
+    nothing changed. It is checked on one dedicated connection every
+    `interval` seconds. When the library version moved as well `on_change`
+    is called, commits of this process are seen too and simply call it again.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        on_change: Callable[[], None],
+        interval: float = config.CHANGE_POLL_INTERVAL,
+    ):
+        # The database executor, the checks stay off the event loop
+        self.executor = executor
+        self.on_change = on_change
+        self.interval = interval
+        self.data_version: Optional[int] = None
+        self.library_version: Optional[int] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _check(self) -> bool:
+        """Whether the library changed since the last check."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(get_pool().db_path, check_same_thread=False)
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self.data_version:
+            return False
+        self.data_version = data_version
+        library_version = self._conn.execute("SELECT version FROM library_version WHERE id = 1").fetchone()[0]
+        changed = self.library_version is not None and library_version != self.library_version
+        self.library_version = library_version
+        return changed
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if await loop.run_in_executor(self.executor, self._check):
+                    self.on_change()
+            except Exception:
+                logger.exception("Checking the database for changes failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._conn is not None:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._conn.close)
+            self._conn = None
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Optional, Set
+from app.src import config
+
+logger = logging.getLogger(__name__)
+
+
+class _Subscriber:
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+
+class ChapterFeed:
+    """Fans the rows appended to chapter_events out to every subscriber.
+
+    Writers call `notify` after committing, the feed then reads the events
+    past the last id it has seen and puts them on each subscriber's queue.
+    Subscribers that fall a whole queue behind are dropped, they resume from
+    their last event id and catch up from the table.
+    """
+
+    def __init__(
+        self,
+        run_db: Callable[..., Awaitable],
+        queue_size: int = config.STREAM_QUEUE_SIZE,
+        replay_page: int = config.STREAM_REPLAY_PAGE,
+    ):
+        # ServiceHandler._run_db, the reads go through the database executor
+        self.run_db = run_db
+        self.queue_size = queue_size
+        self.replay_page = replay_page
+        self.last_id: Optional[int] = None
+        self._subscribers: Set[_Subscriber] = set()
+        self._pending = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    async def start(self):
+        """Start from the newest event, older ones are only sent on replay."""
+        self.last_id = await self.run_db("last_chapter_event_id")
+
+    def notify(self):
+        """Look for new events soon, calls made while a read is running are coalesced."""
+        self._pending = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._drain())
+
+    async def close(self):
+        """Stop reading events, the database may be going away."""
+        self._pending = False
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _drain(self):
+        while self._pending:
+            self._pending = False
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Reading new chapter events failed")
+
+    async def poll(self):
+        """Publish every event appended since the last poll."""
+        if self.last_id is None:
+            await self.start()
+            return
+        while True:
+            events = await self.run_db("get_chapter_events_after", self.last_id, self.replay_page)
+            for event in events:
+                self._publish(event)
+            if events:
+                self.last_id = events[-1]["id"]
+            if len(events) < self.replay_page:
+                return
+
+    def _publish(self, event: dict):
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscriber.dropped = True
+                self._subscribers.discard(subscriber)
+
+    async def subscribe(
+        self, last_event_id: Optional[int] = None, keepalive: float = config.STREAM_KEEPALIVE
+    ) -> AsyncIterator[Optional[dict]]:
+        """Yield new chapter events, None after `keepalive` idle seconds.
+
+        With `last_event_id` the events after it are replayed first. The
+        iterator ends when the subscriber is dropped for falling behind.
+        """
+        subscriber = _Subscriber(self.queue_size)
+        # Subscribe before replaying so nothing committed in between is missed
+        self._subscribers.add(subscriber)
+        try:
+            sent_id = last_event_id or 0
+            if last_event_id is not None:
+                while True:
+                    events = await self.run_db("get_chapter_events_after", sent_id, self.replay_page)
+                    for event in events:
+                        yield event
+                    if events:
+                        sent_id = events[-1]["id"]
+                    if len(events) < self.replay_page:
+                        break
+            while not (subscriber.dropped and subscriber.queue.empty()):
+                try:
+                    # Not wait_for, on Python 3.11 it can swallow a cancel racing the get and the webhook never stops
+                    async with asyncio.timeout(keepalive):
+                        event = await subscriber.queue.get()
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event["id"] > sent_id:
+                    sent_id = event["id"]
+                    yield event
+        finally:
+            self._subscribers.discard(subscriber)
@@ -0,0 +1,109 @@
+import queue
+import sqlite3
+import threading
+from typing import Callable, List, Optional
+from app.src import config
+
+
+class PoolTimeoutError(Exception):
+    """Every connection stayed in use for the whole acquire timeout."""
+
+
+class ConnectionPool:
+    """Process-wide pool of long-lived SQLite connections.
+
+    Connections are opened lazily up to `size` and handed out one caller at a
+    time. Each one keeps its own prepared statement cache, so statements are
+    compiled once per connection instead of once per request. Long reads,
+    such as exports, get a connection of their own from `open_reader`.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        size: int = config.DB_POOL_SIZE,
+        journal_mode: str = config.DB_JOURNAL_MODE,
+        synchronous: str = config.DB_SYNCHRONOUS,
+        cache_size_kb: int = config.DB_CACHE_SIZE_KB,
+        mmap_size: int = config.DB_MMAP_SIZE,
+        cached_statements: int = config.DB_CACHED_STATEMENTS,
+        busy_timeout: float = config.DB_BUSY_TIMEOUT,
+        acquire_timeout: float = config.DB_ACQUIRE_TIMEOUT,
+        initializer: Optional[Callable[[sqlite3.Connection], None]] = None,
+    ):
+        self.db_path = db_path
+        self.size = size
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+        self.acquire_timeout = acquire_timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        if initializer:
+            # Run the one-time setup (schema creation) on the first connection
+            connection = self.acquire()
+            try:
+                initializer(connection)
+            finally:
+                self.release(connection)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.db_path,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            check_same_thread=False,  # Connections move between executor threads
+            cached_statements=self.cached_statements,
+            # Other workers may hold the write lock, wait for it instead of failing with "database is locked"
+            timeout=self.busy_timeout,
+        )
+        connection.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        connection.execute(f"PRAGMA cache_size=-{self.cache_size_kb}")
+        connection.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        connection.execute("PRAGMA temp_store=MEMORY")
+        return connection
+
+    def acquire(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        """Take an idle connection, opening a new one while below the pool size.
+
+        Waits up to `timeout` seconds, the pool's acquire timeout by default,
+        for one to be released, then raises PoolTimeoutError.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._connections) < self.size:
+                connection = self._connect()
+                self._connections.append(connection)
+                return connection
+        timeout = self.acquire_timeout if timeout is None else timeout
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(f"No database connection was free within {timeout:g}s.") from None
+
+    def open_reader(self) -> sqlite3.Connection:
+        """Open a read-only connection outside the pool, the caller closes it."""
+        connection = self._connect()
+        connection.execute("PRAGMA query_only=ON")
+        return connection
+
+    def release(self, connection: sqlite3.Connection):
+        """Give a connection back, discarding anything left uncommitted."""
+        if connection.in_transaction:
+            connection.rollback()
+        self._idle.put(connection)
+
+    def close(self):
+        """Close every connection opened by the pool."""
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+            self._idle = queue.LifoQueue()
@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Set
+import httpx
+from app.src import config
+from app.src.scripts.database_manager import DatabaseManager
+from app.src.scripts.http_client import FetchError, HttpClient
+from app.src.scripts.metrics import COVER_CACHE
+
+logger = logging.getLogger(__name__)
+
+
+class CoverFile(NamedTuple):
+    path: str
+    digest: str  # sha256 of the image, also its file name
+    content_type: str
+    size: int
+
+
+class CoverCache:
+    """Size-bounded, content-addressed on-disk cache of cover images, keyed by image url.
+
+    Images are stored once per content hash under `directory`, an index maps
+    each remote url to its file. The least recently served images are evicted
+    once the files exceed `max_bytes`. Only urls on one of the
+    `allowed_hosts`, or their subdomains, are downloaded.
+    """
+
+    def __init__(
+        self,
+        http_client: HttpClient,
+        directory: Optional[str] = None,
+        max_bytes: int = config.COVER_CACHE_MAX_BYTES,
+        max_file_bytes: int = config.COVER_MAX_FILE_BYTES,
+        concurrency: int = config.COVER_FETCH_CONCURRENCY,
+        allowed_hosts: Callable[[], Iterable[str]] = lambda: config.COVER_ALLOWED_HOSTS,
+    ):
+        self.http_client = http_client
+        # Called on every download, the providers' base urls may change at runtime
+        self.allowed_hosts = allowed_hosts
+        self.directory = directory or os.path.join(os.path.dirname(DatabaseManager.default_db_path()), "covers")
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._slots = asyncio.Semaphore(concurrency)
+        # Downloads in progress by url, so concurrent requests for one cover share it
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # Background prefetches, referenced so they are not garbage collected mid-download
+        self._prefetching: Set[asyncio.Task] = set()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(self.directory, "index.db"), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS covers (
+                    url TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    content_type TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_covers_accessed_at ON covers (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_covers_digest ON covers (digest)")
+        # Several urls may share one file, count each file once
+        self.total_bytes = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM covers)"
+        ).fetchone()[0]
+        return conn
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _lookup(self, url: str) -> Optional[CoverFile]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT digest, content_type, size FROM covers WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            digest, content_type, size = row
+            if not os.path.exists(self._path(digest)):
+                # Deleted behind our back, fetch it again
+                with self.conn:
+                    self.conn.execute("DELETE FROM covers WHERE url = ?", (url,))
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE covers SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        return CoverFile(self._path(digest), digest, content_type, size)
+
+    def _store(self, url: str, content: bytes, content_type: str) -> CoverFile:
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        with self._lock, self.conn:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Written aside then renamed, readers never see a partial file
+                fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+                with os.fdopen(fd, "wb") as temp_file:
+                    temp_file.write(content)
+                os.replace(temp_path, path)
+            known = self.conn.execute("SELECT 1 FROM covers WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+            previous = self.conn.execute("SELECT digest, size FROM covers WHERE url = ?", (url,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO covers VALUES (?, ?, ?, ?, ?)",
+                (url, digest, content_type, len(content), time.time()),
+            )
+            if not known:
+                self.total_bytes += len(content)
+            if previous and previous[0] != digest:
+                self._release(*previous)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+        return CoverFile(path, digest, content_type, len(content))
+
+    def _release(self, digest: str, size: int):
+        """Delete an image file once no url points at it any more."""
+        if self.conn.execute("SELECT 1 FROM covers WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return
+        try:
+            os.remove(self._path(digest))
+        except FileNotFoundError:
+            pass
+        self.total_bytes -= size
+
+    def _evict(self):
+        # Drop least recently served covers until back under 90% of the budget
+        target = self.max_bytes * 0.9
+        for url, digest, size in self.conn.execute(
+            "SELECT url, digest, size FROM covers ORDER BY accessed_at"
+        ).fetchall():
+            if self.total_bytes <= target:
+                break
+            self.conn.execute("DELETE FROM covers WHERE url = ?", (url,))
+            self._release(digest, size)
+
+    def _is_allowed(self, url: str) -> bool:
+        """Whether the url is on an allowed host, so image links cannot point the server anywhere else."""
+        try:
+            host = httpx.URL(url).host
+        except httpx.InvalidURL:
+            return False
+        return any(host == allowed or host.endswith("." + allowed) for allowed in self.allowed_hosts())
+
+    async def _read_capped(self, url: str, response: httpx.Response) -> Optional[bytes]:
+        """Read the body, giving up as soon as it grows past `max_file_bytes`."""
+        declared = response.headers.get("Content-Length", "")
+        if declared.isdigit() and int(declared) > self.max_file_bytes:
+            logger.warning("Cover %s is larger than %d bytes, not cached", url, self.max_file_bytes)
+            return None
+        content = bytearray()
+        async for chunk in response.aiter_bytes():
+            content += chunk
+            if len(content) > self.max_file_bytes:
+                logger.warning("Cover %s is larger than %d bytes, not cached", url, self.max_file_bytes)
+                return None
+        return bytes(content)
+
+    async def _download(self, url: str) -> Optional[CoverFile]:
+        async with self._slots:
+            try:
+                # Not redirected, the target could be any host
+                response = await self.http_client.get(url, stream=True, follow_redirects=False)
+            except FetchError as e:
+                logger.warning("Cover download failed: %s", e)
+                return None
+            try:
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+                if response.status_code != 200 or not content_type.startswith("image/"):
+                    logger.warning(
+                        "Cover %s answered HTTP %d with %s", url, response.status_code, content_type or "no type"
+                    )
+                    return None
+                content = await self._read_capped(url, response)
+            except httpx.HTTPError as e:
+                logger.warning("Cover download failed: %s", e)
+                return None
+            finally:
+                await response.aclose()
+        if content is None:
+            return None
+        return await asyncio.to_thread(self._store, url, content, content_type)
+
+    async def get(self, url: Optional[str]) -> Optional[CoverFile]:
+        """Return the cached cover for an image url, downloading it first when needed."""
+        if not url or not url.startswith(("http://", "https://")):
+            return None  # Placeholders such as "No image link found"
+        if not self._is_allowed(url):
+            logger.warning("Cover %s is not on an allowed host, not downloaded", url)
+            return None
+        cover = await asyncio.to_thread(self._lookup, url)
+        COVER_CACHE.inc(result="hit" if cover else "miss")
+        if cover:
+            return cover
+        task = self._in_flight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._download(url))
+            self._in_flight[url] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def _prefetch(self, url: str):
+        try:
+            await self.get(url)
+        except Exception:
+            logger.exception("Caching cover %s failed", url)
+
+    def prefetch(self, urls: Iterable[str]):
+        """Download covers in the background, errors are only logged."""
+        for url in set(urls):
+            task = asyncio.ensure_future(self._prefetch(url))
+            self._prefetching.add(task)
+            task.add_done_callback(self._prefetching.discard)
+
+    async def close(self):
+        """Wait for downloads in progress and close the index."""
+        await asyncio.gather(*self._prefetching, *self._in_flight.values(), return_exceptions=True)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,183 +1,563 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+import base64
+import hashlib
+import json
+import re
 import sqlite3
 import os
-from typing import List
-from app.src.models.manga import Manga
+from typing import Iterator, List, Optional
+from app.src import config
+from app.src.models.manga import Manga, parse_chapter_number, split_authors
+from app.src.scripts.connection_pool import ConnectionPool
+from app.src.scripts.file_lock import FileLock
+from app.src.scripts.migrations import migrate
 
 
-# Define a date adapter and converter
+# Define a date adapter
 def adapt_datetime(dt: datetime) -> str:
     return dt.isoformat()  # Convert datetime to ISO format string
 
 
-def convert_datetime(iso_string: str) -> datetime:
-    return datetime.fromisoformat(iso_string)  # Convert ISO string back to datetime
+# Register the adapter
+sqlite3.register_adapter(datetime, adapt_datetime)
 
 
-# Register the adapter and converter
-sqlite3.register_adapter(datetime, adapt_datetime)
-sqlite3.register_converter("datetime", convert_datetime)
+# Columns of the mangas table, in storage order
+MANGA_COLUMNS = (
+    "id", "url", "name", "image_link", "authors", "status", "genres", "views", "rating",
+    "description", "last_chapter", "last_chapter_url", "last_chapter_release_date", "source",
+    "fingerprint", "last_chapter_number",
+)
+# Columns returned by the API, the fingerprint stays internal
+PUBLIC_COLUMNS = tuple(column for column in MANGA_COLUMNS if column != "fingerprint")
+# Columns the listing can be sorted on, each backed by an index
+SORT_COLUMNS = ("name", "last_chapter_release_date", "rating", "id")
+# Columns that may be NULL among the sortable ones, NULLs sort first
+NULLABLE_SORT_COLUMNS = ("last_chapter_release_date",)
+
+# Normalized facets of a manga: link table and its key column, by facet table
+FACETS = {
+    "genres": ("manga_genres", "genre_id"),
+    "authors": ("manga_authors", "author_id"),
+}
+# Above this many mangas a facet filter walks the sort index and probes the links,
+# below it the linked mangas are fetched and sorted, whichever reads fewer rows
+FACET_PROBE_MIN_COUNT = 2000
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(value: Optional[datetime]) -> Optional[int]:
+    """Unix time of a datetime as stored, naive ones are taken as UTC."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // timedelta(seconds=1)
+
+
+def from_epoch(value: Optional[int]) -> Optional[datetime]:
+    """Naive UTC datetime of a stored Unix time."""
+    return None if value is None else _EPOCH + timedelta(seconds=value)
+
+
+def _to_record(row: dict) -> dict:
+    """Shape a row as a MangaRecord, genres back as a list and the release date in ISO format."""
+    if "genres" in row:
+        row["genres"] = [genre for genre in row["genres"].split(", ") if genre]
+    released = row.get("last_chapter_release_date")
+    if released is not None:
+        row["last_chapter_release_date"] = from_epoch(released).isoformat()
+    return row
+
+
+def _keyset_condition(column: str, descending: bool, value) -> tuple:
+    """WHERE clause and parameters selecting the rows after a cursor in the listing order.
+
+    NULLs sort first ascending and last descending. Row values never match a
+    NULL, so the NULLs after a non-NULL cursor of a descending listing are
+    left for the caller to read separately, keeping this an index range.
+    """
+    sort_value, row_id = value
+    after = "<" if descending else ">"
+    if sort_value is not None:
+        return f"({column}, id) {after} (?, ?)", [sort_value, row_id]
+    condition = f"({column} IS NULL AND id {after} ?)"
+    return (condition if descending else f"({condition} OR {column} IS NOT NULL)"), [row_id]
+
+
+def _encode_cursor(sort_value, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
 
 
 class DatabaseManager:
-    def __init__(self):
-        self.current_directory = os.path.dirname(
-            os.path.dirname(os.path.dirname(__file__))
-        )
-        self.db_name = "Mangas.db"
-        self.db_directory = os.path.join(
-            self.current_directory, "databases"
-        )  # databases folder at project root
-        self.db_path = os.path.join(self.db_directory, self.db_name)
-        # Create the "databases" directory if it doesn't exist
-        if not os.path.exists(self.db_directory):
-            os.makedirs(self.db_directory)
+    def __init__(self, pool: ConnectionPool = None):
+        # Connections come from the process-wide pool unless one is given
+        self.pool = pool
         # Initialize the connection and cursor
         self.conn = None
         self.cursor = None    
+        # True for a read-only connection of its own, closed instead of returned to the pool
+        self.reader = False
         
     def connect(self):
-        """Open the database connection."""
-        self.conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-        # Register the custom converter
-        sqlite3.register_converter("datetime", self._convert_datetime)
+        """Borrow a connection from the pool."""
+        self.pool = self.pool or get_pool()
+        self.conn = self.pool.acquire()
+        self.cursor = self.conn.cursor()
+
+    def connect_reader(self):
+        """Open a read-only connection outside the pool, for reads that take as long as a client does."""
+        self.pool = self.pool or get_pool()
+        self.conn = self.pool.open_reader()
         self.cursor = self.conn.cursor()
+        self.reader = True
 
     @staticmethod
-    def _convert_datetime(value):
-        """Custom converter to handle both timestamp and DATETIME formats."""
-        if isinstance(value, bytes):
-            value = value.decode("utf-8")
-        # Try to parse as standard DATETIME format (YYYY-MM-DD HH:MM:SS)
-        try:
-            parsed_datetime = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
-            # Return the datetime formatted as a string in the desired format
-            return parsed_datetime.strftime("%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            # Try to parse ISO format "YYYY-MM-DDTHH:MM:SS"
-            try:
-                parsed_datetime = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
-                # Return the datetime formatted as a string in the desired format
-                return parsed_datetime.strftime("%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                raise ValueError(f"Unrecognized datetime format: {value}")
+    def default_db_path() -> str:
+        """Return the path of Mangas.db, creating the databases folder if needed."""
+        if config.DB_PATH:
+            os.makedirs(os.path.dirname(os.path.abspath(config.DB_PATH)), exist_ok=True)
+            return config.DB_PATH
+        current_directory = os.path.dirname(
+            os.path.dirname(os.path.dirname(__file__))
+        )
+        db_directory = os.path.join(current_directory, "databases")  # databases folder at project root
+        # Create the "databases" directory if it doesn't exist
+        if not os.path.exists(db_directory):
+            os.makedirs(db_directory)
+        return os.path.join(db_directory, "Mangas.db")
 
     def _initialize_tables(self):
-        self.cursor.execute(
-            """CREATE TABLE IF NOT EXISTS mangas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                url TEXT NOT NULL,
-                name TEXT NOT NULL,
-                image_link TEXT NOT NULL,
-                authors TEXT NOT NULL,
-                status TEXT NOT NULL,
-                genres TEXT NOT NULL,  -- List of strings, will store as comma-separated values
-                views TEXT NOT NULL,
-                rating REAL NOT NULL,
-                description TEXT NOT NULL,
-                last_chapter TEXT NOT NULL,
-                last_chapter_url TEXT NOT NULL,
-                last_chapter_release_date TEXT NOT NULL
-            )"""
+        """Create the schema or bring it up to date."""
+        migrate(self.conn)
+
+    @staticmethod
+    def _fingerprint(content: tuple) -> str:
+        """Hash of the scraped fields, equal fingerprints mean nothing to write."""
+        return hashlib.blake2b(repr(content).encode("utf-8"), digest_size=16).hexdigest()
+
+    @classmethod
+    def _manga_row(cls, manga: Manga) -> tuple:
+        row = (
+            manga.url,
+            manga.name,
+            manga.image_link,
+            manga.authors,
+            manga.status,
+            ', '.join(manga.genres),  # Convert genres list to a comma-separated string
+            manga.views,
+            manga.rating,
+            manga.description,
+            manga.last_chapter,
+            manga.last_chapter_url,
+            to_epoch(manga.last_chapter_release_date),
+            manga.source,
         )
-        self.conn.commit()
+        # The url is part of it, a title found on another provider is a change even with the same details
+        return row + (cls._fingerprint((row[0],) + row[2:-1]), parse_chapter_number(manga.last_chapter))
 
-    def _manga_exists(self, manga_name: str) -> bool:
-        self.cursor.execute("SELECT COUNT(*) FROM mangas WHERE name = ?", (manga_name,))
-        count = self.cursor.fetchone()[0]
-        return count > 0  # Returns True if the manga exists
+    # Single statement insert-or-update keyed on the unique name index,
+    # rows whose content fingerprint is unchanged are left untouched
+    UPSERT_SQL = '''INSERT INTO mangas (
+            url, name, image_link, authors, status, genres, views, rating, 
+            description, last_chapter, last_chapter_url, 
+            last_chapter_release_date, source, fingerprint, last_chapter_number
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (name) DO UPDATE
+        SET url = excluded.url,
+            image_link = excluded.image_link,
+            authors = excluded.authors, 
+            status = excluded.status, 
+            genres = excluded.genres, 
+            views = excluded.views, 
+            rating = excluded.rating, 
+            description = excluded.description, 
+            last_chapter = excluded.last_chapter, 
+            last_chapter_url = excluded.last_chapter_url, 
+            last_chapter_release_date = excluded.last_chapter_release_date,
+            source = COALESCE(excluded.source, source),
+            fingerprint = excluded.fingerprint,
+            last_chapter_number = excluded.last_chapter_number
+        WHERE fingerprint IS NOT excluded.fingerprint'''
 
     def store_manga_data(self, manga: Manga):
         """Insert or update manga data in the database, now including `image_link`."""
-        if not self._manga_exists(manga.name):
-            # Convert genres list to a comma-separated string
-            genres_str = ', '.join(manga.genres)
-            self.cursor.execute(
-                '''INSERT INTO mangas (
-                    url, name, image_link, authors, status, genres, views, rating, 
-                    description, last_chapter, last_chapter_url, 
-                    last_chapter_release_date
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                (
-                    manga.url,
-                    manga.name,
-                    manga.image_link,
-                    manga.authors,
-                    manga.status,
-                    genres_str,
-                    manga.views,
-                    manga.rating,
-                    manga.description,
-                    manga.last_chapter,
-                    manga.last_chapter_url,
-                    manga.last_chapter_release_date
-                )
-            )
-            self.conn.commit()
+        # An UPSERT update leaves last_insert_rowid() untouched, a fresh insert moves it
+        previous_rowid = self.cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+        self.cursor.execute(self.UPSERT_SQL + " RETURNING id, last_insert_rowid()", self._manga_row(manga))
+        written = self.cursor.fetchone()
+        if written is not None:
+            self._link_facets(written[0], manga)
+        self.conn.commit()
+        if written is None:
+            return f"Manga: {manga.name} unchanged."
+        if written[1] != previous_rowid:
             return f"Manga: {manga.name} stored successfully."
-        else:
-            # If manga exists, update the existing record
-            genres_str = ', '.join(manga.genres)  # Convert genres list to a comma-separated string
+        return f"Manga: {manga.name} updated successfully."
+
+    def store_many(self, mangas: List[Manga]) -> int:
+        """Upsert a whole batch of mangas in one transaction, returns the number of rows written."""
+        written = 0
+        with self.conn:
+            for manga in mangas:
+                row = self.cursor.execute(self.UPSERT_SQL + " RETURNING id", self._manga_row(manga)).fetchone()
+                if row is not None:
+                    written += 1
+                    self._link_facets(row[0], manga)
+        return written
+
+    # Refreshes only update, a title removed while its page was being scraped stays removed
+    UPDATE_SQL = '''UPDATE mangas
+        SET url = ?, image_link = ?, authors = ?, status = ?, genres = ?, views = ?, rating = ?,
+            description = ?, last_chapter = ?, last_chapter_url = ?, last_chapter_release_date = ?,
+            source = COALESCE(?, source), fingerprint = ?, last_chapter_number = ?
+        WHERE id = ?'''
+
+    def update_many(self, mangas: List[Manga]) -> List[str]:
+        """Update the stored rows of a batch of mangas in one transaction, never inserting.
+
+        Returns the outcome of each manga: updated, unchanged or removed.
+        """
+        outcomes = []
+        with self.conn:
+            for manga in mangas:
+                row = self._manga_row(manga)
+                stored = self.cursor.execute(
+                    "SELECT id, fingerprint FROM mangas WHERE name = ?", (manga.name,)
+                ).fetchone()
+                if stored is None:
+                    outcomes.append("removed")
+                elif stored[1] == row[13]:
+                    outcomes.append("unchanged")
+                elif self.cursor.execute(self.UPDATE_SQL, (row[0], *row[2:], stored[0])).rowcount == 0:
+                    outcomes.append("removed")  # By another worker, since the SELECT
+                else:
+                    self._link_facets(stored[0], manga)
+                    outcomes.append("updated")
+        return outcomes
+
+    def _link_facets(self, manga_id: int, manga: Manga):
+        """Point the genre and author links of a written manga at its current ones."""
+        for table, names in (("genres", manga.genres), ("authors", split_authors(manga.authors))):
+            link_table, key = FACETS[table]
+            names = [name.strip() for name in names if name.strip()]
+            self.cursor.execute(f"DELETE FROM {link_table} WHERE manga_id = ?", (manga_id,))
+            if not names:
+                continue
+            self.cursor.executemany(
+                f"INSERT INTO {table} (name) VALUES (?) ON CONFLICT (name) DO NOTHING", [(name,) for name in names]
+            )
             self.cursor.execute(
-                '''UPDATE mangas 
-                SET image_link = ?,
-                    authors = ?, 
-                    status = ?, 
-                    genres = ?, 
-                    views = ?, 
-                    rating = ?, 
-                    description = ?, 
-                    last_chapter = ?, 
-                    last_chapter_url = ?, 
-                    last_chapter_release_date = ?
-                WHERE name = ?''', 
-                (
-                    manga.image_link,
-                    manga.authors,
-                    manga.status,
-                    genres_str,
-                    manga.views,
-                    manga.rating,
-                    manga.description,
-                    manga.last_chapter,
-                    manga.last_chapter_url,
-                    manga.last_chapter_release_date,
-                    manga.name  # Use the unique identifier (e.g., name or URL)
-                )
+                f"""INSERT OR IGNORE INTO {link_table} ({key}, manga_id)
+                SELECT id, ? FROM {table} WHERE name IN ({', '.join('?' * len(names))})""",
+                (manga_id, *names),
             )
-            self.conn.commit()
-            return f"Manga: {manga.name} updated successfully."
 
-    def remove_manga_data(self, manga_name: str):
-        if self._manga_exists(manga_name):
-            self.cursor.execute("""DELETE FROM mangas WHERE name = ?""", (manga_name,))
-            self.conn.commit()
+    def remove_manga_data(self, manga_name: str) -> bool:
+        """Delete a manga, returns False when none was stored under that name."""
+        self.cursor.execute("""DELETE FROM mangas WHERE name = ?""", (manga_name,))
+        self.conn.commit()
+        return self.cursor.rowcount > 0
 
     def get_manga(self, manga_name: str):
-        if self._manga_exists(manga_name):
-            self.cursor.execute("SELECT * FROM mangas WHERE name = ?", (manga_name,))
-            result = self.cursor.fetchone()
-            return result
-        else:
+        self.cursor.execute("SELECT * FROM mangas WHERE name = ?", (manga_name,))
+        result = self.cursor.fetchone()
+        if result is None:
             return "No manga found with that name."
+        return result
         
     def get_all(self):
         self.cursor.execute("SELECT * FROM mangas")
         result = self.cursor.fetchall()
         return result
 
+    def get_refresh_rows(self) -> List[dict]:
+        """Return what refreshing and scheduling a title needs, for every stored manga.
+
+        The release date stays a Unix time, as stored.
+        """
+        columns = ("name", "status", "last_chapter_release_date", "source")
+        self.cursor.execute(f"SELECT {', '.join(columns)} FROM mangas")
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+
+    def iter_records(self, chunk_size: int = 1000) -> Iterator[List[dict]]:
+        """Yield every manga as MangaRecord dicts, `chunk_size` rows at a time, from one snapshot.
+
+        Rows are read off the cursor as the chunks are consumed, so memory use
+        does not grow with the library. Close the iterator before the connection.
+        """
+        self.cursor.execute("BEGIN")
+        try:
+            self.cursor.execute(f"SELECT {', '.join(PUBLIC_COLUMNS)} FROM mangas ORDER BY id")
+            while True:
+                rows = self.cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield [_to_record(dict(zip(PUBLIC_COLUMNS, row))) for row in rows]
+        finally:
+            self.conn.commit()
+
+    def library_version(self) -> int:
+        """Counter bumped by every change to mangas."""
+        return self.cursor.execute("SELECT version FROM library_version WHERE id = 1").fetchone()[0]
+
+    def get_manga_record(self, manga_name: str) -> Optional[dict]:
+        """Return one manga shaped as a MangaRecord plus its fingerprint, None when missing."""
+        columns = (*PUBLIC_COLUMNS, "fingerprint")
+        row = self.cursor.execute(
+            f"SELECT {', '.join(columns)} FROM mangas WHERE name = ?", (manga_name,)
+        ).fetchone()
+        return _to_record(dict(zip(columns, row))) if row else None
+
+    def get_all_records(self) -> tuple:
+        """Return (library version, every manga as a MangaRecord dict), read from one snapshot."""
+        self.cursor.execute("BEGIN")
+        try:
+            version = self.library_version()
+            self.cursor.execute(f"SELECT {', '.join(PUBLIC_COLUMNS)} FROM mangas")
+            records = [_to_record(dict(zip(PUBLIC_COLUMNS, row))) for row in self.cursor]
+        finally:
+            self.conn.commit()
+        return version, records
+
+    def query_mangas(
+        self,
+        status: Optional[str] = None,
+        genre: Optional[str] = None,
+        author: Optional[str] = None,
+        released_after: Optional[datetime] = None,
+        released_before: Optional[datetime] = None,
+        sort: str = "name",
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> dict:
+        """Return one page of mangas matching the filters, using keyset pagination.
+
+        `sort` is a column from SORT_COLUMNS, prefixed with "-" for descending
+        order. The returned `next_cursor` continues after the last item.
+        """
+        descending = sort.startswith("-")
+        sort_column = sort.lstrip("-")
+        if sort_column not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort on {sort_column}, use one of {', '.join(SORT_COLUMNS)}.")
+        fields = fields or list(PUBLIC_COLUMNS)
+        unknown_fields = [field for field in fields if field not in PUBLIC_COLUMNS]
+        if unknown_fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown_fields)}.")
+        # The sort column and id are always read to build the next cursor
+        select_columns = list(dict.fromkeys(["id", sort_column, *fields]))
+
+        conditions, params = [], []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        # Facets match whole names, case insensitively, through their link tables
+        for facet, name in (("genres", genre), ("authors", author)):
+            if name:
+                condition = self._facet_condition(facet, name)
+                if condition is None:
+                    return {"items": [], "next_cursor": None}
+                conditions.append(condition[0])
+                params.append(condition[1])
+        if released_after:
+            conditions.append("last_chapter_release_date >= ?")
+            params.append(to_epoch(released_after))
+        if released_before:
+            conditions.append("last_chapter_release_date < ?")
+            params.append(to_epoch(released_before))
+        direction = "DESC" if descending else "ASC"
+
+        def select(extra_condition: Optional[str], extra_params: list, count: int) -> List[dict]:
+            where = conditions + [extra_condition] if extra_condition else conditions
+            query = f"SELECT {', '.join(select_columns)} FROM mangas"
+            if where:
+                query += " WHERE " + " AND ".join(where)
+            query += f" ORDER BY {sort_column} {direction}, id {direction} LIMIT ?"
+            rows = self.cursor.execute(query, params + extra_params + [count])
+            return [dict(zip(select_columns, row)) for row in rows]
+
+        after_cursor, cursor_params = None, []
+        if cursor:
+            position = _decode_cursor(cursor)
+            after_cursor, cursor_params = _keyset_condition(sort_column, descending, position)
+        # One extra row tells whether another page exists
+        rows = select(after_cursor, cursor_params, limit + 1)
+        if (
+            cursor and descending and sort_column in NULLABLE_SORT_COLUMNS
+            and position[0] is not None and len(rows) <= limit
+        ):
+            # The NULLs that end a descending listing
+            rows += select(f"{sort_column} IS NULL", [], limit + 1 - len(rows))
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1][sort_column], rows[-1]["id"])
+        return {
+            "items": [_to_record({field: row[field] for field in fields}) for row in rows],
+            "next_cursor": next_cursor,
+        }
+
+    def _facet_condition(self, facet: str, name: str) -> Optional[tuple]:
+        """WHERE clause and parameter keeping the mangas linked to a facet name, None for an unknown name."""
+        link_table, key = FACETS[facet]
+        row = self.cursor.execute(f"SELECT id, manga_count FROM {facet} WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        facet_id, manga_count = row
+        if manga_count > FACET_PROBE_MIN_COUNT:
+            return f"EXISTS (SELECT 1 FROM {link_table} WHERE {key} = ? AND manga_id = mangas.id)", facet_id
+        return f"id IN (SELECT manga_id FROM {link_table} WHERE {key} = ?)", facet_id
+
+    def get_facet_counts(self, facet: str, limit: int = 100, offset: int = 0) -> dict:
+        """Return the genres or authors with how many mangas each has, most common first."""
+        if facet not in FACETS:
+            raise ValueError(f"Unknown facet {facet}, use one of {', '.join(FACETS)}.")
+        self.cursor.execute(
+            f"""SELECT name, manga_count FROM {facet} WHERE manga_count > 0
+            ORDER BY manga_count DESC, name LIMIT ? OFFSET ?""",
+            (limit + 1, offset),
+        )
+        rows = self.cursor.fetchall()
+        return {
+            "items": [{"name": name, "count": count} for name, count in rows[:limit]],
+            "next_offset": offset + limit if len(rows) > limit else None,
+        }
+
+    def get_chapter_events(self, since: Optional[datetime] = None, limit: int = 100, cursor: Optional[str] = None) -> dict:
+        """Return new chapters detected at or after `since`, oldest first.
+
+        `next_cursor` points after the last item, pass it back to poll for
+        what came in since, it is the given cursor again when nothing did.
+        """
+        conditions, params = [], []
+        if since:
+            conditions.append("detected_at >= ?")
+            params.append(to_epoch(since))  # A naive `since` is UTC, like the stored times
+        if cursor:
+            conditions.append("(detected_at, id) > (?, ?)")
+            params.extend(_decode_cursor(cursor))
+        query = "SELECT id, name, chapter, chapter_url, released_at, detected_at FROM chapter_events"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY detected_at, id LIMIT ?"
+        params.append(limit + 1)
+        columns = ("id", "name", "chapter", "chapter_url", "released_at", "detected_at")
+        items = [dict(zip(columns, row)) for row in self.cursor.execute(query, params)]
+        has_more = len(items) > limit
+        items = items[:limit]
+        if items:
+            cursor = _encode_cursor(items[-1]["detected_at"], items[-1]["id"])
+        return {"items": items, "next_cursor": cursor, "has_more": has_more}
+
+    def get_chapter_events_after(self, after_id: int, limit: int = 500) -> List[dict]:
+        """Return the chapter events with an id above `after_id`, in id order."""
+        self.cursor.execute(
+            """SELECT id, name, chapter, chapter_url, released_at, detected_at
+            FROM chapter_events WHERE id > ? ORDER BY id LIMIT ?""",
+            (after_id, limit),
+        )
+        columns = ("id", "name", "chapter", "chapter_url", "released_at", "detected_at")
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+
+    def last_chapter_event_id(self) -> int:
+        return self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM chapter_events").fetchone()[0]
+
+    @staticmethod
+    def _fts_query(text: str) -> str:
+        """Turn free text into an FTS5 query where every word is a prefix match."""
+        terms = re.findall(r"\w+", text)
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def search_mangas(self, text: str, limit: int = 20, offset: int = 0) -> dict:
+        """Full text search over name, authors, genres and description, best matches first."""
+        match = self._fts_query(text)
+        if not match:
+            return {"items": [], "next_offset": None}
+        # bm25 weights follow the column order: name, authors, genres, description
+        self.cursor.execute(
+            """SELECT m.name, m.authors, m.genres, m.last_chapter,
+                    snippet(mangas_fts, 3, '<b>', '</b>', '...', 16),
+                    bm25(mangas_fts, 10.0, 5.0, 2.0, 1.0) AS rank
+            FROM mangas_fts
+            JOIN mangas m ON m.id = mangas_fts.rowid
+            WHERE mangas_fts MATCH ?
+            ORDER BY rank
+            LIMIT ? OFFSET ?""",
+            (match, limit + 1, offset),
+        )
+        rows = self.cursor.fetchall()
+        items = [
+            {
+                "name": name,
+                "authors": authors,
+                "genres": [genre for genre in genres.split(", ") if genre],
+                "last_chapter": last_chapter,
+                "snippet": snippet,
+                "rank": rank,
+            }
+            for name, authors, genres, last_chapter, snippet, rank in rows[:limit]
+        ]
+        return {"items": items, "next_offset": offset + limit if len(rows) > limit else None}
+
     def close(self):
-        """Close the database connection."""
+        """Return the connection to the pool, or close it when it is a reader."""
         if self.conn:
-            self.conn.close()
+            self.cursor.close()
+            if self.reader:
+                self.conn.close()
+            else:
+                self.pool.release(self.conn)
+            self.conn = None
+            self.cursor = None
             
     def __enter__(self):
         self.connect()  # Connect when entering the context
-        # Check if tables have been initialized
-        if not hasattr(DatabaseManager, "tables_initialized"):
-            self._initialize_tables()
-            DatabaseManager.tables_initialized = True  # Set the flag
         return self  # Return the instance to be used inside the 'with' block
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()  # Close the connection when exiting the context
\ No newline at end of file
+        self.close()  # Close the connection when exiting the context
+
+
+_pool: ConnectionPool = None
+
+
+def _initialize_database(connection: sqlite3.Connection):
+    db_manager = DatabaseManager()
+    db_manager.conn = connection
+    db_manager.cursor = connection.cursor()
+    db_manager._initialize_tables()
+
+
+def init_pool(db_path: str = None, **kwargs) -> ConnectionPool:
+    """Create the process-wide connection pool and make sure the schema exists."""
+    global _pool
+    close_pool()
+    db_path = db_path or DatabaseManager.default_db_path()
+    # Workers starting together migrate one at a time, the later ones find nothing left to do
+    with FileLock(db_path + "-migrate.lock"):
+        _pool = ConnectionPool(db_path, initializer=_initialize_database, **kwargs)
+    return _pool
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it on first use outside the app lifespan."""
+    return _pool or init_pool()
+
+
+def close_pool():
+    """Close the process-wide pool, if any."""
+    global _pool
+    if _pool:
+        _pool.close()
+        _pool = None
@@ -0,0 +1,66 @@
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Exclusive lock on a file, shared by every process that opens the same path.
+
+    The operating system drops the lock when its holder exits, even on a
+    crash, so a dead process never keeps it. Instances are not reentrant,
+    open one per holder.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.05):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._file = None
+
+    @property
+    def locked(self) -> bool:
+        return self._file is not None
+
+    def _try_lock(self, lock_file) -> bool:
+        try:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Take the lock, waiting for it unless `blocking` is False. Returns whether it is held."""
+        if self._file is not None:
+            return True
+        lock_file = open(self.path, "a+b")
+        while not self._try_lock(lock_file):
+            if not blocking:
+                lock_file.close()
+                return False
+            time.sleep(self.poll_interval)
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        if not fcntl:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        # Closing the file releases a flock
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
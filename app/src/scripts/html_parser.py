@@ -0,0 +1,63 @@
+from typing import Callable, Dict, List, Optional
+from bs4 import BeautifulSoup, SoupStrainer
+from app.src import config
+
+try:
+    import lxml  # noqa: F401  # Optional, much faster tree builder
+    _HAS_LXML = True
+except ImportError:
+    _HAS_LXML = False
+
+
+def available_backends() -> List[str]:
+    """Return the BeautifulSoup tree builders usable in this environment."""
+    return ["html.parser"] + (["lxml"] if _HAS_LXML else [])
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    backend = backend or config.PARSER_BACKEND
+    if backend == "auto":
+        return "lxml" if _HAS_LXML else "html.parser"
+    if backend not in available_backends():
+        raise ValueError(f"Parser backend {backend} is not available, use one of {', '.join(available_backends())}.")
+    return backend
+
+
+class SubtreeStrainer(SoupStrainer):
+    """SoupStrainer keeping the whole subtree of every tag accepted by `keep(name, attrs)`.
+
+    Everything outside those subtrees (scripts, navigation, comments...) is
+    dropped while parsing, so no Tag objects are built for it.
+    """
+
+    def __init__(self, keep: Callable[[str, Dict[str, str]], bool]):
+        super().__init__()
+        self.keep = keep
+
+    @staticmethod
+    def _classes(attrs) -> List[str]:
+        classes = attrs.get("class") or []
+        return classes.split() if isinstance(classes, str) else list(classes)
+
+    def _accepts(self, name, attrs) -> bool:
+        attrs = dict(attrs or {})
+        attrs["class"] = self._classes(attrs)
+        return self.keep(name, attrs)
+
+    # beautifulsoup4 < 4.13 asks search_tag while parsing
+    def search_tag(self, markup_name=None, markup_attrs={}):
+        if isinstance(markup_name, str) and self._accepts(markup_name, markup_attrs):
+            return markup_name
+        return None
+
+    # beautifulsoup4 >= 4.13 asks allow_tag_creation instead
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        return self._accepts(name, attrs)
+
+    def allow_string_creation(self, string) -> bool:
+        return False
+
+
+def make_soup(html: str, parse_only: Optional[SoupStrainer] = None, backend: Optional[str] = None) -> BeautifulSoup:
+    """Parse a page with the configured backend, limited to `parse_only` when given."""
+    return BeautifulSoup(html, resolve_backend(backend), parse_only=parse_only)
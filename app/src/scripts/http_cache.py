@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import List, NamedTuple, Optional
+import httpx
+from app.src import config
+from app.src.scripts.database_manager import DatabaseManager
+from app.src.scripts.metrics import PAGE_CACHE
+
+
+class CachedPage(NamedTuple):
+    url: str
+    text: str
+    changed: bool  # False when this body was already written to the library
+    content_hash: str
+
+
+class HttpCache:
+    """Size-bounded, compressed on-disk cache of fetched pages, keyed by url.
+
+    Pages are stored with their ETag and Last-Modified headers so the next
+    fetch can be a conditional request. The least recently used pages are
+    evicted once the compressed bodies exceed `max_bytes`.
+
+    A page only counts as unchanged once `mark_processed` was called with it,
+    after what was parsed from it is committed, so a failed write is retried.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: int = config.HTTP_CACHE_MAX_BYTES):
+        self.db_path = db_path or os.path.join(
+            os.path.dirname(DatabaseManager.default_db_path()), "HttpCache.db"
+        )
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Opened on first use so parse-only instances never touch the disk
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT NOT NULL,
+                    body BLOB NOT NULL,  -- zlib compressed
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    processed_hash TEXT  -- content_hash of the body last written to the library
+                )"""
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(pages)")}
+            if "processed_hash" not in columns:
+                # Caches of older versions, their pages get parsed once more
+                conn.execute("ALTER TABLE pages ADD COLUMN processed_hash TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed_at ON pages (accessed_at)")
+            # Remembers where a lookup led, e.g. a search url to the details url
+            conn.execute("CREATE TABLE IF NOT EXISTS aliases (key TEXT PRIMARY KEY, url TEXT NOT NULL)")
+        self.total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        return conn
+
+    def _lookup(self, url: str):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT etag, last_modified, content_hash, body, processed_hash FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+
+    def _touch(self, url: str):
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+
+    def _store(self, url: str, etag: Optional[str], last_modified: Optional[str], content_hash: str, content: bytes):
+        body = zlib.compress(content)
+        with self._lock, self.conn:
+            previous = self.conn.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+            # Keeps processed_hash, the new body is not written to the library yet
+            self.conn.execute(
+                """INSERT INTO pages (url, etag, last_modified, content_hash, body, size, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE
+                SET etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    content_hash = excluded.content_hash,
+                    body = excluded.body,
+                    size = excluded.size,
+                    accessed_at = excluded.accessed_at""",
+                (url, etag, last_modified, content_hash, body, len(body), time.time()),
+            )
+            self.total_bytes += len(body) - (previous[0] if previous else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Drop least recently used pages until back under 90% of the budget
+        target = self.max_bytes * 0.9
+        for url, size in self.conn.execute("SELECT url, size FROM pages ORDER BY accessed_at").fetchall():
+            if self.total_bytes <= target:
+                break
+            self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self.total_bytes -= size
+
+    def _mark_processed(self, pages: List[CachedPage]):
+        with self._lock, self.conn:
+            # A page refetched with another body in the meantime stays changed
+            self.conn.executemany(
+                "UPDATE pages SET processed_hash = ? WHERE url = ? AND content_hash = ?",
+                [(page.content_hash, page.url, page.content_hash) for page in pages],
+            )
+
+    async def mark_processed(self, pages: List[CachedPage]):
+        """Remember that these pages are written to the library, call it once the write committed."""
+        await asyncio.to_thread(self._mark_processed, pages)
+
+    async def fetch(self, client: httpx.AsyncClient, url: str) -> CachedPage:
+        """GET a page, revalidating the cached copy with a conditional request."""
+        entry = await asyncio.to_thread(self._lookup, url)
+        headers = {}
+        if entry:
+            etag, last_modified, _, _, _ = entry
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        response = await client.get(url, headers=headers)
+        if entry and response.status_code == 304:
+            await asyncio.to_thread(self._touch, url)
+            PAGE_CACHE.inc(result="not_modified")
+            return CachedPage(url, zlib.decompress(entry[3]).decode("utf-8"), entry[4] != entry[2], entry[2])
+        response.raise_for_status()
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        await asyncio.to_thread(
+            self._store,
+            url,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            content_hash,
+            response.text.encode("utf-8"),  # Stored decoded so a 304 replays the same text
+        )
+        changed = entry is None or entry[4] != content_hash
+        PAGE_CACHE.inc(result="changed" if changed else "unchanged")
+        return CachedPage(url, response.text, changed, content_hash)
+
+    def _get_alias(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT url FROM aliases WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_alias(self, key: str, url: Optional[str]):
+        with self._lock, self.conn:
+            if url is None:
+                self.conn.execute("DELETE FROM aliases WHERE key = ?", (key,))
+            else:
+                self.conn.execute("INSERT OR REPLACE INTO aliases VALUES (?, ?)", (key, url))
+
+    async def get_alias(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get_alias, key)
+
+    async def set_alias(self, key: str, url: Optional[str]):
+        """Remember that `key` resolves to `url`, or forget it when `url` is None."""
+        await asyncio.to_thread(self._set_alias, key, url)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
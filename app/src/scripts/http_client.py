@@ -0,0 +1,220 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+import httpx
+from app.src import config
+from app.src.scripts.metrics import HTTP_CLIENT_IN_FLIGHT, HTTP_CLIENT_REJECTED, HTTP_CLIENT_RETRIES, HTTP_CLIENT_SECONDS
+
+# Statuses worth retrying, the source is busy or briefly broken
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    """The source could not be reached, or kept failing after every retry."""
+
+
+class HostUnavailableError(FetchError):
+    """The circuit breaker for the host is open, the request was not sent."""
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """Stops sending requests to a host after `threshold` consecutive failures.
+
+    The breaker stays open for `reset_timeout` seconds, then lets one trial
+    request through. A success closes it again, a failure re-opens it.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_timeout and not self.trial_in_flight:
+            self.trial_in_flight = True  # Half open
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def release_trial(self):
+        """Give the half open slot back when the trial request was cancelled."""
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class _Host:
+    def __init__(self, client: "HttpClient"):
+        self.slots = asyncio.Semaphore(client.per_host_limit)
+        self.bucket = TokenBucket(client.rate_per_host, client.burst_per_host)
+        self.breaker = CircuitBreaker(client.breaker_threshold, client.breaker_reset)
+
+
+class HttpClient:
+    """Shared HTTP layer for the scrapers.
+
+    Wraps one keep-alive httpx.AsyncClient with strict timeouts, a per-host
+    concurrency cap and token bucket, jittered exponential retries on
+    429/5xx and transport errors, and a per-host circuit breaker.
+    """
+
+    def __init__(
+        self,
+        per_host_limit: int = config.HTTP_PER_HOST_LIMIT,
+        rate_per_host: float = config.HTTP_RATE_PER_HOST,
+        burst_per_host: int = config.HTTP_BURST_PER_HOST,
+        connect_timeout: float = config.HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = config.HTTP_READ_TIMEOUT,
+        deadline: float = config.HTTP_REQUEST_DEADLINE,
+        max_retries: int = config.HTTP_MAX_RETRIES,
+        backoff_base: float = config.HTTP_BACKOFF_BASE,
+        backoff_cap: float = config.HTTP_BACKOFF_CAP,
+        breaker_threshold: int = config.HTTP_BREAKER_THRESHOLD,
+        breaker_reset: float = config.HTTP_BREAKER_RESET,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.per_host_limit = per_host_limit
+        self.rate_per_host = rate_per_host
+        self.burst_per_host = burst_per_host
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.hosts: Dict[str, _Host] = {}
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=60),
+            follow_redirects=True,
+            transport=transport,
+        )
+
+    def _host(self, host: str) -> _Host:
+        if host not in self.hosts:
+            self.hosts[host] = _Host(self)
+        return self.hosts[host]
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        # Full jitter, but never sooner than the server asked for
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                try:
+                    delay = max(delay, parsedate_to_datetime(retry_after).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        return min(delay, self.backoff_cap)
+
+    async def request(
+        self, method: str, url: str, stream: bool = False, follow_redirects: bool = True, **kwargs
+    ) -> httpx.Response:
+        """Send a request, returns the response of the first attempt that is not retryable.
+
+        With `stream` the body is left unread, the caller reads it and closes
+        the response. Raises HostUnavailableError while the host's breaker is
+        open and FetchError once the retries are exhausted.
+        """
+        host_name = httpx.URL(url).host
+        host = self._host(host_name)
+        if not host.breaker.allow():
+            HTTP_CLIENT_REJECTED.inc(host=host_name)
+            raise HostUnavailableError(f"{httpx.URL(url).host} is unavailable, skipping {url}")
+        # Set right after allow() only when it let this request through as the half open trial
+        holds_trial = host.breaker.trial_in_flight
+        for attempt in range(self.max_retries + 1):
+            response = None
+            started_at = time.perf_counter()
+            try:
+                await host.bucket.acquire()
+                async with host.slots:
+                    HTTP_CLIENT_IN_FLIGHT.inc(host=host_name)
+                    started_at = time.perf_counter()
+                    try:
+                        response = await asyncio.wait_for(
+                            self.client.send(
+                                self.client.build_request(method, url, **kwargs),
+                                stream=stream,
+                                follow_redirects=follow_redirects,
+                            ),
+                            self.deadline,
+                        )
+                    finally:
+                        HTTP_CLIENT_IN_FLIGHT.dec(host=host_name)
+                HTTP_CLIENT_SECONDS.observe(
+                    time.perf_counter() - started_at, host=host_name, outcome=str(response.status_code)
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    host.breaker.record_success()
+                    return response
+                error = f"HTTP {response.status_code}"
+                if stream:
+                    await response.aclose()
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                HTTP_CLIENT_SECONDS.observe(time.perf_counter() - started_at, host=host_name, outcome=type(e).__name__)
+                error = repr(e)
+            except asyncio.CancelledError:
+                # A hedged request lost the race, that says nothing about the host. Only
+                # the trial gives its slot back, another request may be holding it.
+                if holds_trial:
+                    host.breaker.release_trial()
+                raise
+            host.breaker.record_failure()
+            holds_trial = False
+            if attempt == self.max_retries:
+                break
+            HTTP_CLIENT_RETRIES.inc(host=host_name)
+            await asyncio.sleep(self._backoff(attempt, response))
+            if not host.breaker.allow():
+                # The host just tripped its breaker, stop hammering it
+                break
+            holds_trial = host.breaker.trial_in_flight
+        raise FetchError(f"{method} {url} failed after {attempt + 1} attempts: {error}")
+
+    async def get(self, url: str, headers: Optional[dict] = None, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, headers=headers, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
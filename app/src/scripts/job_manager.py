@@ -0,0 +1,157 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from app.src import config
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class Job:
+    """A background job working through a list of titles, with live progress."""
+
+    def __init__(self, kind: str, titles: List[str]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = PENDING
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.titles: Dict[str, dict] = {title: {"status": PENDING, "message": None} for title in titles}
+        self.processed = 0
+        self.task: Optional[asyncio.Task] = None
+        self._subscribers: List[asyncio.Queue] = []
+
+    @property
+    def total(self) -> int:
+        return len(self.titles)
+
+    def progress(self) -> dict:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        throughput = self.processed / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.processed
+        return {
+            "status": self.status,
+            "processed": self.processed,
+            "total": self.total,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput": round(throughput, 3),  # titles per second
+            "eta_seconds": round(remaining / throughput, 3) if throughput and self.status == RUNNING else None,
+        }
+
+    def snapshot(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            **self.progress(),
+            "titles": self.titles,
+        }
+
+    def _publish(self, event: str, data: dict):
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                pass  # Slow subscriber, it can still read the job snapshot
+
+    def record(self, title: str, status: str, message: str):
+        """Store the outcome of one title and notify subscribers."""
+        if self.titles.get(title, {}).get("status", PENDING) == PENDING:
+            self.processed += 1
+        self.titles[title] = {"status": status, "message": message}
+        self._publish("progress", {"title": title, "title_status": status, "message": message, **self.progress()})
+
+    def _set_status(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        if status == RUNNING:
+            self.started_at = time.time()
+        if status in FINISHED_STATES:
+            self.finished_at = time.time()
+        self._publish("status", self.progress())
+
+    async def events(self) -> AsyncIterator[tuple]:
+        """Yield (event, data) tuples until the job finishes, None on idle timeouts."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1000)
+        self._subscribers.append(queue)
+        try:
+            yield "status", self.progress()
+            while self.status not in FINISHED_STATES or not queue.empty():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=config.JOBS_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._subscribers.remove(queue)
+
+
+class JobManager:
+    """Runs jobs as asyncio tasks and keeps the most recent ones for lookups."""
+
+    def __init__(self, keep_finished: int = config.JOBS_KEEP_FINISHED):
+        self.keep_finished = keep_finished
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    def start(self, kind: str, titles: List[str], run: Callable[[Job], Awaitable[None]]) -> Job:
+        """Create a job and run `run(job)` in the background."""
+        job = Job(kind, titles)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, run))
+        # A task cancelled before it started never reaches _run's handler
+        job.task.add_done_callback(
+            lambda task: job._set_status(CANCELLED) if job.status not in FINISHED_STATES else None
+        )
+        self._prune()
+        return job
+
+    async def _run(self, job: Job, run: Callable[[Job], Awaitable[None]]):
+        job._set_status(RUNNING)
+        try:
+            await run(job)
+        except asyncio.CancelledError:
+            job._set_status(CANCELLED)
+        except Exception as e:
+            job._set_status(FAILED, str(e))
+        else:
+            job._set_status(COMPLETED)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[: max(len(finished) - self.keep_finished, 0)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def running(self, kind: str) -> Optional[Job]:
+        """Return the unfinished job of the given kind, if any."""
+        for job in self.jobs.values():
+            if job.kind == kind and job.status not in FINISHED_STATES:
+                return job
+        return None
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job and job.task and not job.task.done():
+            job.task.cancel()
+        return job
+
+    async def close(self):
+        """Cancel every unfinished job."""
+        tasks = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
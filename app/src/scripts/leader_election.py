@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Optional
+from app.src import config
+from app.src.scripts import metrics
+from app.src.scripts.database_manager import DatabaseManager
+from app.src.scripts.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    """Picks the one worker, among the processes sharing a database, that runs the background work.
+
+    Every worker tries to lock a file next to the database, the one that gets
+    it leads until it stops. The others try again every `retry_interval`
+    seconds, so one of them takes over when the leader exits or dies.
+    `on_follower` is called once when another process was found leading.
+    """
+
+    def __init__(
+        self,
+        on_elected: Callable[[], None],
+        lock_path: Optional[str] = None,
+        retry_interval: float = config.LEADER_RETRY_INTERVAL,
+        on_follower: Optional[Callable[[], None]] = None,
+    ):
+        self.on_elected = on_elected
+        self.on_follower = on_follower
+        self.lock = FileLock(lock_path or DatabaseManager.default_db_path() + "-leader.lock")
+        self.retry_interval = retry_interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lock.locked
+
+    async def _run(self):
+        if not self.lock.acquire(blocking=False) and self.on_follower:
+            self.on_follower()
+        while not self.lock.acquire(blocking=False):
+            await asyncio.sleep(self.retry_interval)
+        logger.info("Worker %d elected to run the background work", os.getpid())
+        metrics.LEADER.set(1)
+        self.on_elected()
+
+    def start(self):
+        """Become the leader now if no other worker is, or as soon as the current one goes away."""
+        if self._task is None:
+            metrics.LEADER.set(0)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Step down, the background work must be stopped first."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.lock.release()
+        metrics.LEADER.set(0)
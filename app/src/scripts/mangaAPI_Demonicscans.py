@@ -1,29 +1,94 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import logging
+import httpx
 from datetime import datetime
 from app.src.models.manga import Manga
+from app.src.scripts.html_parser import SubtreeStrainer, make_soup
+from app.src.scripts.http_cache import CachedPage, HttpCache
+from app.src.scripts.http_client import FetchError, HttpClient
+from app.src.scripts.metrics import PARSE_ERRORS, SCRAPE_ERRORS, timed
 from urllib.parse import quote
 
+logger = logging.getLogger(__name__)
+
+
 class MangaManager:
-    def __init__(self):
+    # Name used in metrics labels
+    PROVIDER_NAME = "demonicscans"
+    # Cover images are served by the site itself
+    IMAGE_HOSTS = ()
+    # Only the parts of the manga page that parse_manga reads get parsed
+    PAGE_SECTIONS = SubtreeStrainer(
+        lambda name, attrs: attrs.get("id") in ("manga-page", "manga-info-stats", "chapters-container")
+        or bool({"genres-list", "white-font"} & set(attrs["class"]))
+    )
+
+    def __init__(self, http_client: HttpClient = None, http_cache: HttpCache = None):
+        # Shared client with rate limits, retries and a circuit breaker per host
+        self.client = http_client or HttpClient()
+        # Cached pages allow conditional requests on refresh
+        self.http_cache = http_cache or HttpCache()
         # Base URL for searching manga
         self.base_url = "https://demonicscans.org"
-        
-    def get_manga(self, manga_name: str) -> Manga:
+
+    def _process_name(self, manga_name: str) -> str:
+        # Format the search URL due to characters being encripted twice on the url
+        processed_manga_name = manga_name.replace(" ", "-")
+        processed_manga_name = quote(processed_manga_name, safe="-")
+        processed_manga_name = quote(processed_manga_name, safe="-")
+        return processed_manga_name
+
+    def build_search_url(self, manga_name: str) -> str:
+        """Return the url of the manga page for the given name."""
+        return f"{self.base_url}/manga/{self._process_name(manga_name)}"
+
+    async def get_manga(self, manga_name: str) -> Manga:
         """Search for the manga and extract its details."""
+        return await self.fetch_manga(self.client, manga_name)
+
+    async def fetch_page(self, client: HttpClient, manga_name: str) -> CachedPage:
+        """Fetch the manga page through the page cache, without parsing it."""
+        return await self.http_cache.fetch(client, self.build_search_url(manga_name))
+
+    async def fetch_manga(self, client: HttpClient, manga_name: str) -> Manga:
+        """Search for the manga through the given client and extract its details.
+
+        Raises FetchError when the site cannot be reached, a missing page returns None.
+        """
         try:
-            # Format the search URL due to characters being encripted twice on the url
-            processed_manga_name = manga_name.replace(" ", "-")
-            processed_manga_name = quote(processed_manga_name, safe="-")
-            processed_manga_name = quote(processed_manga_name, safe="-")
-            
-            # Fetch the search result url
-            search_url = f"{self.base_url}/manga/{processed_manga_name}"
-            
             # Fetch the search results page
-            search_response = requests.get(search_url)
-            search_response.raise_for_status()
-            search_soup = BeautifulSoup(search_response.text, 'html.parser')
+            with timed("fetch", self.PROVIDER_NAME):
+                page = await self.fetch_page(client, manga_name)
+            # Parse off the event loop so other requests keep being served
+            with timed("parse", self.PROVIDER_NAME):
+                return await asyncio.to_thread(self.parse_manga, manga_name, page.url, page.text)
+        except FetchError:
+            raise
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                logger.info("No results found for %s on %s", manga_name, self.PROVIDER_NAME)
+                return None
+            raise FetchError(f"{e.request.url} answered HTTP {e.response.status_code}") from e
+        except Exception:
+            logger.exception("Scraping %s from %s failed", manga_name, self.PROVIDER_NAME)
+            SCRAPE_ERRORS.inc(provider=self.PROVIDER_NAME)
+            return None
+
+    async def aclose(self):
+        """Close the shared async client and the page cache."""
+        await self.client.aclose()
+        self.http_cache.close()
+
+    def _parse_error(self, field: str, error: Exception):
+        """A field the page layout no longer matches, the default value is kept."""
+        logger.warning("Error parsing %s: %s", field, error)
+        PARSE_ERRORS.inc(provider=self.PROVIDER_NAME, field=field)
+
+    def parse_manga(self, manga_name: str, search_url: str, html: str, backend: str = None) -> Manga:
+        """Extract the manga details from a fetched manga page."""
+        try:
+            processed_manga_name = self._process_name(manga_name)
+            search_soup = make_soup(html, self.PAGE_SECTIONS, backend)
             
             # Initialize data variables
             image_link = "No link found"
@@ -45,7 +110,7 @@ class MangaManager:
                 else:
                     image_link = "No image link found"
             except Exception as e:
-                print(f"Error parsing image link: {e}")
+                self._parse_error("image_link", e)
                 image_link = "No image link found"
             
             # Extract author, rating, status, last update
@@ -69,7 +134,7 @@ class MangaManager:
                     if last_chapter_release_date_str else None
                 )
             except Exception as e:
-                print(f"Error parsing image link: {e}")
+                self._parse_error("info_stats", e)
                 authors = "No author found"
                 rating = 0.0
                 status = "No status found"
@@ -81,7 +146,7 @@ class MangaManager:
                 # Extract all <li> elements and store their text in a list
                 genres = [li.text.strip() for li in genres_container.find_all('li')] if genres_container else []
             except Exception as e:
-                print(f"Error parsing image link: {e}")
+                self._parse_error("genres", e)
                 genres = []
                 
             # Extract description
@@ -92,7 +157,7 @@ class MangaManager:
                 else:
                     "No description found"
             except Exception as e:
-                print(f"Error parsing image link: {e}")
+                self._parse_error("description", e)
                 description = "No description found"
                 
             # Extract last chapter data
@@ -111,7 +176,7 @@ class MangaManager:
                     last_chapter = "No last chapter found"
                     last_chapter_url = "No link to last chapter found"
             except Exception as e:
-                print(f"Error parsing image link: {e}")
+                self._parse_error("last_chapter", e)
                 last_chapter = "No last chapter found"
                 last_chapter_url = "No link to last chapter found"
             
@@ -131,6 +196,6 @@ class MangaManager:
                 last_chapter_release_date=last_chapter_release_date
             )
             
-        except Exception as e:
-            print(f"An error occurred: {e}")
+        except Exception:
+            logger.exception("Parsing the %s page of %s failed", self.PROVIDER_NAME, manga_name)
             return None
\ No newline at end of file
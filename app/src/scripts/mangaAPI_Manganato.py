@@ -1,38 +1,126 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import logging
+import httpx
 from datetime import datetime
 from app.src.models.manga import Manga
+from app.src.scripts.html_parser import SubtreeStrainer, make_soup
+from app.src.scripts.http_cache import CachedPage, HttpCache
+from app.src.scripts.http_client import FetchError, HttpClient
+from app.src.scripts.metrics import PARSE_ERRORS, SCRAPE_ERRORS, timed
+
+logger = logging.getLogger(__name__)
+
 
 class MangaManager:
-    def __init__(self):
+    # Name used in metrics labels
+    PROVIDER_NAME = "manganato"
+    # Cover images are served from a CDN, not the site itself
+    IMAGE_HOSTS = ("mkklcdnv6temp.com",)
+    # Only the parts of each page that the parse methods read get parsed
+    SEARCH_SECTIONS = SubtreeStrainer(lambda name, attrs: "panel-search-story" in attrs["class"])
+    PAGE_SECTIONS = SubtreeStrainer(
+        lambda name, attrs: bool(
+            {"panel-story-info", "panel-story-info-description", "row-content-chapter"} & set(attrs["class"])
+        )
+        or (name == "em" and attrs.get("property") == "v:average")
+    )
+
+    def __init__(self, http_client: HttpClient = None, http_cache: HttpCache = None):
+        # Shared client with rate limits, retries and a circuit breaker per host
+        self.client = http_client or HttpClient()
+        # Cached pages allow conditional requests and remember search -> details urls
+        self.http_cache = http_cache or HttpCache()
         # Base URL for searching manga
         self.base_url = "https://manganato.com/search/story/"
 
-    def get_manga(self, manga_name: str) -> Manga:
+    def build_search_url(self, manga_name: str) -> str:
+        """Return the url of the search results page for the given name."""
+        processed_manga_name = manga_name.lower().replace(" ", "_").replace(",","").replace("'", "_")
+        return f"{self.base_url}{processed_manga_name}"
+
+    def parse_search(self, html: str, backend: str = None) -> str:
+        """Return the link of the first search result, if any."""
+        search_soup = make_soup(html, self.SEARCH_SECTIONS, backend)
+        first_result = search_soup.select_one("div.panel-search-story div.search-story-item a")
+        if not first_result:
+            return None
+        return first_result['href']
+
+    async def get_manga(self, manga_name: str) -> Manga:
         """Search for the manga and extract its details."""
+        return await self.fetch_manga(self.client, manga_name)
+
+    async def _search(self, client: HttpClient, search_url: str) -> str:
+        """Return the details url for a search, fetching the search page only the first time."""
+        href = await self.http_cache.get_alias(search_url)
+        if href:
+            return href
+        search_response = await client.get(search_url)
+        search_response.raise_for_status()
+        href = self.parse_search(search_response.text)
+        if href:
+            await self.http_cache.set_alias(search_url, href)
+        return href
+
+    async def fetch_page(self, client: HttpClient, manga_name: str) -> CachedPage:
+        """Find and fetch the manga details page without parsing it, None when nothing matches."""
+        # Find the first search result, known urls skip the search page
+        search_url = self.build_search_url(manga_name)
+        href = await self._search(client, search_url)
+        if not href:
+            return None
+
+        # Fetch the manga details page
         try:
-            # Format the search URL
-            processed_manga_name = manga_name.lower().replace(" ", "_").replace(",","").replace("'", "_")
-            search_url = f"{self.base_url}{processed_manga_name}"
-
-            # Fetch the search results page
-            search_response = requests.get(search_url)
-            search_response.raise_for_status()
-            search_soup = BeautifulSoup(search_response.text, 'html.parser')
-
-            # Find the first search result
-            first_result = search_soup.select_one("div.panel-search-story div.search-story-item a")
-            if not first_result:
-                print("No results found.")
+            return await self.http_cache.fetch(client, href)
+        except httpx.HTTPStatusError:
+            # The remembered url may have moved, search again once
+            await self.http_cache.set_alias(search_url, None)
+            href = await self._search(client, search_url)
+            if not href:
                 return None
-            
-            # Extract the manga link
-            href = first_result['href']
+            return await self.http_cache.fetch(client, href)
 
-            # Fetch the manga details page
-            details_response = requests.get(href)
-            details_response.raise_for_status()
-            details_soup = BeautifulSoup(details_response.text, 'html.parser')
+    async def fetch_manga(self, client: HttpClient, manga_name: str) -> Manga:
+        """Search for the manga through the given client and extract its details.
+
+        Raises FetchError when the site cannot be reached, a missing page returns None.
+        """
+        try:
+            with timed("fetch", self.PROVIDER_NAME):
+                page = await self.fetch_page(client, manga_name)
+            if not page:
+                logger.info("No results found for %s on %s", manga_name, self.PROVIDER_NAME)
+                return None
+            # Parse off the event loop so other requests keep being served
+            with timed("parse", self.PROVIDER_NAME):
+                return await asyncio.to_thread(self.parse_manga, manga_name, page.url, page.text)
+        except FetchError:
+            raise
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                logger.info("No results found for %s on %s", manga_name, self.PROVIDER_NAME)
+                return None
+            raise FetchError(f"{e.request.url} answered HTTP {e.response.status_code}") from e
+        except Exception:
+            logger.exception("Scraping %s from %s failed", manga_name, self.PROVIDER_NAME)
+            SCRAPE_ERRORS.inc(provider=self.PROVIDER_NAME)
+            return None
+
+    async def aclose(self):
+        """Close the shared async client and the page cache."""
+        await self.client.aclose()
+        self.http_cache.close()
+
+    def _parse_error(self, field: str, error: Exception):
+        """A field the page layout no longer matches, the default value is kept."""
+        logger.warning("Error parsing %s: %s", field, error)
+        PARSE_ERRORS.inc(provider=self.PROVIDER_NAME, field=field)
+
+    def parse_manga(self, manga_name: str, href: str, html: str, backend: str = None) -> Manga:
+        """Extract the manga details from a fetched details page."""
+        try:
+            details_soup = make_soup(html, self.PAGE_SECTIONS, backend)
  
             # Initialize data variables
             name = manga_name
@@ -55,7 +143,7 @@ class MangaManager:
                 else:
                     image_link = "No image link found"
             except Exception as e:
-                print(f"Error parsing image link: {e}")
+                self._parse_error("image_link", e)
                 image_link = "No image link found"
 
             # Extract author
@@ -66,7 +154,7 @@ class MangaManager:
                 else:
                     authors = "No author found"
             except Exception as e:
-                print(f"Error parsing author: {e}")
+                self._parse_error("authors", e)
                 authors = "No author found"
 
             # Extract status
@@ -77,7 +165,7 @@ class MangaManager:
                 else:
                     status = "No status found"
             except Exception as e:
-                print(f"Error parsing status: {e}")
+                self._parse_error("status", e)
                 status = "No status found"
 
             # Extract genres
@@ -89,7 +177,7 @@ class MangaManager:
                 else:
                     genres = []
             except Exception as e:
-                print(f"Error parsing genres: {e}")
+                self._parse_error("genres", e)
                 genres = []
 
 
@@ -101,7 +189,7 @@ class MangaManager:
                 else:
                     views = "No views found"
             except Exception as e:
-                print(f"Error parsing views: {e}")
+                self._parse_error("views", e)
                 views = "No views found"
 
             # Extract rating
@@ -112,7 +200,7 @@ class MangaManager:
                 else:
                     rating = 0.0
             except Exception as e:
-                print(f"Error parsing rating: {e}")
+                self._parse_error("rating", e)
                 rating = 0.0
 
             # Extract description
@@ -127,7 +215,7 @@ class MangaManager:
                 else:
                     description = "Description not found"
             except Exception as e:
-                print(f"Error parsing description: {e}")
+                self._parse_error("description", e)
                 description = "Description not found"
 
             # Extract the latest chapter
@@ -140,7 +228,7 @@ class MangaManager:
                     last_chapter = "No chapter found"
                     last_chapter_url = "No chapter URL found"
             except Exception as e:
-                print(f"Error parsing latest chapter: {e}")
+                self._parse_error("last_chapter", e)
                 last_chapter = "No chapter found"
                 last_chapter_url = "No chapter URL found"
 
@@ -163,7 +251,7 @@ class MangaManager:
                 else:
                     last_chapter_release_date = None  # Default if tag not found
             except Exception as e:
-                print(f"Error parsing last chapter release date: {e}")
+                self._parse_error("last_chapter_release_date", e)
                 last_chapter_release_date = None  # Default if an error occurs
 
 
@@ -183,6 +271,6 @@ class MangaManager:
                 last_chapter_release_date=last_chapter_release_date
             )
 
-        except Exception as e:
-            print(f"An error occurred: {e}")
+        except Exception:
+            logger.exception("Parsing the %s page of %s failed", self.PROVIDER_NAME, manga_name)
             return None
\ No newline at end of file
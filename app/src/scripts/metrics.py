@@ -0,0 +1,224 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds, from a cached page read to a slow scrape
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REGISTRY: List["_Metric"] = []
+
+# Stage timings of the current request, set by the profiling middleware when asked for
+_profile: ContextVar[Optional[Dict[str, float]]] = ContextVar("profile", default=None)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key: Tuple[str, ...], value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value: float, **labels: str):
+        """Publish a total counted elsewhere, such as the response cache's hits."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per bucket counts (not cumulative), then +Inf, sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_value(self, key: Tuple[str, ...], value) -> List[str]:
+        counts, total, count = value
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labels, key, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {total}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Metrics recorded across the app
+STAGE_SECONDS = Histogram(
+    "manga_stage_seconds", "Time spent per stage of a scrape or request.", ("stage", "provider")
+)
+DB_SECONDS = Histogram("manga_db_seconds", "DatabaseManager calls, executor wait included.", ("method",))
+PROVIDER_SECONDS = Histogram(
+    "manga_provider_seconds", "Time for a provider to return a manga or no result.", ("provider",)
+)
+HEDGES = Counter("manga_provider_hedges_total", "Second providers raced against a slow or failed one.", ("provider",))
+HTTP_CLIENT_SECONDS = Histogram(
+    "manga_http_client_seconds", "Outgoing HTTP requests per attempt.", ("host", "outcome")
+)
+HTTP_CLIENT_IN_FLIGHT = Gauge("manga_http_client_in_flight", "Outgoing HTTP requests in progress.", ("host",))
+HTTP_CLIENT_RETRIES = Counter("manga_http_client_retries_total", "Outgoing HTTP requests retried.", ("host",))
+HTTP_CLIENT_REJECTED = Counter(
+    "manga_http_client_rejected_total", "Requests not sent because the host's breaker was open.", ("host",)
+)
+PAGE_CACHE = Counter(
+    "manga_page_cache_total", "Scraped page fetches by outcome: not_modified, unchanged or changed.", ("result",)
+)
+SCRAPE_ERRORS = Counter(
+    "manga_scrape_errors_total", "Scrapes and refreshes that failed with an unexpected error.", ("provider",)
+)
+PARSE_ERRORS = Counter(
+    "manga_parse_errors_total", "Page fields that failed to parse and kept their default.", ("provider", "field")
+)
+COVER_CACHE = Counter("manga_cover_cache_total", "Cover lookups by outcome: hit or miss.", ("result",))
+RESPONSE_CACHE = Counter("manga_response_cache_total", "Response cache lookups by outcome: hit or miss.", ("result",))
+RESPONSE_CACHE_EVICTIONS = Counter("manga_response_cache_evictions_total", "Response cache entries evicted.")
+RESPONSE_CACHE_HIT_RATIO = Gauge("manga_response_cache_hit_ratio", "Response cache hits over lookups.")
+SCRAPES_IN_FLIGHT = Gauge("manga_scrapes_in_flight", "Single title scrapes in progress, coalesced adds counted once.")
+STREAM_SUBSCRIBERS = Gauge("manga_stream_subscribers", "Connected /mangas/stream and webhook subscribers.")
+LEADER = Gauge("manga_worker_leader", "1 in the worker running the scheduler and webhook, 0 in the others.")
+EXTERNAL_CHANGES = Counter(
+    "manga_external_changes_total", "Library changes committed by other workers, each one clears the response cache."
+)
+REQUEST_SECONDS = Histogram(
+    "manga_request_seconds", "Handled API requests, until the last body byte.", ("method", "route", "status")
+)
+
+
+def record_stage(stage: str, seconds: float, provider: str = ""):
+    """Observe a stage timing and add it to the current request's profile, if any."""
+    STAGE_SECONDS.observe(seconds, stage=stage, provider=provider)
+    profile = _profile.get()
+    if profile is not None:
+        profile[stage] = profile.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str, provider: str = ""):
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started_at, provider)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every request per route.
+
+    Requests carrying the `profile_header` get a Server-Timing header with
+    the time spent in each stage while handling them.
+    """
+
+    def __init__(self, app, profile_header: Optional[str] = None):
+        self.app = app
+        self.profile_header = profile_header.lower().encode() if profile_header else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started_at = time.perf_counter()
+        profile = None
+        if self.profile_header and any(name == self.profile_header for name, _ in scope["headers"]):
+            profile = {}
+        token = _profile.set(profile)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if profile is not None:
+                    timings = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in profile.items()]
+                    timings.append(f"total;dur={(time.perf_counter() - started_at) * 1000:.2f}")
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", ", ".join(timings).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _profile.reset(token)
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started_at,
+                method=scope["method"],
+                route=route.path if route is not None else "unmatched",
+                status=str(status[0]),
+            )
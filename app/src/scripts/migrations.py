@@ -0,0 +1,301 @@
+import sqlite3
+from typing import Callable, List
+from app.src.models.manga import MISSING_VALUES, parse_chapter_number, parse_views, split_authors
+
+
+def _create_mangas_table(cursor: sqlite3.Cursor):
+    cursor.execute(
+        """CREATE TABLE IF NOT EXISTS mangas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            name TEXT NOT NULL,
+            image_link TEXT NOT NULL,
+            authors TEXT NOT NULL,
+            status TEXT NOT NULL,
+            genres TEXT NOT NULL,  -- List of strings, will store as comma-separated values
+            views TEXT NOT NULL,
+            rating REAL NOT NULL,
+            description TEXT NOT NULL,
+            last_chapter TEXT NOT NULL,
+            last_chapter_url TEXT NOT NULL,
+            last_chapter_release_date TEXT NOT NULL
+        )"""
+    )
+
+
+def _add_unique_name_index(cursor: sqlite3.Cursor):
+    # Older databases may hold duplicates from racing inserts, keep the newest row
+    cursor.execute(
+        "DELETE FROM mangas WHERE id NOT IN (SELECT MAX(id) FROM mangas GROUP BY name)"
+    )
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_mangas_name ON mangas (name)")
+
+
+def _add_listing_indexes(cursor: sqlite3.Cursor):
+    # Composite with id so keyset pagination walks the index in order
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_mangas_release_date ON mangas (last_chapter_release_date, id)"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mangas_rating ON mangas (rating, id)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_mangas_status ON mangas (status, last_chapter_release_date, id)"
+    )
+
+
+def _add_full_text_search(cursor: sqlite3.Cursor):
+    # External content table, the text itself stays in mangas
+    cursor.execute(
+        """CREATE VIRTUAL TABLE IF NOT EXISTS mangas_fts USING fts5 (
+            name, authors, genres, description,
+            content='mangas', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )"""
+    )
+    # Keep the index in sync with every write to mangas
+    cursor.execute(
+        """CREATE TRIGGER IF NOT EXISTS mangas_fts_insert AFTER INSERT ON mangas BEGIN
+            INSERT INTO mangas_fts (rowid, name, authors, genres, description)
+            VALUES (new.id, new.name, new.authors, new.genres, new.description);
+        END"""
+    )
+    cursor.execute(
+        """CREATE TRIGGER IF NOT EXISTS mangas_fts_delete AFTER DELETE ON mangas BEGIN
+            INSERT INTO mangas_fts (mangas_fts, rowid, name, authors, genres, description)
+            VALUES ('delete', old.id, old.name, old.authors, old.genres, old.description);
+        END"""
+    )
+    cursor.execute(
+        """CREATE TRIGGER IF NOT EXISTS mangas_fts_update
+        AFTER UPDATE OF name, authors, genres, description ON mangas BEGIN
+            INSERT INTO mangas_fts (mangas_fts, rowid, name, authors, genres, description)
+            VALUES ('delete', old.id, old.name, old.authors, old.genres, old.description);
+            INSERT INTO mangas_fts (rowid, name, authors, genres, description)
+            VALUES (new.id, new.name, new.authors, new.genres, new.description);
+        END"""
+    )
+    # Index the rows that already exist
+    cursor.execute("INSERT INTO mangas_fts (mangas_fts) VALUES ('rebuild')")
+
+
+def _add_source_column(cursor: sqlite3.Cursor):
+    cursor.execute("ALTER TABLE mangas ADD COLUMN source TEXT")
+    # Every title stored so far came from Demonicscans, the only provider at the time
+    cursor.execute("UPDATE mangas SET source = 'demonicscans'")
+
+
+def _add_change_tracking(cursor: sqlite3.Cursor):
+    # Hash of the scraped content, writes whose fingerprint did not change are skipped
+    cursor.execute("ALTER TABLE mangas ADD COLUMN fingerprint TEXT")
+    # Append-only history of new chapters, filled by the triggers below
+    cursor.execute(
+        """CREATE TABLE IF NOT EXISTS chapter_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            manga_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            chapter TEXT NOT NULL,
+            chapter_url TEXT NOT NULL,
+            released_at TEXT,
+            detected_at INTEGER NOT NULL  -- Unix time in seconds
+        )"""
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chapter_events_detected_at ON chapter_events (detected_at, id)"
+    )
+    cursor.execute(
+        """CREATE TRIGGER IF NOT EXISTS mangas_chapter_insert AFTER INSERT ON mangas BEGIN
+            INSERT INTO chapter_events (manga_id, name, chapter, chapter_url, released_at, detected_at)
+            VALUES (new.id, new.name, new.last_chapter, new.last_chapter_url,
+                    new.last_chapter_release_date, CAST(strftime('%s', 'now') AS INTEGER));
+        END"""
+    )
+    cursor.execute(
+        """CREATE TRIGGER IF NOT EXISTS mangas_chapter_update AFTER UPDATE OF last_chapter ON mangas
+        WHEN new.last_chapter IS NOT old.last_chapter BEGIN
+            INSERT INTO chapter_events (manga_id, name, chapter, chapter_url, released_at, detected_at)
+            VALUES (new.id, new.name, new.last_chapter, new.last_chapter_url,
+                    new.last_chapter_release_date, CAST(strftime('%s', 'now') AS INTEGER));
+        END"""
+    )
+
+
+def _add_library_version(cursor: sqlite3.Cursor):
+    # Single row counter bumped by every change to mangas, list ETags derive from it
+    cursor.execute(
+        """CREATE TABLE IF NOT EXISTS library_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )"""
+    )
+    cursor.execute("INSERT OR IGNORE INTO library_version (id, version) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(
+            f"""CREATE TRIGGER IF NOT EXISTS mangas_version_{event.lower()} AFTER {event} ON mangas BEGIN
+                UPDATE library_version SET version = version + 1 WHERE id = 1;
+            END"""
+        )
+
+
+def _use_typed_columns(cursor: sqlite3.Cursor):
+    """Rebuild mangas with INTEGER Unix times and views, NULL for missing fields and a chapter number."""
+    connection = cursor.connection
+    connection.create_function("missing_to_null", 1, lambda value: None if value in MISSING_VALUES else value)
+    connection.create_function("parse_views", 1, parse_views)
+    connection.create_function("parse_chapter_number", 1, parse_chapter_number)
+    sequence = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'mangas'").fetchone()
+    # Left over by an interrupted run of older versions, which committed the CREATE on its own
+    cursor.execute("DROP TABLE IF EXISTS mangas_typed")
+    cursor.execute(
+        """CREATE TABLE mangas_typed (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            name TEXT NOT NULL,
+            image_link TEXT,
+            authors TEXT,
+            status TEXT,
+            genres TEXT NOT NULL,
+            views INTEGER,
+            rating REAL NOT NULL,
+            description TEXT,
+            last_chapter TEXT,
+            last_chapter_url TEXT,
+            last_chapter_release_date INTEGER,  -- Unix time in seconds, UTC
+            source TEXT,
+            fingerprint TEXT,
+            last_chapter_number REAL
+        )"""
+    )
+    # Fingerprints are left NULL, each title is rewritten once in the typed form on its next refresh
+    cursor.execute(
+        """INSERT INTO mangas_typed
+        SELECT id, url, name, missing_to_null(image_link), missing_to_null(authors), missing_to_null(status),
+            genres, parse_views(views), rating, missing_to_null(description), missing_to_null(last_chapter),
+            missing_to_null(last_chapter_url), CAST(strftime('%s', last_chapter_release_date) AS INTEGER),
+            source, NULL, parse_chapter_number(missing_to_null(last_chapter))
+        FROM mangas"""
+    )
+    # Takes the old table's indexes and triggers with it
+    cursor.execute("DROP TABLE mangas")
+    cursor.execute("ALTER TABLE mangas_typed RENAME TO mangas")
+    if sequence:
+        # Ids of deleted titles stay retired
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'mangas'", sequence)
+    _add_unique_name_index(cursor)
+    _add_listing_indexes(cursor)
+    _add_full_text_search(cursor)
+    _add_library_version(cursor)
+    # Chapter events keep ISO release dates, titles without a chapter have nothing to announce
+    cursor.execute(
+        """CREATE TRIGGER mangas_chapter_insert AFTER INSERT ON mangas
+        WHEN new.last_chapter IS NOT NULL BEGIN
+            INSERT INTO chapter_events (manga_id, name, chapter, chapter_url, released_at, detected_at)
+            VALUES (new.id, new.name, new.last_chapter, COALESCE(new.last_chapter_url, new.url),
+                    strftime('%Y-%m-%dT%H:%M:%S', new.last_chapter_release_date, 'unixepoch'),
+                    CAST(strftime('%s', 'now') AS INTEGER));
+        END"""
+    )
+    cursor.execute(
+        """CREATE TRIGGER mangas_chapter_update AFTER UPDATE OF last_chapter ON mangas
+        WHEN new.last_chapter IS NOT old.last_chapter AND new.last_chapter IS NOT NULL BEGIN
+            INSERT INTO chapter_events (manga_id, name, chapter, chapter_url, released_at, detected_at)
+            VALUES (new.id, new.name, new.last_chapter, COALESCE(new.last_chapter_url, new.url),
+                    strftime('%Y-%m-%dT%H:%M:%S', new.last_chapter_release_date, 'unixepoch'),
+                    CAST(strftime('%s', 'now') AS INTEGER));
+        END"""
+    )
+
+
+def _create_facet_table(cursor: sqlite3.Cursor, table: str, link_table: str, key: str):
+    cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL COLLATE NOCASE UNIQUE,
+            manga_count INTEGER NOT NULL DEFAULT 0
+        )"""
+    )
+    # Keyed by facet first so listing a facet's mangas is a range of the primary key
+    cursor.execute(
+        f"""CREATE TABLE IF NOT EXISTS {link_table} (
+            {key} INTEGER NOT NULL,
+            manga_id INTEGER NOT NULL,
+            PRIMARY KEY ({key}, manga_id)
+        ) WITHOUT ROWID"""
+    )
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{link_table}_manga_id ON {link_table} (manga_id)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_manga_count ON {table} (manga_count DESC, name)")
+    # Counts follow the links, facet listings never aggregate
+    cursor.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS {link_table}_insert AFTER INSERT ON {link_table} BEGIN
+            UPDATE {table} SET manga_count = manga_count + 1 WHERE id = new.{key};
+        END"""
+    )
+    cursor.execute(
+        f"""CREATE TRIGGER IF NOT EXISTS {link_table}_delete AFTER DELETE ON {link_table} BEGIN
+            UPDATE {table} SET manga_count = manga_count - 1 WHERE id = old.{key};
+        END"""
+    )
+
+
+def _normalize_genres_and_authors(cursor: sqlite3.Cursor):
+    """Genres and authors in tables of their own, linked to mangas and counted."""
+    _create_facet_table(cursor, "genres", "manga_genres", "genre_id")
+    _create_facet_table(cursor, "authors", "manga_authors", "author_id")
+    # The write path relinks stored titles, removed ones are unlinked here
+    cursor.execute(
+        """CREATE TRIGGER IF NOT EXISTS mangas_facets_delete AFTER DELETE ON mangas BEGIN
+            DELETE FROM manga_genres WHERE manga_id = old.id;
+            DELETE FROM manga_authors WHERE manga_id = old.id;
+        END"""
+    )
+    rows = cursor.execute("SELECT id, genres, authors FROM mangas").fetchall()
+    for table, link_table, key, names_of in (
+        ("genres", "manga_genres", "genre_id", lambda genres, authors: genres.split(", ")),
+        ("authors", "manga_authors", "author_id", lambda genres, authors: split_authors(authors)),
+    ):
+        links = [(manga_id, name.strip()) for manga_id, genres, authors in rows for name in names_of(genres, authors)]
+        links = [(manga_id, name) for manga_id, name in links if name]
+        cursor.executemany(
+            f"INSERT INTO {table} (name) VALUES (?) ON CONFLICT (name) DO NOTHING", [(name,) for _, name in links]
+        )
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO {link_table} ({key}, manga_id) SELECT id, ? FROM {table} WHERE name = ?", links
+        )
+
+
+# Schema migrations in order, the database's PRAGMA user_version counts how many have run
+MIGRATIONS: List[Callable[[sqlite3.Cursor], None]] = [
+    _create_mangas_table,
+    _add_unique_name_index,
+    _add_listing_indexes,
+    _add_full_text_search,
+    _add_source_column,
+    _add_change_tracking,
+    _add_library_version,
+    _use_typed_columns,
+    _normalize_genres_and_authors,
+]
+
+
+def migrate(connection: sqlite3.Connection):
+    """Apply every migration the database has not seen yet, each in its own transaction.
+
+    sqlite3 only opens transactions before INSERT/UPDATE/DELETE and runs DDL
+    in autocommit, so the transactions are begun explicitly: a migration's
+    DDL, data changes and user_version bump commit or roll back together.
+    """
+    isolation_level = connection.isolation_level
+    connection.isolation_level = None
+    cursor = connection.cursor()
+    try:
+        current_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for version, migration in enumerate(MIGRATIONS[current_version:], start=current_version + 1):
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                migration(cursor)
+                cursor.execute(f"PRAGMA user_version = {version}")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+    finally:
+        cursor.close()
+        connection.isolation_level = isolation_level
@@ -0,0 +1,159 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set
+import httpx
+from app.src import config
+from app.src.models.manga import Manga
+from app.src.scripts import mangaAPI_Demonicscans, mangaAPI_Manganato
+from app.src.scripts.http_cache import HttpCache
+from app.src.scripts.http_client import FetchError, HttpClient
+from app.src.scripts.metrics import HEDGES, PROVIDER_SECONDS
+
+# Scraper class of every known source, by the name stored in the mangas.source column
+PROVIDERS = {
+    "demonicscans": mangaAPI_Demonicscans.MangaManager,
+    "manganato": mangaAPI_Manganato.MangaManager,
+}
+
+
+def register_provider(name: str, manager_class):
+    """Make another scraper class available under `name`."""
+    PROVIDERS[name] = manager_class
+
+
+class LatencyTracker:
+    """Keeps the most recent response times of one provider."""
+
+    def __init__(self, window: int = config.HEDGE_WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index]
+
+
+class ProviderRegistry:
+    """The configured scrapers, in order of preference, sharing one HTTP client and page cache.
+
+    `get_manga` asks the primary first. When it fails, or is slower than its
+    usual latency percentile, the next provider is raced against it and the
+    first complete Manga wins.
+    """
+
+    def __init__(
+        self,
+        names: List[str] = config.PROVIDERS,
+        hedge: bool = config.HEDGE_ENABLED,
+        hedge_percentile: float = config.HEDGE_PERCENTILE,
+        hedge_delay: float = config.HEDGE_DELAY,
+        min_samples: int = config.HEDGE_MIN_SAMPLES,
+        http_client: HttpClient = None,
+        http_cache: HttpCache = None,
+    ):
+        unknown = [name for name in names if name not in PROVIDERS]
+        if unknown or not names:
+            raise ValueError(f"Unknown providers: {', '.join(unknown)}, use some of {', '.join(PROVIDERS)}.")
+        self.http_client = http_client or HttpClient()
+        self.http_cache = http_cache or HttpCache()
+        self.managers = {
+            name: PROVIDERS[name](http_client=self.http_client, http_cache=self.http_cache) for name in names
+        }
+        self.latencies = {name: LatencyTracker() for name in names}
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = hedge_delay
+        self.min_samples = min_samples
+
+    @property
+    def primary_name(self) -> str:
+        return next(iter(self.managers))
+
+    @property
+    def primary(self):
+        return self.managers[self.primary_name]
+
+    def resolve(self, source: Optional[str]) -> str:
+        """Return the provider to use for a stored source, the primary when it is unknown."""
+        return source if source in self.managers else self.primary_name
+
+    def hedge_delay(self, name: str) -> float:
+        """Seconds to wait on a provider before racing the next one."""
+        latencies = self.latencies[name]
+        if len(latencies.samples) < self.min_samples:
+            return self.default_hedge_delay
+        return latencies.percentile(self.hedge_percentile)
+
+    async def _fetch(self, name: str, manga_name: str) -> Manga:
+        manager = self.managers[name]
+        started_at = time.monotonic()
+        manga = await manager.fetch_manga(manager.client, manga_name)
+        # Errors are left out, the breaker and retries already account for them
+        elapsed = time.monotonic() - started_at
+        self.latencies[name].record(elapsed)
+        PROVIDER_SECONDS.observe(elapsed, provider=name)
+        return manga
+
+    async def get_manga(self, manga_name: str) -> Manga:
+        """Scrape a manga from the first provider that has it, with its `source` set.
+
+        Returns None when no provider has the title and raises FetchError when
+        none had it but at least one could not be reached.
+        """
+        waiting = list(self.managers)
+        pending: Dict[asyncio.Future, str] = {}
+        unavailable = []
+
+        def launch() -> str:
+            name = waiting.pop(0)
+            pending[asyncio.ensure_future(self._fetch(name, manga_name))] = name
+            return name
+
+        latest = launch()
+        try:
+            while pending:
+                timeout = self.hedge_delay(latest) if self.hedge and waiting else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slower than usual, race the next provider
+                    latest = launch()
+                    HEDGES.inc(provider=latest)
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    try:
+                        manga = task.result()
+                    except FetchError as e:
+                        unavailable.append(f"{name}: {e}")
+                        continue
+                    if isinstance(manga, Manga):
+                        manga.source = name
+                        return manga
+                if not pending and waiting:
+                    # Every provider asked so far failed, fail over to the next one
+                    latest = launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        if unavailable:
+            raise FetchError("; ".join(unavailable))
+        return None
+
+    def image_hosts(self) -> Set[str]:
+        """Hosts cover images may come from: the providers' sites, their image CDNs and COVER_ALLOWED_HOSTS."""
+        hosts = set(config.COVER_ALLOWED_HOSTS)
+        for manager in self.managers.values():
+            hosts.add(httpx.URL(manager.base_url).host)
+            hosts.update(getattr(manager, "IMAGE_HOSTS", ()))
+        return hosts
+
+    async def aclose(self):
+        """Close the shared HTTP client and page cache."""
+        await self.http_client.aclose()
+        self.http_cache.close()
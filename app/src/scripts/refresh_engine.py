@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+import httpx
+from app.src import config
+from app.src.models.manga import Manga
+from app.src.scripts.database_manager import DatabaseManager
+from app.src.scripts.http_client import FetchError
+from app.src.scripts.metrics import PARSE_ERRORS, SCRAPE_ERRORS, timed
+
+logger = logging.getLogger(__name__)
+
+
+# One parse-only scraper per scraper class, built once in each pool process
+_worker_managers = {}
+
+
+def _parse_in_worker(manager_class, base_url: str, manga_name: str, url: str, html: str):
+    """Parse a fetched page, runs inside a parse pool process.
+
+    Returns the Manga and the parse errors it counted, a pool process's
+    metrics never reach /metrics otherwise.
+    """
+    manager = _worker_managers.get(manager_class)
+    if manager is None:
+        manager = _worker_managers[manager_class] = manager_class()
+    manager.base_url = base_url
+    before = dict(PARSE_ERRORS._values)
+    manga = manager.parse_manga(manga_name, url, html)
+    parse_errors = {
+        key: count - before.get(key, 0) for key, count in PARSE_ERRORS._values.items() if count != before.get(key, 0)
+    }
+    return manga, parse_errors
+
+
+class RefreshEngine:
+    def __init__(
+        self,
+        providers,
+        max_concurrency: int = config.REFRESH_MAX_CONCURRENCY,
+        batch_size: int = config.REFRESH_BATCH_SIZE,
+        executor: Optional[Executor] = None,
+        parse_workers: int = config.REFRESH_PARSE_WORKERS,
+    ):
+        # ProviderRegistry, each title is refreshed from the source that served it
+        self.providers = providers
+        self.max_concurrency = max_concurrency
+        # Per-host limits, retries and timeouts come from the scraper's HttpClient
+        self.batch_size = batch_size
+        # Executor for the blocking database writes, the default one when not given
+        self.executor = executor
+        self.parse_workers = parse_workers
+        # Started on the first refresh and kept, spawning processes is expensive
+        self.parse_pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_parse_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.parse_workers > 0 and self.parse_pool is None:
+            # spawn, forking a process that runs threads and an event loop is unsafe
+            self.parse_pool = ProcessPoolExecutor(
+                max_workers=self.parse_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.parse_pool
+
+    @staticmethod
+    def _write_batch(mangas: List[Manga]) -> List[str]:
+        """Update a batch of stored mangas in a single transaction, returns the outcome of each."""
+        with DatabaseManager() as db_manager:
+            return db_manager.update_many(mangas)
+
+    async def refresh(
+        self,
+        manga_names: List[str],
+        sources: Optional[Dict[str, str]] = None,
+        on_batch_written: Optional[Callable[[List[Manga]], None]] = None,
+        on_result: Optional[Callable[[str, str, str], None]] = None,
+    ) -> List[str]:
+        """Refresh every manga through a fetch -> parse -> write pipeline.
+
+        Pages are fetched concurrently, parsed on the process pool and written
+        back in batches, only updating titles that are still stored. `sources`
+        maps names to the provider each was stored from, the primary serves
+        the rest. `on_batch_written` is called with the mangas each batch
+        actually changed once it is committed, `on_result` with (name, status,
+        message) as each title finishes, status being one of updated,
+        unchanged, not_found or failed.
+        """
+        results: Dict[str, str] = {}
+
+        def record(manga_name: str, status: str, message: str):
+            results[manga_name] = message
+            if on_result:
+                on_result(manga_name, status, message)
+
+        # Bounded, so fetchers wait for the writer instead of piling parsed mangas up
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 2)
+        fetch_slots = asyncio.Semaphore(self.max_concurrency)
+        # Caps the fetched pages waiting for a parser, so memory stays bounded
+        parse_slots = asyncio.Semaphore(max(self.parse_workers, 1) * 2)
+        parse_pool = self._get_parse_pool()
+        loop = asyncio.get_running_loop()
+        sources = sources or {}
+
+        async def fetch(manga_name: str):
+            source = self.providers.resolve(sources.get(manga_name))
+            manga_manager = self.providers.managers[source]
+            try:
+                async with fetch_slots:
+                    with timed("fetch", source):
+                        page = await manga_manager.fetch_page(manga_manager.client, manga_name)
+                if page is None:
+                    record(manga_name, "not_found", f"No results found for {manga_name}.")
+                elif not page.changed:
+                    # Same page as the last written one, nothing to parse or write
+                    record(manga_name, "unchanged", f"Manga: {manga_name} unchanged.")
+                else:
+                    async with parse_slots:
+                        with timed("parse", source):
+                            manga_fetched, parse_errors = await loop.run_in_executor(
+                                parse_pool, _parse_in_worker,
+                                type(manga_manager), manga_manager.base_url, manga_name, page.url, page.text,
+                            )
+                    if parse_pool is not None:
+                        # Without a pool the parse ran in this process and is already counted
+                        for (provider, field), count in parse_errors.items():
+                            PARSE_ERRORS.inc(count, provider=provider, field=field)
+                    if isinstance(manga_fetched, Manga):
+                        manga_fetched.source = source
+                        await queue.put((manga_fetched, page))
+                    else:
+                        record(manga_name, "not_found", f"No results found for {manga_name}.")
+            except FetchError as e:
+                # The source is down or throttling us, the stored entry stays as it is
+                record(manga_name, "failed", f"Source unavailable for {manga_name}: {e}")
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 404:
+                    record(manga_name, "not_found", f"No results found for {manga_name}.")
+                else:
+                    record(manga_name, "failed", f"Source unavailable for {manga_name}: HTTP {e.response.status_code}")
+            except Exception as e:
+                logger.exception("Refreshing %s from %s failed", manga_name, source)
+                SCRAPE_ERRORS.inc(provider=source)
+                record(manga_name, "failed", f"Refresh of {manga_name} failed: {e}")
+
+        async def write_batch(batch):
+            mangas = [manga for manga, _ in batch]
+            try:
+                with timed("write"):
+                    outcomes = await loop.run_in_executor(self.executor, self._write_batch, mangas)
+                # Only now may these pages count as unchanged, a failed write gets them parsed again
+                await self.providers.http_cache.mark_processed([page for _, page in batch])
+            except Exception as e:
+                # E.g. the database stayed locked, the next batches may still go through
+                logger.exception("Writing a batch of %d refreshed mangas failed", len(mangas))
+                for manga in mangas:
+                    record(manga.name, "failed", f"Storing {manga.name} failed: {e}")
+                return
+            written = [manga for manga, outcome in zip(mangas, outcomes) if outcome == "updated"]
+            # Caches and subscribers only hear about rows that actually changed
+            if on_batch_written and written:
+                on_batch_written(written)
+            for manga, outcome in zip(mangas, outcomes):
+                if outcome == "removed":
+                    # Deleted while its page was being scraped, refreshing must not bring it back
+                    record(manga.name, "not_found", f"Manga: {manga.name} was removed, not refreshed.")
+                elif outcome == "unchanged":
+                    # A new page, e.g. other ads, with the same details
+                    record(manga.name, "unchanged", f"Manga: {manga.name} unchanged.")
+                else:
+                    record(manga.name, "updated", f"Manga: {manga.name} updated successfully.")
+
+        async def write():
+            while True:
+                batch = [await queue.get()]
+                while len(batch) < self.batch_size and not queue.empty():
+                    batch.append(queue.get_nowait())
+                stop = None in batch
+                batch = [item for item in batch if item is not None]
+                if batch:
+                    await write_batch(batch)
+                if stop:
+                    return
+
+        writer = asyncio.create_task(write())
+        try:
+            await asyncio.gather(*(fetch(manga_name) for manga_name in manga_names))
+        finally:
+            # None marks the end of the fetch and parse stages
+            if not writer.done():
+                await queue.put(None)
+            await writer
+        return [results[manga_name] for manga_name in manga_names if manga_name in results]
+
+    def close(self):
+        """Stop the parse pool processes."""
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown(wait=True)
+            self.parse_pool = None
@@ -0,0 +1,140 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from app.src import config
+from app.src.scripts.database_manager import from_epoch
+
+logger = logging.getLogger(__name__)
+
+# Statuses that will not get new chapters
+FINISHED_STATUSES = {"completed", "finished", "cancelled", "canceled", "dropped"}
+
+
+class RefreshScheduler:
+    """Refreshes titles in the background, each one when it is due.
+
+    Every title gets a next check time from its status and release cadence.
+    Due titles are kept in a priority queue and refreshed one at a time,
+    at least `spacing` seconds apart, so the load on the sources stays flat.
+    """
+
+    def __init__(
+        self,
+        service_handler,
+        spacing: float = config.SCHEDULER_SPACING,
+        min_interval: float = config.SCHEDULER_MIN_INTERVAL,
+        max_interval: float = config.SCHEDULER_MAX_INTERVAL,
+        completed_interval: float = config.SCHEDULER_COMPLETED_INTERVAL,
+        cadence: float = config.SCHEDULER_DEFAULT_CADENCE,
+        reload_interval: float = config.SCHEDULER_RELOAD_INTERVAL,
+    ):
+        self.service_handler = service_handler
+        self.spacing = spacing
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.completed_interval = completed_interval
+        self.cadence = cadence
+        self.reload_interval = reload_interval
+        self._queue: List[Tuple[float, str]] = []
+        # Latest due time per title, older queue entries are skipped when popped
+        self._due: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def next_check_in(self, status: str, last_release: Optional[datetime], now: datetime) -> float:
+        """Return how many seconds to wait before checking a title again."""
+        if status and status.strip().lower() in FINISHED_STATUSES:
+            interval = self.completed_interval
+        elif last_release is None:
+            interval = self.max_interval
+        else:
+            since_release = (now - last_release).total_seconds()
+            if since_release < self.cadence:
+                # Check right when the next chapter is expected to drop
+                interval = self.cadence - since_release
+            else:
+                # Overdue, check more often at first, then back off for long hiatuses
+                interval = (since_release - self.cadence) / 2
+            interval = min(max(interval, self.min_interval), self.max_interval)
+        # Jitter keeps titles added together from staying in lockstep
+        return interval * random.uniform(0.9, 1.1)
+
+    def schedule(self, manga_name: str, due: float):
+        self._due[manga_name] = due
+        heapq.heappush(self._queue, (due, manga_name))
+
+    def unschedule(self, manga_name: str):
+        """Stop refreshing a removed title, its queue entry is skipped when popped."""
+        self._due.pop(manga_name, None)
+
+    def _schedule_title(self, manga_name: str, status: Optional[str], last_release: Optional[datetime], now: float):
+        utc_now = datetime.now(timezone.utc).replace(tzinfo=None)
+        self.schedule(manga_name, now + self.next_check_in(status, last_release, utc_now))
+
+    async def _load(self):
+        """Schedule every stored title that is not scheduled yet and forget removed ones."""
+        rows = await self.service_handler.get_refresh_rows()
+        now = time.time()
+        names = set()
+        for row in rows:
+            names.add(row["name"])
+            if row["name"] not in self._due:
+                # Release dates are stored as UTC Unix times
+                last_release = from_epoch(row["last_chapter_release_date"])
+                self._schedule_title(row["name"], row["status"], last_release, now)
+        for manga_name in set(self._due) - names:
+            del self._due[manga_name]
+
+    async def _refresh(self, manga_name: str):
+        try:
+            result = await self.service_handler.refresh_entry(manga_name)
+            logger.info("Scheduled refresh: %s", result)
+        except Exception:
+            logger.exception("Scheduled refresh of %s failed", manga_name)
+            self.schedule(manga_name, time.time() + self.min_interval)
+            return
+        record = await self.service_handler.retrieve_manga(manga_name)
+        if record is None:
+            return  # Removed in the meantime
+        released = record["last_chapter_release_date"]
+        last_release = datetime.fromisoformat(released) if released else None
+        self._schedule_title(manga_name, record["status"], last_release, time.time())
+
+    async def _run(self):
+        await self._load()
+        next_reload = time.time() + self.reload_interval
+        while True:
+            now = time.time()
+            if now >= next_reload:
+                await self._load()
+                next_reload = now + self.reload_interval
+            if not self._queue:
+                await asyncio.sleep(min(self.spacing, next_reload - now))
+                continue
+            due, manga_name = self._queue[0]
+            if self._due.get(manga_name) != due:
+                heapq.heappop(self._queue)  # Stale entry
+                continue
+            if due > now:
+                await asyncio.sleep(min(due - now, next_reload - now))
+                continue
+            heapq.heappop(self._queue)
+            del self._due[manga_name]
+            await self._refresh(manga_name)
+            await asyncio.sleep(self.spacing)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
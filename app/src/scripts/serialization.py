@@ -0,0 +1,50 @@
+import gzip
+import hashlib
+import json
+from typing import Any, NamedTuple, Optional
+from app.src import config
+
+try:
+    import orjson  # Optional, several times faster than the json module
+except ImportError:
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag for a response derived from the given version parts."""
+    digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def gzip_etag(etag: str) -> str:
+    """ETag of the gzip encoded representation, strong ETags differ per encoding."""
+    return etag[:-1] + '-gzip"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or gzip_etag(etag) in candidates
+
+
+class SerializedBody(NamedTuple):
+    """A response body serialized once, with its gzip form when large enough to be worth it."""
+    etag: Optional[str]
+    body: bytes
+    gzipped: Optional[bytes]
+
+
+def serialize(value: Any, etag: Optional[str] = None, min_gzip_size: int = config.GZIP_MIN_SIZE) -> SerializedBody:
+    body = dumps(value)
+    gzipped = gzip.compress(body, compresslevel=6) if len(body) >= min_gzip_size else None
+    return SerializedBody(etag, body, gzipped)
@@ -1,45 +1,379 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+from pydantic import ValidationError
+from app.src import config
+from app.src.scripts import metrics
 from app.src.models.manga import Manga
+from app.src.scripts.cache import LRUCache
+from app.src.scripts.change_watcher import ChangeWatcher
+from app.src.scripts.chapter_feed import ChapterFeed
+from app.src.scripts.cover_cache import CoverCache, CoverFile
 from app.src.scripts.database_manager import DatabaseManager
-from app.src.scripts.mangaAPI_Demonicscans import MangaManager
+from app.src.scripts.file_lock import FileLock
+from app.src.scripts.http_client import FetchError, HttpClient
+from app.src.scripts.job_manager import Job, JobManager
+from app.src.scripts.providers import ProviderRegistry
+from app.src.scripts.refresh_engine import RefreshEngine
+from app.src.scripts.serialization import SerializedBody, dumps, make_etag, serialize
+from app.src.scripts.webhook_sink import WebhookSink
 
 class ServiceHandler:
     def __init__(self):
-        self.manga_manager = MangaManager()
-    
-    def create_entry(self, manga_name: str):
-        manga_fetched = self.manga_manager.get_manga(manga_name)
+        # Configured scrapers, the primary one first
+        self.providers = ProviderRegistry()
+        self.manga_manager = self.providers.primary
+        # Bounded pool for the blocking sqlite3 calls, keeps them off the event loop
+        self.db_executor = ThreadPoolExecutor(
+            max_workers=config.DB_EXECUTOR_WORKERS, thread_name_prefix="db"
+        )
+        # Writes queue up on one thread, so they never wait on each other for the
+        # SQLite write lock while holding a reader's thread
+        self.db_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self.refresh_engine = RefreshEngine(self.providers, executor=self.db_writer)
+        # Read-through cache for the GET routes, invalidated by every write
+        self.cache = LRUCache()
+        # Writes of the other workers clear it too
+        self.watcher = ChangeWatcher(self.db_executor, self._on_external_change) if config.WORKERS > 1 else None
+        # Held by the worker running a full refresh, so workers do not start one each
+        self._refresh_lock = FileLock(DatabaseManager.default_db_path() + "-refresh.lock")
+        # Scrapes in progress by name, so concurrent adds of one title coalesce
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # Long refreshes run as background jobs
+        self.jobs = JobManager()
+        # New chapters pushed to /mangas/stream subscribers and the optional webhook
+        self.feed = ChapterFeed(self._run_db)
+        self.webhook = WebhookSink(self.feed) if config.WEBHOOK_URL else None
+        # Local copies of the cover images, filled after scrapes. Downloaded with a client of its
+        # own, so failing images never open the breaker the scrapers use for the same host
+        self.covers = CoverCache(HttpClient(), allowed_hosts=self.providers.image_hosts)
+
+    async def start(self):
+        """Start the chapter feed and the change watcher, needs the database pool."""
+        await self.feed.start()
+        if self.watcher:
+            self.watcher.start()
+
+    def watch_external_changes(self):
+        """Start the change watcher if it is not running, for another process writing to the database."""
+        if self.watcher is None:
+            self.watcher = ChangeWatcher(self.db_executor, self._on_external_change)
+            self.watcher.start()
+
+    def start_leader_tasks(self):
+        """Start the webhook delivery, run by a single worker so events are posted once."""
+        if self.webhook:
+            self.webhook.start()
+
+    @staticmethod
+    def _call_db(method_name: str, *args, **kwargs):
+        with DatabaseManager() as db_manager:
+            return getattr(db_manager, method_name)(*args, **kwargs)
+
+    async def _execute_db(self, write: bool, method_name: str, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        started_at = time.perf_counter()
+        try:
+            return await loop.run_in_executor(
+                self.db_writer if write else self.db_executor,
+                functools.partial(self._call_db, method_name, *args, **kwargs),
+            )
+        finally:
+            elapsed = time.perf_counter() - started_at
+            metrics.DB_SECONDS.observe(elapsed, method=method_name)
+            metrics.record_stage("write" if write else "read", elapsed)
+
+    async def _run_db(self, method_name: str, *args, **kwargs):
+        """Run a DatabaseManager read on the database executor."""
+        return await self._execute_db(False, method_name, *args, **kwargs)
+
+    async def _write_db(self, method_name: str, *args, **kwargs):
+        """Run a DatabaseManager write on the writer thread, writes queue there instead of on the SQLite lock."""
+        return await self._execute_db(True, method_name, *args, **kwargs)
+
+    async def _cached_db(self, key, method_name: str, *args):
+        """Serve a read from the cache, falling back to the database on a miss."""
+        value = self.cache.get(key)
+        if value is None:
+            generation = self.cache.generation
+            value = await self._run_db(method_name, *args)
+            self.cache.set(key, value, generation)
+        return value
+
+    def _invalidate(self, *manga_names: str):
+        self.cache.invalidate(
+            "mangas", "version",
+            *[key for manga_name in manga_names for key in (("manga", manga_name), ("manga_json", manga_name))],
+        )
+        # The write may have appended chapter events
+        self.feed.notify()
+
+    def _on_external_change(self):
+        """Another worker wrote to the library, nothing cached here can be trusted."""
+        metrics.EXTERNAL_CHANGES.inc()
+        self.cache.clear()
+        self.feed.notify()
+
+    def _on_batch_written(self, mangas: List[Manga]):
+        self._invalidate(*[manga.name for manga in mangas])
+        self.covers.prefetch(manga.image_link for manga in mangas)
+
+    async def _create_entry(self, manga_name: str):
+        try:
+            manga_fetched = await self.providers.get_manga(manga_name)
+        except FetchError as e:
+            return f"Source unavailable for {manga_name}: {e}"
         if isinstance(manga_fetched, Manga):
-            with DatabaseManager() as db_manager:
-                result = db_manager.store_manga_data(manga_fetched)
-                return result
+            result = await self._write_db("store_manga_data", manga_fetched)
+            self._on_batch_written([manga_fetched])
+            return result
         else:
             return f"No results found for {manga_name}."
+
+    async def create_entry(self, manga_name: str):
+        """Scrape and store a manga, concurrent calls for the same name share one scrape and write."""
+        # Same key as create_entries, so " Title" and "Title" coalesce too
+        manga_name = manga_name.strip()
+        task = self._in_flight.get(manga_name)
+        if task is None:
+            task = asyncio.ensure_future(self._create_entry(manga_name))
+            self._in_flight[manga_name] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(manga_name, None))
+        # Shielded so one caller going away does not cancel the scrape for the others
+        return await asyncio.shield(task)
+
+    async def create_entries(self, manga_names: List[str]) -> Dict[str, str]:
+        """Add several mangas at once, each distinct name is scraped once."""
+        semaphore = asyncio.Semaphore(config.BATCH_MAX_CONCURRENCY)
+        unique_names = list(dict.fromkeys(name.strip() for name in manga_names if name.strip()))
+
+        async def create(manga_name: str) -> str:
+            async with semaphore:
+                return await self.create_entry(manga_name)
+
+        results = await asyncio.gather(*(create(manga_name) for manga_name in unique_names))
+        return dict(zip(unique_names, results))
         
-    def retrieve_manga(self, manga_name: str):
-        with DatabaseManager() as db_manager:
-            manga = db_manager.get_manga(manga_name)
-            return manga
+    async def retrieve_manga(self, manga_name: str) -> Optional[dict]:
+        """Return a stored manga as a MangaRecord dict, None when it is not stored."""
+        return await self._cached_db(("manga", manga_name), "get_manga_record", manga_name)
         
-    def get_all_entries(self):
-        with DatabaseManager() as db_manager:
-            mangas = db_manager.get_all()
-            return mangas
+    async def get_all_entries(self):
+        return await self._run_db("get_all")
+
+    async def get_refresh_rows(self) -> List[dict]:
+        """Name, status, release date and source of every stored manga."""
+        return await self._run_db("get_refresh_rows")
+
+    async def get_all_entries_json(self) -> SerializedBody:
+        """Return the full list already serialized and compressed, so repeated polls skip the encoder."""
+        body = self.cache.get("mangas")
+        if body is None:
+            generation = self.cache.generation
+            version, records = await self._run_db("get_all_records")
+            body = serialize(records, make_etag("mangas", version))
+            self.cache.set("mangas", body, generation)
+        return body
+
+    async def retrieve_manga_json(self, manga_name: str) -> Optional[SerializedBody]:
+        """Return one manga serialized as a MangaRecord, None when it is not stored."""
+        body = self.cache.get(("manga_json", manga_name))
+        if body is None:
+            generation = self.cache.generation
+            record = await self._run_db("get_manga_record", manga_name)
+            if record is None:
+                return None
+            fingerprint = record.pop("fingerprint")
+            body = serialize(record, make_etag("manga", record["id"], fingerprint, record["source"]))
+            self.cache.set(("manga_json", manga_name), body, generation)
+        return body
+
+    async def retrieve_cover(self, manga_name: str) -> Optional[CoverFile]:
+        """Return the locally cached cover of a stored manga, downloading it if needed."""
+        stored = await self.retrieve_manga(manga_name)
+        if stored is None:
+            return None
+        return await self.covers.get(stored["image_link"])  # None when the page had no image
+
+    async def library_version(self) -> int:
+        """Version of the mangas table, list and search ETags derive from it."""
+        return await self._cached_db("version", "library_version")
         
-    def remove_manga(self, manga_name: str):
-        with DatabaseManager() as db_manager:
-            db_manager.remove_manga_data(manga_name)
-            return "Manga removed successfully"
+    async def refresh_entry(self, manga_name: str) -> str:
+        """Refresh one stored title, skipping the write when its page did not change."""
+        stored = await self.retrieve_manga(manga_name)
+        if stored is None:
+            # Removed since it was scheduled, scraping it would be wasted
+            return f"Manga: {manga_name} was removed, not refreshed."
+        # Same pipeline as a full refresh, so its page only counts as seen once the write committed
+        results = await self.refresh_engine.refresh(
+            [manga_name], {manga_name: stored["source"]}, on_batch_written=self._on_batch_written
+        )
+        return results[0]
+
+    async def query_entries(self, **query) -> dict:
+        """Return one filtered, sorted and projected page of mangas."""
+        return await self._run_db("query_mangas", **query)
+
+    async def facet_counts(self, facet: str, limit: int, offset: int) -> dict:
+        """Return the genres or authors with their manga counts, read from the maintained counters."""
+        return await self._run_db("get_facet_counts", facet, limit, offset)
+
+    async def chapter_updates(self, since: Optional[datetime], limit: int, cursor: Optional[str]) -> dict:
+        """Return the chapters detected since a time or cursor, from the chapter_events index."""
+        return await self._run_db("get_chapter_events", since, limit, cursor)
+
+    async def search_entries(self, text: str, limit: int, offset: int) -> dict:
+        """Return ranked full text search results with snippets."""
+        return await self._run_db("search_mangas", text, limit, offset)
+
+    @staticmethod
+    def _next_export_chunk(records: Iterator[List[dict]]) -> Optional[bytes]:
+        chunk = next(records, None)
+        if chunk is None:
+            return None
+        return b"".join(dumps(record) + b"\n" for record in chunk)
+
+    async def export_entries(self, chunk_size: int = config.EXPORT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Yield the library as NDJSON, one MangaRecord per line, read and encoded chunk by chunk."""
+        loop = asyncio.get_running_loop()
+        db_manager = DatabaseManager()
+        # A slow client holds this connection for the whole stream, so it is not taken from the pool
+        await loop.run_in_executor(self.db_executor, db_manager.connect_reader)
+        records = db_manager.iter_records(chunk_size)
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self.db_executor, self._next_export_chunk, records)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            # Ends the read transaction before the connection is closed
+            await loop.run_in_executor(self.db_executor, records.close)
+            await loop.run_in_executor(self.db_executor, db_manager.close)
+
+    async def import_entries(
+        self, chunks: AsyncIterator[bytes], batch_size: int = config.IMPORT_BATCH_SIZE
+    ) -> dict:
+        """Upsert mangas from an NDJSON stream in batched transactions, without scraping.
+
+        Lines are parsed as they arrive and each batch is written before more
+        of the body is read. Rows whose content did not change are not rewritten.
+        """
+        summary = {"received": 0, "written": 0, "unchanged": 0, "failed": 0, "errors": []}
+        batch: List[Manga] = []
+
+        async def flush():
+            written = await self._write_db("store_many", batch)
+            summary["written"] += written
+            summary["unchanged"] += len(batch) - written
+            self._invalidate(*[manga.name for manga in batch])
+            batch.clear()
+
+        line_number = 0
+        buffer = b""
+        async for chunk in chunks:
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            if len(buffer) > config.IMPORT_MAX_LINE_BYTES:
+                raise ValueError(f"Line {line_number + len(lines) + 1} is longer than {config.IMPORT_MAX_LINE_BYTES} bytes.")
+            for line in lines:
+                line_number += 1
+                self._parse_import_line(line, line_number, batch, summary)
+            if len(batch) >= batch_size:
+                await flush()
+        if buffer:
+            line_number += 1
+            self._parse_import_line(buffer, line_number, batch, summary)
+        if batch:
+            await flush()
+        return summary
+
+    @staticmethod
+    def _parse_import_line(line: bytes, line_number: int, batch: List[Manga], summary: dict):
+        if not line.strip():
+            return
+        summary["received"] += 1
+        try:
+            batch.append(Manga.model_validate_json(line))  # Exported ids are ignored, names are the key
+        except ValidationError as e:
+            summary["failed"] += 1
+            if len(summary["errors"]) < config.IMPORT_MAX_ERRORS:
+                details = "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc']) or 'line'}: {error['msg']}" for error in e.errors()
+                )
+                summary["errors"].append({"line": line_number, "message": details})
+
+    async def remove_manga(self, manga_name: str) -> Optional[str]:
+        """Delete a stored manga, None when it was not stored."""
+        if not await self._write_db("remove_manga_data", manga_name):
+            return None
+        self._invalidate(manga_name)
+        return "Manga removed successfully"
         
-    # To be defined
-    def update_all_entries(self):
-        results = []
-        with DatabaseManager() as db_manager:
-            mangas = db_manager.get_all()
-            for manga in mangas:
-                manga_fetched = self.manga_manager.get_manga(manga[2])
-                if isinstance(manga_fetched, Manga):
-                    result = db_manager.store_manga_data(manga_fetched)
-                    results.append(result)
-                else:
-                    results.append(f"No results found for {manga[2]}.")
-        return results
\ No newline at end of file
+    async def update_all_entries(
+        self,
+        manga_names: Optional[List[str]] = None,
+        on_result: Optional[Callable[[str, str, str], None]] = None,
+    ):
+        # Stored source of every title, so each one is refreshed where it was found
+        sources = {row["name"]: row["source"] for row in await self.get_refresh_rows()}
+        if manga_names is None:
+            manga_names = list(sources)
+        return await self.refresh_engine.refresh(
+            manga_names,
+            sources,
+            on_batch_written=self._on_batch_written,
+            on_result=on_result,
+        )
+
+    async def start_update_job(self) -> Optional[Job]:
+        """Start refreshing the whole library in the background, or return the refresh already running.
+
+        Returns None when another worker is running one.
+        """
+        job = self.jobs.running("refresh")
+        if job:
+            return job
+        manga_names = [row["name"] for row in await self.get_refresh_rows()]
+        # Another request may have started one while the names were read
+        job = self.jobs.running("refresh")
+        if job:
+            return job
+        if not self._refresh_lock.acquire(blocking=False):
+            return None
+
+        async def run(job: Job):
+            await self.update_all_entries(manga_names, on_result=job.record)
+
+        job = self.jobs.start("refresh", manga_names, run)
+        job.task.add_done_callback(lambda _: self._refresh_lock.release())
+        return job
+
+    def collect_metrics(self):
+        """Publish the state kept by the handler itself before a metrics scrape."""
+        stats = self.cache.stats()
+        metrics.RESPONSE_CACHE.set(stats["hits"], result="hit")
+        metrics.RESPONSE_CACHE.set(stats["misses"], result="miss")
+        metrics.RESPONSE_CACHE_EVICTIONS.set(stats["evictions"])
+        metrics.RESPONSE_CACHE_HIT_RATIO.set(stats["hit_ratio"])
+        metrics.SCRAPES_IN_FLIGHT.set(len(self._in_flight))
+        metrics.STREAM_SUBSCRIBERS.set(self.feed.subscribers)
+
+    async def close(self):
+        """Cancel running jobs, release the HTTP client and page cache, the parse pool and the database executors."""
+        await self.jobs.close()
+        if self.watcher:
+            await self.watcher.stop()
+        await self.feed.close()
+        await self.covers.close()
+        await self.covers.http_client.aclose()
+        if self.webhook:
+            await self.webhook.stop()
+        await self.providers.aclose()
+        self.refresh_engine.close()
+        self.db_writer.shutdown(wait=True)
+        self.db_executor.shutdown(wait=True)
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+from typing import List, Optional
+from app.src import config
+from app.src.scripts.chapter_feed import ChapterFeed
+from app.src.scripts.http_client import FetchError, HttpClient
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookSink:
+    """POSTs new chapter events to a webhook in batches.
+
+    Batches go out when `batch_size` events are waiting or `flush_interval`
+    seconds after the first one. Each POST is retried by the HttpClient, a
+    batch that still fails is sent again after `retry_interval` by replaying
+    the feed from the last delivered event id.
+    """
+
+    def __init__(
+        self,
+        feed: ChapterFeed,
+        url: str = config.WEBHOOK_URL,
+        http_client: HttpClient = None,
+        batch_size: int = config.WEBHOOK_BATCH_SIZE,
+        flush_interval: float = config.WEBHOOK_FLUSH_INTERVAL,
+        retry_interval: float = config.WEBHOOK_RETRY_INTERVAL,
+    ):
+        self.feed = feed
+        self.url = url
+        self.http_client = http_client or HttpClient()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.last_delivered_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _deliver(self, batch: List[dict]) -> bool:
+        try:
+            response = await self.http_client.post(self.url, json={"events": batch})
+        except FetchError as e:
+            logger.warning("Webhook delivery failed: %s", e)
+            return False
+        if response.is_success:
+            self.last_delivered_id = batch[-1]["id"]
+            return True
+        # Any other client error will not fix itself, drop the batch instead of looping on it
+        logger.error("Webhook rejected %d events with HTTP %d", len(batch), response.status_code)
+        self.last_delivered_id = batch[-1]["id"]
+        return True
+
+    async def _run(self):
+        self.last_delivered_id = self.feed.last_id
+        while True:
+            batch: List[dict] = []
+            first_at = 0.0
+            delivered = True
+            events = self.feed.subscribe(self.last_delivered_id, keepalive=self.flush_interval)
+            async with aclosing(events):
+                async for event in events:
+                    if event is not None:
+                        if not batch:
+                            first_at = time.monotonic()
+                        batch.append(event)
+                    if batch and (
+                        len(batch) >= self.batch_size or time.monotonic() - first_at >= self.flush_interval
+                    ):
+                        delivered = await self._deliver(batch)
+                        batch = []
+                        if not delivered:
+                            break
+            if batch:
+                # Dropped for falling behind, the rest is replayed on the next subscription
+                delivered = await self._deliver(batch)
+            if not delivered:
+                await asyncio.sleep(self.retry_interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop delivering and close the client."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.http_client.aclose()
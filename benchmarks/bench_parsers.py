@@ -0,0 +1,113 @@
+"""Micro-benchmark of the scraper parsing path on the saved HTML fixtures.
+
+Every backend parses each fixture with and without the page strainer. The
+script reports the best pages/sec of a few rounds per mode, with the speedup
+of the strained parse over the full one, and exits non-zero if any mode
+produces a different Manga than the reference html.parser full-page parse.
+tests/test_parsers.py checks the same equality on every test run.
+
+The strainer only saves building the Tag objects it drops, the tokenizer still
+reads the whole page, so its gain is small and on some pages within run-to-run
+noise: read the speedup column rather than assuming it pays off.
+
+    PYTHONPATH=. python -m benchmarks.bench_parsers --number 50 --rounds 5
+"""
+import argparse
+import os
+import sys
+import time
+from app.src.scripts import mangaAPI_Demonicscans, mangaAPI_Manganato
+from app.src.scripts.html_parser import available_backends
+from app.src.scripts.http_cache import HttpCache
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as fixture:
+        return fixture.read()
+
+
+def make_cases(pages: dict):
+    # In-memory page cache so the benchmark leaves nothing on disk
+    demonicscans = mangaAPI_Demonicscans.MangaManager(http_cache=HttpCache(":memory:"))
+    manganato = mangaAPI_Manganato.MangaManager(http_cache=HttpCache(":memory:"))
+    return [
+        (
+            "demonicscans",
+            demonicscans,
+            lambda manager, backend: manager.parse_manga(
+                "Solo Leveling", "https://demonicscans.org/manga/Solo-Leveling",
+                pages["demonicscans_manga.html"], backend,
+            ),
+        ),
+        (
+            "manganato",
+            manganato,
+            lambda manager, backend: manager.parse_manga(
+                "Solo Leveling", manager.parse_search(pages["manganato_search.html"], backend),
+                pages["manganato_manga.html"], backend,
+            ),
+        ),
+    ]
+
+
+def set_mode(manager, mode: str):
+    """Parse with the manager's strainers in "strained" mode, whole pages in "full" mode."""
+    for name in ("SEARCH_SECTIONS", "PAGE_SECTIONS"):
+        if mode == "strained":
+            manager.__dict__.pop(name, None)
+        elif hasattr(manager, name):
+            setattr(manager, name, None)
+
+
+def pages_per_second(parse, manager, backend: str, number: int, rounds: int) -> float:
+    """Best of `rounds`, the slower rounds are mostly other processes getting in the way."""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            parse(manager, backend)
+        best = min(best, time.perf_counter() - start)
+    return number / best
+
+
+def run(number: int, rounds: int) -> bool:
+    pages = {name: load_fixture(name) for name in os.listdir(FIXTURES) if name.endswith(".html")}
+    identical = True
+    print(f"{'site':<14}{'backend':<14}{'mode':<10}{'pages/sec':>12}{'speedup':>10}")
+    for site, manager, parse in make_cases(pages):
+        reference = None
+        for backend in available_backends():
+            full_rate = None
+            for mode in ("full", "strained"):
+                set_mode(manager, mode)
+                manga = parse(manager, backend)
+                if reference is None:
+                    reference = manga
+                elif manga != reference:
+                    identical = False
+                    print(f"{site}: {backend}/{mode} differs from the reference parse", file=sys.stderr)
+                rate = pages_per_second(parse, manager, backend, number, rounds)
+                if mode == "full":
+                    full_rate = rate
+                    print(f"{site:<14}{backend:<14}{mode:<10}{rate:>12.1f}")
+                else:
+                    speedup = rate / full_rate
+                    note = "" if speedup > 1.05 else "  (no gain over the full parse)"
+                    print(f"{site:<14}{backend:<14}{mode:<10}{rate:>12.1f}{speedup:>9.2f}x{note}")
+        set_mode(manager, "strained")
+    return identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=50, help="parses per site, mode and round")
+    parser.add_argument("--rounds", type=int, default=3, help="timed rounds per mode, the best one is reported")
+    args = parser.parse_args()
+    if not run(args.number, args.rounds):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""End-to-end load benchmark of the API against the stub server, no network needed.
+
+For every library size a fresh database is generated and the app is driven
+in-process through its ASGI interface:
+
+  reads    concurrent GETs of the full library, a sorted page, a title and a search
+  mixed    the same reads with a share of POSTs scraping new titles from the stub
+  refresh  update_all_entries over the whole library: cold (every page new),
+           warm (every page unchanged) and after the stub released new chapters
+
+Each size runs in its own process so no cache or pool is shared between
+them. Results are written as JSON, `--compare` checks them against an
+earlier run and exits non-zero when something got slower than `--tolerance`.
+
+    PYTHONPATH=. python -m benchmarks.bench_service --sizes 1000,10000 --duration 10
+    PYTHONPATH=. python -m benchmarks.bench_service --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+RESULTS = os.path.join(os.path.dirname(__file__), "results")
+# Metrics where a lower value is an improvement, every other one is a rate
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "seconds", "error_rate")
+
+
+def percentiles(samples: List[float]) -> dict:
+    """p50/p95/p99 of latencies in seconds, as milliseconds."""
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    ordered = sorted(samples)
+
+    def at(percent: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] * 1000, 3)
+
+    return {"p50_ms": at(50), "p95_ms": at(95), "p99_ms": at(99)}
+
+
+def summarize(latencies: Dict[str, List[float]], errors: Counter, elapsed: float) -> dict:
+    summary = {}
+    for label, samples in sorted(latencies.items()):
+        count = len(samples) + errors[label]
+        summary[label] = {
+            "requests": count,
+            "rps": round(len(samples) / elapsed, 1),
+            "error_rate": round(errors[label] / count, 4) if count else 0.0,
+            **percentiles(samples),
+        }
+    return summary
+
+
+async def load(client, requests, duration: float, concurrency: int, seed: int) -> dict:
+    """Send requests picked by `requests(rng)` from `concurrency` clients for `duration` seconds.
+
+    `requests` returns (label, method, path), statuses of 400 and above count as errors.
+    """
+    latencies: Dict[str, List[float]] = {}
+    errors: Counter = Counter()
+    deadline = time.perf_counter() + duration
+
+    async def user(rng: random.Random):
+        while time.perf_counter() < deadline:
+            label, method, path = requests(rng)
+            started_at = time.perf_counter()
+            response = await client.request(method, path)
+            if response.status_code >= 400:
+                errors[label] += 1
+            else:
+                latencies.setdefault(label, []).append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(user(random.Random(seed + index)) for index in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started_at)
+
+
+def read_requests(size: int):
+    def pick(rng: random.Random):
+        roll = rng.random()
+        if roll < 0.1:
+            return "GET /mangas", "GET", "/mangas"
+        if roll < 0.4:
+            return "GET /mangas?sort&limit", "GET", "/mangas?sort=-rating&limit=50"
+        if roll < 0.9:
+            name = f"Bench Manga {rng.randint(1, size):06d}"
+            return "GET /mangas/{name}", "GET", f"/mangas/{name}"
+        return "GET /mangas/search", "GET", f"/mangas/search?q={rng.choice(['hunter', 'gates', 'monsters'])}"
+
+    return pick
+
+
+def mixed_requests(size: int, write_share: float):
+    reads = read_requests(size)
+    new_titles = iter(range(size + 1, sys.maxsize))
+
+    def pick(rng: random.Random):
+        if rng.random() < write_share:
+            return "POST /mangas/{name}", "POST", f"/mangas/Bench Manga {next(new_titles):06d}"
+        return reads(rng)
+
+    return pick
+
+
+async def refresh(service_handler) -> dict:
+    statuses: Counter = Counter()
+    started_at = time.perf_counter()
+    await service_handler.update_all_entries(on_result=lambda name, status, message: statuses.update([status]))
+    elapsed = time.perf_counter() - started_at
+    titles = sum(statuses.values())
+    return {
+        "seconds": round(elapsed, 3),
+        "titles_per_sec": round(titles / elapsed, 1) if elapsed else None,
+        "statuses": dict(statuses),
+    }
+
+
+async def run_size(args) -> dict:
+    """Benchmark one library size, in a process of its own."""
+    # Imported here, the environment set by main() has to be read by config first
+    import httpx
+    from app.main import app, lifespan, service_handler
+    from benchmarks.library import generate_library
+    from benchmarks.stub_server import StubServer
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = {"size": args.size}
+    started_at = time.perf_counter()
+    generate_library(os.environ["DB_PATH"], args.size, args.seed, args.manganato_share)
+    results["generate_seconds"] = round(time.perf_counter() - started_at, 3)
+
+    stub = StubServer(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, change_rate=args.change_rate,
+        seed=args.seed,
+    ).start()
+    for name, manager in service_handler.providers.managers.items():
+        manager.base_url = stub.url + ("/search/story/" if name == "manganato" else "")
+    try:
+        async with lifespan(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                if "reads" in args.scenarios:
+                    # One request of each kind first, so caches and statements are warm
+                    await load(client, read_requests(args.size), 0, 1, args.seed)
+                    results["reads"] = await load(
+                        client, read_requests(args.size), args.duration, args.concurrency, args.seed
+                    )
+                if "mixed" in args.scenarios:
+                    results["mixed"] = await load(
+                        client, mixed_requests(args.size, args.write_share), args.duration, args.concurrency,
+                        args.seed,
+                    )
+            if "refresh" in args.scenarios:
+                results["refresh"] = {}
+                for phase in ("cold", "warm", "changed"):
+                    if phase == "changed":
+                        stub.bump()
+                    stub.reset_stats()
+                    results["refresh"][phase] = await refresh(service_handler)
+                    results["refresh"][phase]["upstream"] = dict(stub.stats)
+    finally:
+        stub.stop()
+    return results
+
+
+def run_child(args):
+    results = asyncio.run(run_size(args))
+    with open(args.child_output, "w", encoding="utf-8") as output:
+        json.dump(results, output)
+
+
+def commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of a result tree, keyed by their dotted path."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Print how each metric moved since the baseline, return the ones that regressed."""
+    now, before = flatten(current["results"]), flatten(baseline["results"])
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} from {baseline.get('created_at')}")
+    for key in sorted(now.keys() & before.keys()):
+        if key.endswith(("requests", "size")) or ".statuses." in key or ".upstream." in key:
+            continue  # Counts depend on the run length, not on speed
+        old, new = before[key], now[key]
+        if not old:
+            continue
+        change = (new - old) / old
+        worse = change > tolerance if key.endswith(LOWER_IS_BETTER) else change < -tolerance
+        if worse:
+            regressions.append(key)
+        print(f"{'REGRESSED ' if worse else '          '}{key:<60}{old:>12g}{new:>12g}{change:>+9.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000", help="comma separated library sizes, up to 100000")
+    parser.add_argument("--scenarios", default="reads,mixed,refresh")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per load scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--write-share", type=float, default=0.1, help="share of writes in the mixed scenario")
+    parser.add_argument("--manganato-share", type=float, default=0.2, help="share of titles stored from Manganato")
+    parser.add_argument("--latency", type=float, default=0.005, help="stub response time, seconds")
+    parser.add_argument("--jitter", type=float, default=0.005, help="extra random stub response time, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stub responses that are 503")
+    parser.add_argument("--change-rate", type=float, default=0.1, help="share of titles with a new chapter")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file, benchmarks/results/<time>-<commit>.json by default")
+    parser.add_argument("--compare", help="earlier result file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before failing")
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.scenarios = args.scenarios.split(",")
+    if args.child_output:
+        run_child(args)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    report = {
+        "commit": commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("size", "child_output")},
+        "results": {},
+    }
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="manga-bench-") as directory:
+            child_output = os.path.join(directory, "result.json")
+            env = {
+                **os.environ,
+                "DB_PATH": os.path.join(directory, "Mangas.db"),
+                "SCHEDULER_ENABLED": "0",
+                "WEBHOOK_URL": "",
+                # Measure the app, not the politeness limits meant for the real sites
+                "HTTP_RATE_PER_HOST": os.environ.get("HTTP_RATE_PER_HOST", "100000"),
+                "HTTP_BURST_PER_HOST": os.environ.get("HTTP_BURST_PER_HOST", "100000"),
+            }
+            command = [sys.executable, "-m", "benchmarks.bench_service", *sys.argv[1:]]
+            command += ["--size", str(size), "--child-output", child_output]
+            print(f"Library of {size} mangas...", flush=True)
+            subprocess.run(command, env=env, check=True)
+            with open(child_output, encoding="utf-8") as result:
+                report["results"][str(size)] = json.load(result)
+        print(json.dumps(report["results"][str(size)], indent=2))
+
+    output = args.output or os.path.join(
+        RESULTS, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['commit'] or 'nogit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as result:
+        json.dump(report, result, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline:
+            regressions = compare(report, json.load(baseline), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed by more than {args.tolerance:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Synthetic library generator, fills a database with N plausible mangas through the real write path.
+
+Titles are named "Bench Manga 000001" onwards so the stub server can serve
+them, the other fields are drawn from a seeded generator and are the same
+for a given size and seed.
+
+    PYTHONPATH=. python -m benchmarks.library /tmp/bench/Mangas.db --size 10000
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Iterator, List
+from app.src.models.manga import Manga
+from app.src.scripts.database_manager import DatabaseManager, close_pool, init_pool
+
+GENRES = [
+    "Action", "Adventure", "Comedy", "Drama", "Fantasy", "Historical", "Horror", "Isekai", "Martial Arts",
+    "Mecha", "Mystery", "Psychological", "Romance", "School Life", "Sci-fi", "Seinen", "Shoujo", "Shounen",
+    "Slice of Life", "Sports", "Supernatural", "Thriller", "Tragedy", "Webtoons",
+]
+STATUSES = ["Ongoing", "Completed", "Hiatus"]
+WORDS = "the hunter rises again in a world of gates dungeons and monsters where only the strong survive".split()
+EPOCH = datetime(2024, 6, 1)
+
+
+def title(index: int) -> str:
+    return f"Bench Manga {index:06d}"
+
+
+def make_manga(index: int, rng: random.Random, manganato_share: float = 0.0) -> Manga:
+    name = title(index)
+    slug = name.replace(" ", "-")
+    chapter = rng.randint(1, 400)
+    return Manga(
+        url=f"https://demonicscans.org/manga/{slug}",
+        name=name,
+        image_link=f"https://demonicscans.org/images/{slug}.jpg",
+        authors=f"Author {rng.randint(1, max(index // 20, 50))}",
+        status=rng.choice(STATUSES),
+        genres=rng.sample(GENRES, rng.randint(1, 4)),
+        views=str(rng.randint(0, 5_000_000)),
+        rating=round(rng.uniform(0, 1), 2),
+        description=" ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 80))),
+        last_chapter=f"Chapter {chapter}",
+        last_chapter_url=f"https://demonicscans.org/title/{slug}/chapter/{chapter}/1",
+        last_chapter_release_date=EPOCH - timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60)),
+        source="manganato" if rng.random() < manganato_share else "demonicscans",
+    )
+
+
+def iter_library(size: int, seed: int = 0, manganato_share: float = 0.0) -> Iterator[Manga]:
+    rng = random.Random(seed)
+    for index in range(1, size + 1):
+        yield make_manga(index, rng, manganato_share)
+
+
+def generate_library(
+    db_path: str, size: int, seed: int = 0, manganato_share: float = 0.0, batch_size: int = 1000
+) -> int:
+    """Write `size` synthetic mangas to the database at `db_path`, returns the rows written."""
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    init_pool(db_path)
+    written = 0
+    try:
+        with DatabaseManager() as db_manager:
+            batch: List[Manga] = []
+            for manga in iter_library(size, seed, manganato_share):
+                batch.append(manga)
+                if len(batch) == batch_size:
+                    written += db_manager.store_many(batch)
+                    batch = []
+            if batch:
+                written += db_manager.store_many(batch)
+    finally:
+        close_pool()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--manganato-share", type=float, default=0.0, help="share of titles stored from Manganato")
+    args = parser.parse_args()
+    written = generate_library(args.db_path, args.size, args.seed, args.manganato_share)
+    print(f"Wrote {written} mangas to {args.db_path}")
+
+
+if __name__ == "__main__":
+    main()
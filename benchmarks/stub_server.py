@@ -0,0 +1,265 @@
+"""Local stand-in for Demonicscans and Manganato, serving the saved fixtures for any title.
+
+Every title gets its own copy of the recorded pages, with the name, links
+and images pointing back at the stub. Responses can be delayed and fail at
+a configurable rate, and `bump()` gives a share of the titles a new chapter
+so refreshes have something to write.
+
+    PYTHONPATH=. python -m benchmarks.stub_server --port 8765 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import hashlib
+import http.server
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, List, Optional
+from urllib.parse import unquote, urlsplit
+from benchmarks.bench_parsers import load_fixture
+
+# Title of the recorded pages, replaced by the requested one
+FIXTURE_NAME = "Solo Leveling"
+FIXTURE_SLUG = "Solo-Leveling"
+FIXTURE_MANGANATO_ID = "manga-dr980474"
+FIXTURE_CHAPTER = 200
+# Any absolute link of the recorded sites
+SITE_LINK = re.compile(r"https://[a-z0-9.-]+")
+CHAPTER_NUMBER = re.compile(r"(?i)(chapter[ /-])%d\b" % FIXTURE_CHAPTER)
+# 1x1 transparent PNG, served for every cover
+COVER = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d49444154789c63000100000500010d0a2db40000000049454e44ae426082"
+)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real sites
+    server: "_Server"
+
+    def do_GET(self):
+        self.server.stub.handle(self)
+
+    def do_POST(self):
+        self.server.stub.handle_post(self)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, stub: "StubServer"):
+        super().__init__(address, _Handler)
+        self.stub = stub
+
+
+class StubServer:
+    """Threaded HTTP server replaying the fixtures of both providers.
+
+    Routes, with `url` the stub's base url:
+      {url}/manga/{slug}           Demonicscans manga page
+      {url}/search/story/{slug}    Manganato search results
+      {url}/manga-{slug}           Manganato manga page
+      {url}/...jpg|png|webp        a cover image
+      POST {url}/...               a webhook, JSON bodies are kept in `posts`
+
+    Titles starting with "Missing" answer 404. Pages carry an ETag and
+    answer 304 to a matching If-None-Match. `inject` scripts failures for
+    the next requests, whatever their path.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        change_rate: float = 0.1,
+        seed: int = 0,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.change_rate = change_rate
+        self.revision = 0
+        self.stats = {"requests": 0, "errors": 0, "not_modified": 0, "not_found": 0}
+        # Requests per path, e.g. to check concurrent scrapes of a title were coalesced
+        self.paths = Counter()
+        self.posts: List[Any] = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # Scripted (status, Retry-After) answers, served before anything else
+        self._faults = deque()
+        self._server: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pages = {
+            "demonicscans": load_fixture("demonicscans_manga.html"),
+            "manganato_search": load_fixture("manganato_search.html"),
+            "manganato": load_fixture("manganato_manga.html"),
+        }
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "StubServer":
+        self._server = _Server((self.host, self.port), self)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def bump(self):
+        """Release a new chapter for the `change_rate` share of titles."""
+        with self._lock:
+            self.revision += 1
+
+    def inject(self, count: int, status: int = 503, retry_after: Optional[str] = "0"):
+        """Answer the next `count` requests with `status`, and Retry-After unless it is None."""
+        with self._lock:
+            self._faults.extend([(status, retry_after)] * count)
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+            self.paths.clear()
+            self.posts.clear()
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _changes(self, name: str) -> bool:
+        # Stable per title, the same titles change on every bump
+        digest = hashlib.blake2b(name.encode("utf-8"), digest_size=4).digest()
+        return int.from_bytes(digest, "big") / 2**32 < self.change_rate
+
+    def _render(self, page: str, name: str, slug: str, manganato_id: str) -> str:
+        chapter = FIXTURE_CHAPTER + (self.revision if self._changes(name) else 0)
+        html = self._pages[page]
+        html = html.replace(FIXTURE_MANGANATO_ID, manganato_id)
+        html = html.replace(FIXTURE_NAME, name).replace(FIXTURE_SLUG, slug)
+        html = CHAPTER_NUMBER.sub(lambda match: f"{match.group(1)}{chapter}", html)
+        return SITE_LINK.sub(self.url, html)
+
+    def _route(self, path: str):
+        """Return (status, content type, body) for a request path."""
+        if path.endswith((".jpg", ".png", ".webp")):
+            return 200, "image/png", COVER
+        if path.startswith("/manga/"):
+            # Demonicscans quotes the name twice and joins the words with -
+            slug = unquote(unquote(path[len("/manga/"):]))
+            name = slug.replace("-", " ")
+            page = "demonicscans"
+        elif path.startswith("/search/story/"):
+            # Manganato lowercases the name, synthetic titles are title case
+            slug = unquote(path[len("/search/story/"):])
+            name = slug.replace("_", " ").title()
+            page = "manganato_search"
+        elif path.startswith("/manga-"):
+            slug = unquote(path[len("/manga-"):])
+            name = slug.replace("_", " ").title()
+            page = "manganato"
+        else:
+            return 404, "text/plain", b"Not found"
+        if name.startswith("Missing"):
+            return 404, "text/plain", b"Not found"
+        body = self._render(page, name, name.replace(" ", "-"), f"manga-{slug}")
+        return 200, "text/html; charset=utf-8", body.encode("utf-8")
+
+    def handle(self, request: _Handler):
+        self._count("requests")
+        path = urlsplit(request.path).path
+        with self._lock:
+            self.paths[path] += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+            fault = self._faults.popleft() if self._faults else None
+        if delay:
+            time.sleep(delay)
+        if fault:
+            self._count("errors")
+            status, retry_after = fault
+            self._send(request, status, {"Retry-After": retry_after} if retry_after is not None else {}, b"")
+            return
+        if fail:
+            self._count("errors")
+            self._send(request, 503, {"Retry-After": "0"}, b"")
+            return
+        status, content_type, body = self._route(path)
+        if status == 404:
+            self._count("not_found")
+        etag = '"%s"' % hashlib.blake2b(body, digest_size=8).hexdigest()
+        if status == 200 and request.headers.get("If-None-Match") == etag:
+            self._count("not_modified")
+            self._send(request, 304, {"ETag": etag}, b"")
+            return
+        self._send(request, status, {"Content-Type": content_type, "ETag": etag}, body)
+
+    def handle_post(self, request: _Handler):
+        self._count("requests")
+        body = request.rfile.read(int(request.headers.get("Content-Length") or 0))
+        with self._lock:
+            fault = self._faults.popleft() if self._faults else None
+        if fault:
+            self._count("errors")
+            status, retry_after = fault
+            self._send(request, status, {"Retry-After": retry_after} if retry_after is not None else {}, b"")
+            return
+        with self._lock:
+            self.posts.append(json.loads(body))
+        self._send(request, 204, {}, b"")
+
+    @staticmethod
+    def _send(request: _Handler, status: int, headers: dict, body: bytes):
+        request.send_response(status)
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds, up to this much")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 503")
+    parser.add_argument("--change-rate", type=float, default=0.1, help="share of titles changed by a bump")
+    parser.add_argument("--bump-every", type=float, default=0.0, help="seconds between new chapter releases")
+    args = parser.parse_args()
+    stub = StubServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.change_rate).start()
+    print(f"Serving on {stub.url}, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(args.bump_every or 3600)
+            if args.bump_every:
+                stub.bump()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
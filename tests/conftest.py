@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Read by app.src.config on import, so set before any test imports the app
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="manga-tests-"), "Mangas.db"))
+os.environ.setdefault("SCHEDULER_ENABLED", "0")
+os.environ.setdefault("WEBHOOK_URL", "")
+os.environ.setdefault("HTTP_RATE_PER_HOST", "100000")
+os.environ.setdefault("HTTP_BURST_PER_HOST", "100000")
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import time
+from typing import List
+import pytest
+from app.src.scripts.chapter_feed import ChapterFeed
+from app.src.scripts.database_manager import DatabaseManager
+from app.src.scripts.http_client import HttpClient
+from app.src.scripts.service_handler import ServiceHandler
+from app.src.scripts.webhook_sink import WebhookSink
+from benchmarks.stub_server import StubServer
+
+
+@pytest.fixture
+def stub():
+    with StubServer() as server:
+        yield server
+
+
+def run_db(method_name: str, *args):
+    return asyncio.to_thread(ServiceHandler._call_db, method_name, *args)
+
+
+def add_events(*chapters: str) -> List[int]:
+    """Append chapter events as a refresh would, returns their ids."""
+    ids = []
+    with DatabaseManager() as db_manager:
+        with db_manager.conn:
+            for chapter in chapters:
+                db_manager.cursor.execute(
+                    "INSERT INTO chapter_events (manga_id, name, chapter, chapter_url, detected_at) "
+                    "VALUES (0, 'Feed Title', ?, '', 0)",
+                    (chapter,),
+                )
+                ids.append(db_manager.cursor.lastrowid)
+    return ids
+
+
+async def wait_until(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_stream_replays_the_events_after_last_event_id(monkeypatch):
+    from app import main
+
+    service_handler = ServiceHandler()
+    # Several replay pages
+    service_handler.feed.replay_page = 2
+    monkeypatch.setattr(main, "service_handler", service_handler)
+
+    async def run():
+        await service_handler.start()
+        seen, *missed = add_events("Chapter 1", "Chapter 2", "Chapter 3", "Chapter 4")
+        response = await main.stream_chapters(last_event_id=seen)
+        chunks = response.body_iterator
+        try:
+            replayed = [await chunks.__anext__() for _ in missed]
+            live_id, = add_events("Chapter 5")
+            service_handler.feed.notify()
+            live = await asyncio.wait_for(chunks.__anext__(), 5)
+        finally:
+            await chunks.aclose()
+            await service_handler.close()
+        return missed, replayed, live_id, live
+
+    missed, replayed, live_id, live = asyncio.run(run())
+
+    for event_id, chunk in zip(missed + [live_id], replayed + [live]):
+        head, data = chunk.removesuffix("\n\n").rsplit("\n", 1)
+        assert head == f"id: {event_id}\nevent: chapter"
+        assert json.loads(data.removeprefix("data: "))["id"] == event_id
+    assert [json.loads(chunk.rsplit("data: ", 1)[1])["chapter"] for chunk in replayed] == [
+        "Chapter 2", "Chapter 3", "Chapter 4"
+    ]
+
+
+def test_slow_subscriber_is_dropped_and_catches_up_on_replay():
+    feed = ChapterFeed(run_db, queue_size=2)
+
+    async def run():
+        await feed.start()
+        slow = feed.subscribe()
+        first = asyncio.ensure_future(slow.__anext__())
+        await wait_until(lambda: feed.subscribers == 1)
+        ids = add_events(*(f"Chapter {number}" for number in range(1, 6)))
+        await feed.poll()
+        # Its queue only held two events, the feed let go of it instead of waiting
+        assert feed.subscribers == 0
+        received = [await first]
+        received += [event async for event in slow]
+        # Reconnecting with the last id it got replays the rest
+        resumed = feed.subscribe(received[-1]["id"])
+        received += [await resumed.__anext__() for _ in range(len(ids) - len(received))]
+        await resumed.aclose()
+        return ids, received
+
+    ids, received = asyncio.run(run())
+    assert [event["id"] for event in received] == ids
+
+
+def make_sink(stub: StubServer, feed: ChapterFeed, **options) -> WebhookSink:
+    client = HttpClient(rate_per_host=1000, burst_per_host=1000, backoff_base=0.01, max_retries=1)
+    options = {"batch_size": 3, "flush_interval": 0.2, "retry_interval": 0.05, **options}
+    return WebhookSink(feed, url=stub.url + "/webhook", http_client=client, **options)
+
+
+def posted_ids(stub: StubServer) -> List[List[int]]:
+    return [[event["id"] for event in post["events"]] for post in stub.posts]
+
+
+def test_webhook_posts_full_batches_then_flushes_the_rest(stub):
+    feed = ChapterFeed(run_db)
+    sink = make_sink(stub, feed)
+
+    async def run():
+        await feed.start()
+        sink.start()
+        try:
+            ids = add_events(*(f"Chapter {number}" for number in range(1, 8)))
+            await feed.poll()
+            await wait_until(lambda: sum(len(post["events"]) for post in stub.posts) == len(ids))
+        finally:
+            await sink.stop()
+        return ids
+
+    ids = asyncio.run(run())
+    assert posted_ids(stub) == [ids[0:3], ids[3:6], ids[6:]]
+
+
+def test_failed_webhook_batch_is_sent_again(stub):
+    feed = ChapterFeed(run_db)
+    sink = make_sink(stub, feed)
+
+    async def run():
+        await feed.start()
+        sink.start()
+        try:
+            # Both attempts of the first POST fail, the sink replays the batch after retry_interval
+            stub.inject(2, status=503)
+            ids = add_events("Chapter 1", "Chapter 2", "Chapter 3")
+            await feed.poll()
+            await wait_until(lambda: sink.last_delivered_id == ids[-1])
+        finally:
+            await sink.stop()
+        return ids
+
+    ids = asyncio.run(run())
+    assert stub.stats["errors"] == 2
+    assert posted_ids(stub) == [ids]
+    assert sink.last_delivered_id == ids[-1]
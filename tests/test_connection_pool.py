@@ -0,0 +1,48 @@
+import asyncio
+import sqlite3
+import httpx
+import pytest
+from app.src.scripts.connection_pool import ConnectionPool, PoolTimeoutError
+
+
+def test_acquire_gives_up_after_the_timeout(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, acquire_timeout=0.05)
+    connection = pool.acquire()
+    try:
+        with pytest.raises(PoolTimeoutError):
+            pool.acquire()
+    finally:
+        pool.release(connection)
+    assert pool.acquire() is connection
+    pool.close()
+
+
+def test_reader_is_outside_the_pool_and_read_only(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, acquire_timeout=0.05)
+    reader = pool.open_reader()
+    try:
+        # The pool's only connection is still free while the reader is open
+        pool.release(pool.acquire())
+        with pytest.raises(sqlite3.OperationalError):
+            reader.execute("CREATE TABLE exports (id INTEGER)")
+    finally:
+        reader.close()
+        pool.close()
+
+
+def test_busy_pool_answers_503(monkeypatch):
+    from app.main import app, service_handler
+
+    async def busy(manga_name):
+        raise PoolTimeoutError("No database connection was free within 10s.")
+
+    monkeypatch.setattr(service_handler, "retrieve_manga_json", busy)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/mangas/Any Title")
+
+    response = asyncio.run(run())
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
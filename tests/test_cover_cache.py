@@ -0,0 +1,53 @@
+import asyncio
+from app.src.scripts.cover_cache import CoverCache
+from app.src.scripts.http_client import HttpClient
+from benchmarks.stub_server import COVER, StubServer
+
+
+def run_with_cache(tmp_path, test, **options):
+    """Run `test(cache, stub)` against a cover cache allowed to download from the stub only."""
+    with StubServer() as stub:
+
+        async def run():
+            client = HttpClient(max_retries=0)
+            cache = CoverCache(client, directory=str(tmp_path), allowed_hosts=lambda: [stub.host], **options)
+            try:
+                return await test(cache, stub)
+            finally:
+                await cache.close()
+                await client.aclose()
+
+        return asyncio.run(run())
+
+
+def test_downloads_covers_from_allowed_hosts_only(tmp_path):
+    async def test(cache, stub):
+        cover = await cache.get(f"{stub.url}/cover.png")
+        # Same server, but not a host the cache was allowed to fetch from
+        other = await cache.get(f"http://localhost:{stub.port}/cover.png")
+        return cover, other, stub.stats["requests"]
+
+    cover, other, requests = run_with_cache(tmp_path, test)
+    assert cover.size == len(COVER)
+    assert other is None
+    assert requests == 1
+
+
+def test_oversized_covers_are_not_cached(tmp_path):
+    async def test(cache, stub):
+        return await cache.get(f"{stub.url}/cover.png")
+
+    assert run_with_cache(tmp_path, test, max_file_bytes=len(COVER) - 1) is None
+
+
+def test_prefetch_tasks_are_kept_until_done(tmp_path):
+    async def test(cache, stub):
+        cache.prefetch([f"{stub.url}/prefetched.png"])
+        pending = len(cache._prefetching)
+        await asyncio.gather(*cache._prefetching)
+        return pending, len(cache._prefetching), await asyncio.to_thread(cache._lookup, f"{stub.url}/prefetched.png")
+
+    pending, left, cover = run_with_cache(tmp_path, test)
+    assert (pending, left) == (1, 0)
+    assert cover is not None
+
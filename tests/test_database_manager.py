@@ -0,0 +1,204 @@
+import asyncio
+import socket
+import time
+from datetime import datetime, timezone
+import pytest
+from app.src.models.manga import Manga
+from app.src.scripts import database_manager
+from app.src.scripts.connection_pool import ConnectionPool
+from app.src.scripts.database_manager import DatabaseManager, _initialize_database
+from app.src.scripts.http_client import HttpClient
+from app.src.scripts.providers import ProviderRegistry
+from benchmarks.stub_server import StubServer
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """A DatabaseManager on an empty database of its own, so counts are exact."""
+    pool = ConnectionPool(str(tmp_path / "Mangas.db"), initializer=_initialize_database)
+    with DatabaseManager(pool) as db_manager:
+        yield db_manager
+    pool.close()
+
+
+def make_manga(name: str, genres=(), authors: str = None, rating: float = 0.0, description: str = None) -> Manga:
+    return Manga(
+        url="", name=name, image_link=None, authors=authors, status=None, genres=list(genres), views=None,
+        rating=rating, description=description, last_chapter="Chapter 1", last_chapter_url=None,
+        last_chapter_release_date=datetime(2020, 1, 1),
+    )
+
+
+def test_chapter_events_since_a_naive_time_reads_it_as_utc(monkeypatch):
+    detected_at = int(datetime(2024, 6, 1, 12, tzinfo=timezone.utc).timestamp())
+    with DatabaseManager() as db_manager:
+        with db_manager.conn:
+            db_manager.cursor.execute(
+                """INSERT INTO chapter_events (manga_id, name, chapter, chapter_url, detected_at)
+                VALUES (0, 'Naive Since', 'Chapter 1', '', ?)""",
+                (detected_at,),
+            )
+        # Five hours behind UTC, a local reading would move `since` past the event
+        monkeypatch.setenv("TZ", "EST+5")
+        time.tzset()
+        try:
+            page = db_manager.get_chapter_events(since=datetime(2024, 6, 1, 11, 59))
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+    assert "Naive Since" in [item["name"] for item in page["items"]]
+
+
+def test_provider_failover_moves_the_url_with_the_source():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        dead_url = f"http://127.0.0.1:{unused.getsockname()[1]}"
+
+    async def scrape(registry, name):
+        try:
+            return await registry.get_manga(name)
+        finally:
+            await registry.aclose()
+
+    def registry_for(stub, primary_url):
+        registry = ProviderRegistry(["demonicscans", "manganato"], hedge=False, http_client=HttpClient(max_retries=0))
+        registry.managers["demonicscans"].base_url = primary_url
+        registry.managers["manganato"].base_url = stub.url + "/search/story/"
+        return registry
+
+    with StubServer() as stub:
+        first = asyncio.run(scrape(registry_for(stub, stub.url), "Failover Title"))
+        # The primary is down, the title is served by the second provider
+        second = asyncio.run(scrape(registry_for(stub, dead_url), "Failover Title"))
+
+    assert (first.source, second.source) == ("demonicscans", "manganato")
+    with DatabaseManager() as db_manager:
+        db_manager.store_manga_data(first)
+        assert db_manager.store_manga_data(second).endswith("updated successfully.")
+        record = db_manager.get_manga_record("Failover Title")
+    assert (record["source"], record["url"]) == ("manganato", second.url)
+
+
+def test_refresh_with_only_a_new_url_is_written():
+    manga = Manga(
+        url="https://demonicscans.org/manga/Moved", name="Moved Title", image_link=None, authors=None,
+        status=None, genres=[], views=None, rating=0.0, description=None, last_chapter=None,
+        last_chapter_url=None, source="demonicscans",
+    )
+    moved = manga.model_copy(update={"url": "https://manganato.com/manga-moved", "source": "manganato"})
+    with DatabaseManager() as db_manager:
+        db_manager.store_many([manga])
+        assert db_manager.update_many([moved]) == ["updated"]
+        assert db_manager.get_manga_record("Moved Title")["url"] == moved.url
+
+
+def facet_counts(db_manager: DatabaseManager, facet: str) -> dict:
+    return {item["name"]: item["count"] for item in db_manager.get_facet_counts(facet, limit=1000)["items"]}
+
+
+def test_facet_counts_follow_inserts_updates_and_deletes(db_manager):
+    db_manager.store_many([
+        make_manga("One", ["Action", "Drama"], "Author A, Author B"),
+        # Facet names are case insensitive
+        make_manga("Two", ["action"], "author a"),
+    ])
+    assert facet_counts(db_manager, "genres") == {"Action": 2, "Drama": 1}
+    assert facet_counts(db_manager, "authors") == {"Author A": 2, "Author B": 1}
+
+    db_manager.store_many([make_manga("One", ["Comedy"], "Author B")])
+    assert facet_counts(db_manager, "genres") == {"Action": 1, "Comedy": 1}
+    assert db_manager.update_many([make_manga("Two", ["Comedy", "Drama"], "Author A")]) == ["updated"]
+    assert facet_counts(db_manager, "genres") == {"Comedy": 2, "Drama": 1}
+    assert facet_counts(db_manager, "authors") == {"Author A": 1, "Author B": 1}
+
+    db_manager.remove_manga_data("One")
+    assert facet_counts(db_manager, "genres") == {"Comedy": 1, "Drama": 1}
+    assert facet_counts(db_manager, "authors") == {"Author A": 1}
+    # Most common first, then by name
+    db_manager.store_many([make_manga("Three", ["Drama"])])
+    assert [item["name"] for item in db_manager.get_facet_counts("genres")["items"]] == ["Drama", "Comedy"]
+
+
+def test_both_facet_plans_return_the_same_rows(db_manager, monkeypatch):
+    threshold = database_manager.FACET_PROBE_MIN_COUNT
+    db_manager.store_many([
+        make_manga(f"Plan Title {index:05d}", ["Common"] + (["Half"] if index % 2 else []),
+                   f"Author {index % 7}", rating=(index * 37 % 100) / 100)
+        for index in range(threshold)
+    ])
+
+    def read_all(**query) -> list:
+        names, cursor = [], None
+        while True:
+            page = db_manager.query_mangas(**query, limit=300, fields=["name"], **({"cursor": cursor} if cursor else {}))
+            names += [item["name"] for item in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return names
+
+    # Up to the threshold the linked mangas are fetched, past it the sort index is walked
+    assert db_manager._facet_condition("genres", "Common")[0].startswith("id IN")
+    db_manager.store_many([make_manga("Plan Title 99999", ["Common", "Half"], "Author 3", rating=0.5)])
+    assert db_manager._facet_condition("genres", "Common")[0].startswith("EXISTS")
+    assert db_manager._facet_condition("genres", "Half")[0].startswith("id IN")
+    assert db_manager._facet_condition("genres", "Unknown") is None
+
+    queries = [
+        {"genre": "Common", "sort": "-rating"},
+        {"genre": "common", "sort": "name"},
+        {"genre": "Common", "author": "Author 3", "sort": "-rating"},
+    ]
+    probed = [read_all(**query) for query in queries]
+    monkeypatch.setattr(database_manager, "FACET_PROBE_MIN_COUNT", threshold * 10)
+    assert db_manager._facet_condition("genres", "Common")[0].startswith("id IN")
+    fetched = [read_all(**query) for query in queries]
+
+    assert probed == fetched
+    assert len(probed[0]) == threshold + 1
+    assert "Plan Title 99999" in probed[2]
+
+
+def search(db_manager: DatabaseManager, text: str) -> list:
+    return [item["name"] for item in db_manager.search_mangas(text)["items"]]
+
+
+def test_search_index_follows_updates_and_deletes(db_manager):
+    db_manager.store_many([make_manga("Search One", description="A dragon tamer"), make_manga("Search Two")])
+    assert search(db_manager, "dragon") == ["Search One"]
+
+    db_manager.store_many([make_manga("Search One", description="A phoenix rider")])
+    assert search(db_manager, "dragon") == []
+    assert search(db_manager, "phoenix") == ["Search One"]
+    assert db_manager.update_many([make_manga("Search One", ["Fantasy"], description="A griffin knight")]) == [
+        "updated"
+    ]
+    assert search(db_manager, "phoenix") == []
+    assert search(db_manager, "griffin fantasy") == ["Search One"]
+
+    db_manager.remove_manga_data("Search One")
+    assert search(db_manager, "griffin") == []
+    # The index matches the mangas table exactly
+    db_manager.cursor.execute("INSERT INTO mangas_fts (mangas_fts, rank) VALUES ('integrity-check', 1)")
+
+
+def test_search_matches_word_prefixes(db_manager):
+    db_manager.store_many([
+        make_manga("Dragon Rider", authors="Kim Sora"),
+        make_manga("Quiet Village", description="A retired dragon keeper"),
+        make_manga("Pokémon Adventures"),
+    ])
+    # A name match outranks a description match
+    assert search(db_manager, "drag") == ["Dragon Rider", "Quiet Village"]
+    # Every word has to match
+    assert search(db_manager, "drag ri") == ["Dragon Rider"]
+    assert search(db_manager, "SOR") == ["Dragon Rider"]
+    assert search(db_manager, "pokemon") == ["Pokémon Adventures"]
+    assert search(db_manager, "ragon") == []
+
+
+def test_punctuation_only_search_is_empty(db_manager):
+    db_manager.store_many([make_manga("Punctuation Title", description="Some text")])
+    for text in ("!!!", '"', "'", "*", "-", "()", "   "):
+        assert db_manager.search_mangas(text) == {"items": [], "next_offset": None}, text
+    # Quotes and operators around a word do not break the query
+    assert search(db_manager, '"punct*" (titl) -') == ["Punctuation Title"]
@@ -0,0 +1,227 @@
+import asyncio
+import time
+import pytest
+from app.src.scripts.http_client import FetchError, HostUnavailableError, HttpClient
+from app.src.scripts.metrics import HTTP_CLIENT_REJECTED, HTTP_CLIENT_RETRIES
+from benchmarks.stub_server import StubServer
+
+PAGE = "/manga/Client-Test"
+
+
+@pytest.fixture
+def stub():
+    with StubServer() as server:
+        yield server
+
+
+def make_client(**options) -> HttpClient:
+    options = {"rate_per_host": 1000, "burst_per_host": 1000, "backoff_base": 0.01, **options}
+    return HttpClient(**options)
+
+
+def run(client: HttpClient, coroutine_function):
+    async def main():
+        try:
+            return await coroutine_function()
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+def count(metric, host: str) -> float:
+    return metric._values.get((host,), 0)
+
+
+def record_backoffs(client: HttpClient) -> list:
+    """Keep the (attempt, delay) of every backoff the client waits."""
+    backoffs = []
+    backoff = client._backoff
+
+    def recorded(attempt, response):
+        delay = backoff(attempt, response)
+        backoffs.append((attempt, delay))
+        return delay
+
+    client._backoff = recorded
+    return backoffs
+
+
+def test_retries_until_a_response_is_not_retryable(stub):
+    stub.inject(2, status=503)
+    client = make_client(max_retries=3)
+    backoffs = record_backoffs(client)
+    retries = count(HTTP_CLIENT_RETRIES, stub.host)
+
+    response = run(client, lambda: client.get(stub.url + PAGE))
+
+    assert response.status_code == 200
+    assert stub.stats["requests"] == 3
+    assert [attempt for attempt, _ in backoffs] == [0, 1]
+    assert count(HTTP_CLIENT_RETRIES, stub.host) == retries + 2
+
+
+def test_gives_up_after_max_retries(stub):
+    stub.inject(10, status=502)
+    client = make_client(max_retries=2)
+    backoffs = record_backoffs(client)
+
+    with pytest.raises(FetchError, match="after 3 attempts: HTTP 502"):
+        run(client, lambda: client.get(stub.url + PAGE))
+
+    assert stub.stats["requests"] == 3
+    assert len(backoffs) == 2
+
+
+def test_does_not_retry_other_statuses(stub):
+    client = make_client(max_retries=3)
+
+    response = run(client, lambda: client.get(stub.url + "/manga/Missing-Title"))
+
+    assert response.status_code == 404
+    assert stub.stats["requests"] == 1
+
+
+def test_backoff_grows_and_stays_under_the_cap(stub):
+    stub.inject(4, status=503, retry_after=None)
+    client = make_client(max_retries=4, backoff_base=0.01, backoff_cap=0.03)
+    backoffs = record_backoffs(client)
+
+    run(client, lambda: client.get(stub.url + PAGE))
+
+    # Full jitter: anywhere between 0 and min(cap, base * 2 ** attempt)
+    for attempt, delay in backoffs:
+        assert 0 <= delay <= min(0.03, 0.01 * 2 ** attempt)
+    assert [attempt for attempt, _ in backoffs] == [0, 1, 2, 3]
+
+
+def test_waits_at_least_retry_after(stub):
+    stub.inject(1, status=429, retry_after="0.3")
+    client = make_client(max_retries=1, backoff_base=0.001)
+    backoffs = record_backoffs(client)
+
+    started_at = time.perf_counter()
+    response = run(client, lambda: client.get(stub.url + PAGE))
+
+    assert response.status_code == 200
+    assert backoffs[0][1] >= 0.3
+    assert time.perf_counter() - started_at >= 0.3
+
+
+def test_retry_after_is_capped(stub):
+    stub.inject(1, status=503, retry_after="30")
+    client = make_client(max_retries=1, backoff_cap=0.05)
+    backoffs = record_backoffs(client)
+
+    started_at = time.perf_counter()
+    run(client, lambda: client.get(stub.url + PAGE))
+
+    assert backoffs[0][1] == 0.05
+    assert time.perf_counter() - started_at < 5
+
+
+def test_breaker_opens_then_lets_one_trial_through(stub):
+    stub.inject(2, status=503)
+    client = make_client(max_retries=0, breaker_threshold=2, breaker_reset=0.2)
+    rejected = count(HTTP_CLIENT_REJECTED, stub.host)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(FetchError):
+                await client.get(stub.url + PAGE)
+        # Open: rejected without a request
+        with pytest.raises(HostUnavailableError):
+            await client.get(stub.url + PAGE)
+        assert stub.stats["requests"] == 2
+
+        # Half open after the reset timeout: a single trial, the others are still rejected
+        await asyncio.sleep(0.25)
+        stub.latency = 0.2
+        trial, other = await asyncio.gather(
+            client.get(stub.url + PAGE), client.get(stub.url + PAGE), return_exceptions=True
+        )
+        assert trial.status_code == 200
+        assert isinstance(other, HostUnavailableError)
+
+        # The trial succeeded, so the breaker is closed again
+        stub.latency = 0
+        responses = await asyncio.gather(*(client.get(stub.url + PAGE) for _ in range(3)))
+        assert [response.status_code for response in responses] == [200] * 3
+
+    run(client, scenario)
+    assert stub.stats["requests"] == 6
+    assert count(HTTP_CLIENT_REJECTED, stub.host) == rejected + 2
+
+
+def test_failed_trial_opens_the_breaker_again(stub):
+    stub.inject(3, status=503)
+    client = make_client(max_retries=0, breaker_threshold=2, breaker_reset=0.2)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(FetchError):
+                await client.get(stub.url + PAGE)
+        await asyncio.sleep(0.25)
+        with pytest.raises(FetchError):
+            await client.get(stub.url + PAGE)  # The trial
+        with pytest.raises(HostUnavailableError):
+            await client.get(stub.url + PAGE)
+
+    run(client, scenario)
+    assert stub.stats["requests"] == 3
+
+
+async def open_breaker(client: HttpClient, stub: StubServer):
+    """Fail two requests so a breaker_threshold=2 breaker opens, then wait until it is half open."""
+    stub.inject(2, status=503)
+    for _ in range(2):
+        with pytest.raises(FetchError):
+            await client.get(stub.url + PAGE)
+    await asyncio.sleep(0.25)
+
+
+async def started(stub: StubServer, requests: int):
+    while stub.stats["requests"] < requests:
+        await asyncio.sleep(0.01)
+
+
+def test_cancelled_trial_gives_its_slot_back(stub):
+    client = make_client(max_retries=0, breaker_threshold=2, breaker_reset=0.2)
+
+    async def scenario():
+        await open_breaker(client, stub)
+        stub.latency = 5
+        trial = asyncio.ensure_future(client.get(stub.url + PAGE))
+        await started(stub, 3)
+        # E.g. the hedge won, the next request may be the trial
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+        stub.latency = 0
+        assert (await client.get(stub.url + PAGE)).status_code == 200
+
+    run(client, scenario)
+
+
+def test_cancelling_another_request_keeps_the_trial_slot(stub):
+    client = make_client(max_retries=0, breaker_threshold=2, breaker_reset=0.2)
+
+    async def scenario():
+        # Sent while the breaker was still closed
+        stub.latency = 5
+        old = asyncio.ensure_future(client.get(stub.url + PAGE))
+        await started(stub, 1)
+        stub.latency = 0
+        await open_breaker(client, stub)
+        stub.latency = 0.3
+        trial = asyncio.ensure_future(client.get(stub.url + PAGE))
+        await started(stub, 4)
+
+        old.cancel()
+        await asyncio.gather(old, return_exceptions=True)
+        # The trial is still in flight, a second one must not be let through
+        with pytest.raises(HostUnavailableError):
+            await client.get(stub.url + PAGE)
+        assert (await trial).status_code == 200
+
+    run(client, scenario)
+    assert stub.stats["requests"] == 4
@@ -0,0 +1,27 @@
+import asyncio
+import json
+from app.src.scripts.database_manager import DatabaseManager
+from app.src.scripts.service_handler import ServiceHandler
+
+
+def test_export_without_release_dates_imports_back():
+    record = {
+        "id": 1, "url": "", "name": "Undated Title", "image_link": None, "authors": None, "status": None,
+        "genres": [], "views": None, "rating": 0.0, "description": None, "last_chapter": None,
+        "last_chapter_url": None, "last_chapter_release_date": None, "source": None, "last_chapter_number": None,
+    }
+
+    async def chunks():
+        yield json.dumps(record).encode() + b"\n"
+
+    async def run():
+        service_handler = ServiceHandler()
+        try:
+            return await service_handler.import_entries(chunks())
+        finally:
+            await service_handler.close()
+
+    summary = asyncio.run(run())
+    assert (summary["written"], summary["failed"]) == (1, 0), summary
+    with DatabaseManager() as db_manager:
+        assert db_manager.get_manga_record("Undated Title")["last_chapter_release_date"] is None
@@ -0,0 +1,40 @@
+import sqlite3
+import pytest
+from app.src.scripts import migrations
+
+
+def _columns(connection: sqlite3.Connection) -> list:
+    return [row[1] for row in connection.execute("PRAGMA table_info(mangas)")]
+
+
+def test_fresh_database_reaches_the_latest_version(tmp_path):
+    connection = sqlite3.connect(tmp_path / "Mangas.db")
+    migrations.migrate(connection)
+    assert connection.execute("PRAGMA user_version").fetchone()[0] == len(migrations.MIGRATIONS)
+    assert "last_chapter_number" in _columns(connection)
+
+
+def test_failed_migration_rolls_back_its_ddl(tmp_path, monkeypatch):
+    def add_column_then_fail(cursor: sqlite3.Cursor):
+        cursor.execute("ALTER TABLE mangas ADD COLUMN extra TEXT")
+        cursor.execute("CREATE TABLE extra_table (id INTEGER PRIMARY KEY)")
+        cursor.execute("UPDATE mangas SET extra = 'x'")
+        raise RuntimeError("migration failed")
+
+    connection = sqlite3.connect(tmp_path / "Mangas.db")
+    migrations.migrate(connection)
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    monkeypatch.setattr(migrations, "MIGRATIONS", [*migrations.MIGRATIONS, add_column_then_fail])
+
+    with pytest.raises(RuntimeError):
+        migrations.migrate(connection)
+
+    assert connection.execute("PRAGMA user_version").fetchone()[0] == version
+    assert "extra" not in _columns(connection)
+    assert connection.execute("SELECT name FROM sqlite_master WHERE name = 'extra_table'").fetchone() is None
+    assert not connection.in_transaction
+
+    # The next boot retries it from the same state
+    monkeypatch.setattr(migrations, "MIGRATIONS", [*migrations.MIGRATIONS[:-1], lambda cursor: None])
+    migrations.migrate(connection)
+    assert connection.execute("PRAGMA user_version").fetchone()[0] == version + 1
@@ -0,0 +1,44 @@
+import logging
+import os
+import pytest
+from app.src.models.manga import Manga
+from app.src.scripts import mangaAPI_Demonicscans
+from app.src.scripts.html_parser import available_backends
+from app.src.scripts.http_cache import HttpCache
+from app.src.scripts.metrics import PARSE_ERRORS
+from benchmarks.bench_parsers import FIXTURES, load_fixture, make_cases, set_mode
+
+PAGES = {name: load_fixture(name) for name in os.listdir(FIXTURES) if name.endswith(".html")}
+SITES = [site for site, _, _ in make_cases(PAGES)]
+
+
+def parse(site: str, backend: str, mode: str) -> Manga:
+    _, manager, parse_page = next(case for case in make_cases(PAGES) if case[0] == site)
+    set_mode(manager, mode)
+    return parse_page(manager, backend)
+
+
+@pytest.mark.parametrize("site", SITES)
+@pytest.mark.parametrize("mode", ["full", "strained"])
+@pytest.mark.parametrize("backend", available_backends())
+def test_every_backend_parses_the_same_manga(site, backend, mode):
+    reference = parse(site, "html.parser", "full")
+    assert isinstance(reference, Manga)
+    assert reference.name and reference.last_chapter
+
+    assert parse(site, backend, mode) == reference
+
+
+def test_a_field_that_fails_to_parse_is_logged_and_counted(caplog):
+    manager = mangaAPI_Demonicscans.MangaManager(http_cache=HttpCache(":memory:"))
+    # The stats block moved, its fields keep their defaults
+    html = PAGES["demonicscans_manga.html"].replace("manga-info-stats", "manga-info-moved")
+    before = PARSE_ERRORS._values.get(("demonicscans", "info_stats"), 0)
+
+    with caplog.at_level(logging.WARNING, logger=mangaAPI_Demonicscans.__name__):
+        manga = manager.parse_manga("Solo Leveling", "https://demonicscans.org/manga/Solo-Leveling", html)
+
+    assert manga.authors is None and manga.rating == 0.0 and manga.last_chapter_release_date is None
+    assert manga.genres and manga.last_chapter
+    assert PARSE_ERRORS._values[("demonicscans", "info_stats")] == before + 1
+    assert [record.getMessage().split(":")[0] for record in caplog.records] == ["Error parsing info_stats"]
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+import pytest
+from app.src.models.manga import Manga
+from app.src.scripts.database_manager import DatabaseManager
+from app.src.scripts.http_cache import HttpCache
+from app.src.scripts.metrics import SCRAPE_ERRORS
+from app.src.scripts.providers import ProviderRegistry
+from app.src.scripts.refresh_engine import RefreshEngine
+from benchmarks.stub_server import StubServer
+
+
+@pytest.fixture
+def stub():
+    with StubServer() as server:
+        yield server
+
+
+@pytest.fixture
+def cache_path():
+    return os.path.join(tempfile.mkdtemp(prefix="manga-pages-"), "HttpCache.db")
+
+
+def make_engine(stub: StubServer, cache_path: str) -> RefreshEngine:
+    providers = ProviderRegistry(["demonicscans"], hedge=False, http_cache=HttpCache(cache_path))
+    providers.primary.base_url = stub.url
+    return RefreshEngine(providers, parse_workers=0)
+
+
+def store(name: str):
+    """Store a placeholder entry for a title, for a refresh to update."""
+    manga = Manga(
+        url="", name=name, image_link=None, authors=None, status=None, genres=[], views=None, rating=0.0,
+        description=None, last_chapter=None, last_chapter_url=None, last_chapter_release_date=datetime(2020, 1, 1),
+    )
+    with DatabaseManager() as db_manager:
+        db_manager.store_many([manga])
+
+
+def refresh(engine: RefreshEngine, names, written=None):
+    """Run one refresh on its own event loop, with its own client, and return the status of each title."""
+    statuses = {}
+
+    async def run():
+        try:
+            await engine.refresh(
+                names,
+                on_batch_written=written.extend if written is not None else None,
+                on_result=lambda name, status, _: statuses.__setitem__(name, status),
+            )
+        finally:
+            await engine.providers.aclose()
+
+    asyncio.run(run())
+    return statuses
+
+
+def test_failed_write_leaves_the_page_changed(stub, cache_path):
+    names = ["Failed Write", "Written Before", "Written After"]
+    for name in names:
+        store(name)
+    engine = make_engine(stub, cache_path)
+    engine.batch_size = 1
+    write_batch = engine._write_batch
+
+    def failing_write(mangas):
+        if any(manga.name == "Failed Write" for manga in mangas):
+            raise RuntimeError("database is locked")
+        return write_batch(mangas)
+
+    engine._write_batch = failing_write
+    # The other batches are still written
+    assert refresh(engine, names) == {
+        "Failed Write": "failed", "Written Before": "updated", "Written After": "updated"
+    }
+
+    # The page is cached now and answers 304, it still has to be parsed and written
+    assert refresh(make_engine(stub, cache_path), ["Failed Write"]) == {"Failed Write": "updated"}
+    assert refresh(make_engine(stub, cache_path), ["Failed Write"]) == {"Failed Write": "unchanged"}
+    assert stub.stats["not_modified"] == 2
+
+
+def test_refresh_does_not_bring_back_removed_titles(stub, cache_path):
+    store("Removed Title")
+    with DatabaseManager() as db_manager:
+        db_manager.remove_manga_data("Removed Title")
+
+    assert refresh(make_engine(stub, cache_path), ["Removed Title"]) == {"Removed Title": "not_found"}
+    with DatabaseManager() as db_manager:
+        assert db_manager.get_manga_record("Removed Title") is None
+
+
+def test_new_page_with_the_same_details_is_reported_unchanged(stub, cache_path, tmp_path):
+    store("Same Details")
+    written = []
+    assert refresh(make_engine(stub, cache_path), ["Same Details"], written) == {"Same Details": "updated"}
+    assert [manga.name for manga in written] == ["Same Details"]
+
+    # Another page cache sees the page for the first time, the parsed details are the stored ones
+    written.clear()
+    other_cache = str(tmp_path / "HttpCache.db")
+    assert refresh(make_engine(stub, other_cache), ["Same Details"], written) == {"Same Details": "unchanged"}
+    assert written == []
+
+
+def test_unexpected_errors_are_reported_failed_and_counted(stub, cache_path):
+    engine = make_engine(stub, cache_path)
+
+    async def broken_fetch_page(client, manga_name):
+        raise ValueError("unexpected markup")
+
+    engine.providers.primary.fetch_page = broken_fetch_page
+    before = SCRAPE_ERRORS._values.get(("demonicscans",), 0)
+    assert refresh(engine, ["Broken Page"]) == {"Broken Page": "failed"}
+    assert SCRAPE_ERRORS._values[("demonicscans",)] == before + 1
@@ -0,0 +1,223 @@
+import asyncio
+import time
+from typing import Optional
+import httpx
+from app.src import config
+from app.src.models.manga import Manga
+from app.src.scripts.database_manager import close_pool, init_pool
+from app.src.scripts.service_handler import ServiceHandler
+from benchmarks.library import generate_library, title
+from benchmarks.stub_server import StubServer
+
+SCRAPE_SECONDS = 2.0
+MAX_READ_SECONDS = 0.25
+
+
+def test_reads_stay_fast_while_scrapes_are_slow():
+    from app.main import app, lifespan, service_handler
+
+    generate_library(config.DB_PATH, 100)
+    latencies = []
+
+    async def run():
+        async with lifespan(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+                creates = [asyncio.ensure_future(client.post(f"/mangas/Slow Title {i}")) for i in range(8)]
+                await asyncio.sleep(0.1)  # Every scrape is waiting on the stub
+                for index in range(1, 41):
+                    started_at = time.perf_counter()
+                    response = await client.get(f"/mangas/{title(index)}")
+                    latencies.append(time.perf_counter() - started_at)
+                    assert response.status_code == 200
+                # The reads were measured while the scrapes were still in flight
+                assert not any(create.done() for create in creates)
+                return [response.json() for response in await asyncio.gather(*creates)]
+
+    with StubServer(latency=SCRAPE_SECONDS) as stub:
+        service_handler.providers.hedge = False
+        for name, manager in service_handler.providers.managers.items():
+            manager.base_url = stub.url + ("/search/story/" if name == "manganato" else "")
+        results = asyncio.run(run())
+
+    assert all(result.endswith("stored successfully.") for result in results), results
+    assert max(latencies) < MAX_READ_SECONDS, f"slowest read took {max(latencies):.3f}s"
+
+
+def serve(monkeypatch, scenario, stub: Optional[StubServer] = None):
+    """Run `scenario(client)` against the app with a fresh ServiceHandler, scraping from `stub`.
+
+    The app's own handler only lives through a single lifespan per process,
+    this one is started and closed around each scenario instead.
+    """
+    from app import main
+
+    handler = ServiceHandler()
+    handler.providers.hedge = False
+    if stub is not None:
+        for name, manager in handler.providers.managers.items():
+            manager.base_url = stub.url + ("/search/story/" if name == "manganato" else "")
+    monkeypatch.setattr(main, "service_handler", handler)
+
+    async def run():
+        init_pool()
+        await handler.start()
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+                return await scenario(client)
+        finally:
+            await handler.close()
+            close_pool()
+
+    return asyncio.run(run())
+
+
+def test_unchanged_list_and_detail_answer_304(monkeypatch):
+    generate_library(config.DB_PATH, 100)
+
+    async def scenario(client):
+        for path in ("/mangas", "/mangas?sort=name&limit=10", f"/mangas/{title(1)}", "/mangas/search?q=Bench"):
+            response = await client.get(path)
+            assert response.status_code == 200
+            etag = response.headers["ETag"]
+            not_modified = await client.get(path, headers={"If-None-Match": etag})
+            assert not_modified.status_code == 304, path
+            assert not_modified.headers["ETag"] == etag
+            assert not_modified.content == b""
+            # Any of several held versions matches
+            assert (await client.get(path, headers={"If-None-Match": f'"stale", {etag}'})).status_code == 304
+            assert (await client.get(path, headers={"If-None-Match": '"stale"'})).status_code == 200
+
+    serve(monkeypatch, scenario)
+
+
+def test_etags_change_after_a_write(monkeypatch):
+    async def scenario(client):
+        detail_path = "/mangas/Etag Title"
+        assert (await client.post(detail_path)).json().endswith("stored successfully.")
+        list_etag = (await client.get("/mangas")).headers["ETag"]
+        query_etag = (await client.get("/mangas?limit=5")).headers["ETag"]
+        detail_etag = (await client.get(detail_path)).headers["ETag"]
+
+        assert (await client.post("/mangas/Another Etag Title")).json().endswith("stored successfully.")
+        listed = await client.get("/mangas", headers={"If-None-Match": list_etag})
+        assert listed.status_code == 200
+        assert listed.headers["ETag"] != list_etag
+        assert "Another Etag Title" in [manga["name"] for manga in listed.json()]
+        assert (await client.get("/mangas?limit=5", headers={"If-None-Match": query_etag})).status_code == 200
+
+        await client.delete(detail_path)
+        assert (await client.get(detail_path, headers={"If-None-Match": detail_etag})).status_code == 404
+
+    with StubServer() as stub:
+        serve(monkeypatch, scenario, stub)
+
+
+def test_gzip_is_negotiated(monkeypatch):
+    generate_library(config.DB_PATH, 100)
+
+    async def scenario(client):
+        plain = await client.get("/mangas", headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in plain.headers
+        assert "Accept-Encoding" in plain.headers["Vary"]
+
+        gzipped = await client.get("/mangas", headers={"Accept-Encoding": "gzip"})
+        assert gzipped.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in gzipped.headers["Vary"]
+        assert int(gzipped.headers["Content-Length"]) < len(plain.content)
+        assert gzipped.json() == plain.json()
+        # Each encoding has its own strong ETag, either one revalidates
+        assert gzipped.headers["ETag"] != plain.headers["ETag"]
+        for etag in (plain.headers["ETag"], gzipped.headers["ETag"]):
+            response = await client.get("/mangas", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+            assert response.status_code == 304
+
+        # Too small to be worth compressing
+        small = await client.get(f"/mangas/{title(1)}", headers={"Accept-Encoding": "gzip"})
+        assert len(small.content) < config.GZIP_MIN_SIZE
+        assert "Content-Encoding" not in small.headers
+
+    serve(monkeypatch, scenario)
+
+
+def page_requests(stub: StubServer) -> dict:
+    """Requests per scraped page, cover downloads left out."""
+    return {path: count for path, count in stub.paths.items() if not path.endswith((".jpg", ".png", ".webp"))}
+
+
+def test_duplicate_names_in_a_batch_are_scraped_once(monkeypatch):
+    async def scenario(client):
+        response = await client.post(
+            "/mangas/batch", json={"names": ["Batch Title", " Batch Title", "Batch Title ", "Other Batch Title"]}
+        )
+        return response.json()
+
+    with StubServer() as stub:
+        results = serve(monkeypatch, scenario, stub)
+        assert list(results) == ["Batch Title", "Other Batch Title"]
+        assert all(result.endswith("stored successfully.") for result in results.values()), results
+        assert sorted(page_requests(stub).values()) == [1, 1]
+
+
+def test_concurrent_creates_of_one_title_are_scraped_once(monkeypatch):
+    async def scenario(client):
+        return await asyncio.gather(
+            client.post("/mangas/Concurrent Title"),
+            client.post("/mangas/ Concurrent Title "),
+            client.post("/mangas/batch", json={"names": ["Concurrent Title"]}),
+            client.post("/mangas/Concurrent Title"),
+        )
+
+    with StubServer(latency=0.3) as stub:
+        single, padded, batch, again = serve(monkeypatch, scenario, stub)
+        assert single.json() == padded.json() == again.json() == batch.json()["Concurrent Title"]
+        assert single.json().endswith("stored successfully.")
+        assert list(page_requests(stub).values()) == [1]
+
+
+def test_genre_and_author_endpoints_follow_writes(monkeypatch):
+    mangas = [
+        {"name": "Facet Endpoint One", "genres": ["Endpoint Genre", "Endpoint Other"], "authors": "Endpoint Author"},
+        {"name": "Facet Endpoint Two", "genres": ["Endpoint Genre"], "authors": "Endpoint Author, Endpoint Co"},
+    ]
+
+    def counts(response, prefix: str) -> dict:
+        return {item["name"]: item["count"] for item in response.json()["items"] if item["name"].startswith(prefix)}
+
+    async def scenario(client):
+        empty = dict.fromkeys(Manga.model_fields)
+        lines = "\n".join(Manga(**{**empty, "url": "", "rating": 0.0, **manga}).model_dump_json() for manga in mangas)
+        assert (await client.post("/mangas/import", content=lines)).json()["written"] == 2
+
+        genres = await client.get("/genres", params={"limit": 1000})
+        assert counts(genres, "Endpoint") == {"Endpoint Genre": 2, "Endpoint Other": 1}
+        authors = await client.get("/authors", params={"limit": 1000})
+        assert counts(authors, "Endpoint") == {"Endpoint Author": 2, "Endpoint Co": 1}
+        listed = await client.get("/genres/endpoint genre", params={"sort": "name"})
+        assert [manga["name"] for manga in listed.json()["items"]] == ["Facet Endpoint One", "Facet Endpoint Two"]
+        assert (await client.get("/authors/Endpoint Co")).json()["items"][0]["name"] == "Facet Endpoint Two"
+        assert (await client.get("/genres/No Such Genre")).json() == {"items": [], "next_cursor": None}
+        revalidated = await client.get("/genres", params={"limit": 1000}, headers={"If-None-Match": genres.headers["ETag"]})
+        assert revalidated.status_code == 304
+
+        await client.delete("/mangas/Facet Endpoint Two")
+        after = await client.get("/genres", params={"limit": 1000}, headers={"If-None-Match": genres.headers["ETag"]})
+        assert after.status_code == 200
+        assert counts(after, "Endpoint") == {"Endpoint Genre": 1, "Endpoint Other": 1}
+        assert counts(await client.get("/authors", params={"limit": 1000}), "Endpoint") == {"Endpoint Author": 1}
+
+    serve(monkeypatch, scenario)
+
+
+def test_removing_a_missing_title_answers_404(monkeypatch):
+    async def scenario(client):
+        assert (await client.post("/mangas/Removed Once")).json().endswith("stored successfully.")
+        removed = await client.delete("/mangas/Removed Once")
+        assert (removed.status_code, removed.json()) == (200, "Manga removed successfully")
+        again = await client.delete("/mangas/Removed Once")
+        assert (again.status_code, again.json()) == (404, {"message": "No manga found with that name."})
+        assert (await client.delete("/mangas/Never Stored")).status_code == 404
+
+    with StubServer() as stub:
+        serve(monkeypatch, scenario, stub)
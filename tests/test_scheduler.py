@@ -0,0 +1,64 @@
+import asyncio
+from app.src.scripts.database_manager import DatabaseManager
+from app.src.scripts.scheduler import RefreshScheduler
+from app.src.scripts.service_handler import ServiceHandler
+from benchmarks.stub_server import StubServer
+from tests.test_refresh_engine import store
+
+
+def test_removed_title_is_not_scraped_again():
+    store("Removed While Due")
+    with DatabaseManager() as db_manager:
+        db_manager.remove_manga_data("Removed While Due")
+
+    with StubServer() as stub:
+        service_handler = ServiceHandler()
+        for manager in service_handler.providers.managers.values():
+            manager.base_url = stub.url
+        scheduler = RefreshScheduler(service_handler)
+
+        async def run():
+            try:
+                await scheduler._refresh("Removed While Due")
+            finally:
+                await service_handler.close()
+
+        asyncio.run(run())
+
+    # Neither scraped nor scheduled again
+    assert stub.stats["requests"] == 0
+    assert "Removed While Due" not in scheduler._due
+    with DatabaseManager() as db_manager:
+        assert db_manager.get_manga_record("Removed While Due") is None
+
+
+def test_unschedule_skips_the_queued_refresh():
+    scheduler = RefreshScheduler(service_handler=None)
+    scheduler.schedule("Deleted Title", 0)
+    scheduler.unschedule("Deleted Title")
+    assert "Deleted Title" not in scheduler._due
+
+
+def test_stored_title_is_scheduled_and_rescheduled_after_its_refresh():
+    store("Scheduled Title")
+
+    with StubServer() as stub:
+        service_handler = ServiceHandler()
+        service_handler.providers.hedge = False
+        for manager in service_handler.providers.managers.values():
+            manager.base_url = stub.url
+        scheduler = RefreshScheduler(service_handler)
+
+        async def run():
+            try:
+                await scheduler._load()
+                assert "Scheduled Title" in scheduler._due
+                scheduler.unschedule("Scheduled Title")
+                await scheduler._refresh("Scheduled Title")
+            finally:
+                await service_handler.close()
+
+        asyncio.run(run())
+
+    assert stub.stats["requests"] >= 1
+    assert "Scheduled Title" in scheduler._due
@@ -0,0 +1,76 @@
+import asyncio
+import json
+from app.src.scripts.service_handler import ServiceHandler
+from benchmarks.stub_server import FIXTURE_CHAPTER, StubServer
+
+
+def make_service_handler(stub: StubServer) -> ServiceHandler:
+    service_handler = ServiceHandler()
+    service_handler.providers.hedge = False
+    for name, manager in service_handler.providers.managers.items():
+        manager.base_url = stub.url + ("/search/story/" if name == "manganato" else "")
+    return service_handler
+
+NAME = "Cached Title"
+
+
+async def warm(service_handler: ServiceHandler) -> set:
+    """Read the list, the version and the title's detail, and return the cache keys they filled."""
+    await service_handler.get_all_entries_json()
+    await service_handler.library_version()
+    await service_handler.retrieve_manga(NAME)
+    await service_handler.retrieve_manga_json(NAME)
+    return cached(service_handler)
+
+
+def cached(service_handler: ServiceHandler) -> set:
+    keys = ("mangas", "version", ("manga", NAME), ("manga_json", NAME))
+    return {key for key in keys if service_handler.cache.get(key) is not None}
+
+
+def test_writes_invalidate_the_cached_reads():
+    with StubServer(change_rate=1.0) as stub:
+        service_handler = make_service_handler(stub)
+
+        async def run():
+            try:
+                # Not stored yet, misses are not cached
+                assert await warm(service_handler) == {"mangas", "version"}
+                assert (await service_handler.create_entry(NAME)).endswith("stored successfully.")
+                assert cached(service_handler) == set()
+                assert (await service_handler.retrieve_manga(NAME))["name"] == NAME
+
+                assert len(await warm(service_handler)) == 4
+                stub.bump()
+                assert (await service_handler.refresh_entry(NAME)).endswith("updated successfully.")
+                assert cached(service_handler) == set()
+                record = json.loads((await service_handler.retrieve_manga_json(NAME)).body)
+                assert record["last_chapter"].endswith(str(FIXTURE_CHAPTER + stub.revision))
+
+                assert len(await warm(service_handler)) == 4
+                await service_handler.remove_manga(NAME)
+                assert cached(service_handler) == set()
+                assert await service_handler.retrieve_manga_json(NAME) is None
+            finally:
+                await service_handler.close()
+
+        asyncio.run(run())
+
+
+def test_failing_covers_do_not_open_the_scrapers_breaker():
+    with StubServer() as stub:
+        service_handler = make_service_handler(stub)
+        cover_client = service_handler.covers.http_client
+        cover_client.max_retries, cover_client.breaker_threshold = 0, 1
+
+        async def run():
+            try:
+                stub.inject(1, status=503)
+                assert await service_handler.covers.get(stub.url + "/covers/Broken.jpg") is None
+                assert cover_client.hosts[stub.host].breaker.opened_at is not None
+                # The image host is the scraped host, scraping it still goes ahead
+                return await service_handler.create_entry("Breaker Title")
+            finally:
+                await service_handler.close()
+
+        assert asyncio.run(run()).endswith("stored successfully.")
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.src.scripts.change_watcher import ChangeWatcher
+from app.src.scripts.database_manager import DatabaseManager
+from app.src.scripts.leader_election import LeaderElection
+from tests.test_refresh_engine import store
+
+
+def test_one_leader_and_a_follower_taking_over(tmp_path):
+    events = []
+    lock_path = str(tmp_path / "leader.lock")
+
+    def election(name: str) -> LeaderElection:
+        return LeaderElection(
+            lambda: events.append((name, "elected")),
+            lock_path=lock_path,
+            retry_interval=0.05,
+            on_follower=lambda: events.append((name, "follower")),
+        )
+
+    async def run():
+        first, second = election("first"), election("second")
+        first.start()
+        await asyncio.sleep(0.1)
+        second.start()
+        await asyncio.sleep(0.1)
+        assert (first.is_leader, second.is_leader) == (True, False)
+
+        # The leader goes away, the follower takes over on its next try
+        await first.stop()
+        await asyncio.sleep(0.2)
+        assert second.is_leader
+        await second.stop()
+
+    asyncio.run(run())
+    assert events == [("first", "elected"), ("second", "follower"), ("second", "elected")]
+
+
+def test_change_watcher_sees_library_writes_only():
+    changes = []
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    async def wait_for_checks():
+        # A couple of polls, the first one only records the versions
+        await asyncio.sleep(0.15)
+
+    async def run():
+        watcher = ChangeWatcher(executor, lambda: changes.append(time.monotonic()), interval=0.02)
+        watcher.start()
+        try:
+            await wait_for_checks()
+            # Another connection commits to a table that is not the library
+            with DatabaseManager() as db_manager:
+                with db_manager.conn:
+                    db_manager.cursor.execute(
+                        "INSERT INTO chapter_events (manga_id, name, chapter, chapter_url, detected_at) "
+                        "VALUES (0, 'Watched', 'Chapter 1', '', 0)"
+                    )
+            await wait_for_checks()
+            assert changes == []
+
+            await asyncio.to_thread(store, "Watched Title")
+            await wait_for_checks()
+            assert len(changes) == 1
+        finally:
+            await watcher.stop()
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()